@@ -33,8 +33,20 @@ sources.extend(["src/ed25519-supercop-ref/"+s
                 for s in os.listdir("src/ed25519-supercop-ref")
                 if s.endswith(".c") and s!="test.c"])
 
+# ED25519_PROFILE=1 at build time makes the core time each phase of signing
+# and verification, for ed25519.metrics.profile()
+define_macros = []
+if os.environ.get("ED25519_PROFILE", "0") not in ("", "0"):
+    define_macros.append(("ED25519_PROFILE", "1"))
+
 m = Extension("ed25519._ed25519",
-              include_dirs=["src/ed25519-supercop-ref"], sources=sources)
+              include_dirs=["src/ed25519-supercop-ref"], sources=sources,
+              define_macros=define_macros)
+# ED25519_PURE=1 skips the extension, for hosts without a compiler: the
+# package then uses its (slower, not constant-time) pure-Python backend
+ext_modules = [m]
+if os.environ.get("ED25519_PURE", "0") not in ("", "0"):
+    ext_modules = []
 
 commands = versioneer.get_cmdclass().copy()
 
@@ -96,6 +108,15 @@ class Speed(Test):
                 return "%.2fms" % (t*1e3)
             return "%.2fus" % (t*1e6)
 
+        # a fresh interpreter each time, since imports are cached
+        I1 = ("import os, subprocess, sys; "
+              "env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)); "
+              "cmd = [sys.executable, '-c', 'import ed25519']")
+        I2 = "subprocess.check_call(cmd, env=env)"
+        startup = do([I1], I2)
+        baseline = do([I1, "cmd[-1] = 'pass'"], I2)
+        print("import: %s" % abbrev(startup - baseline))
+
         S1 = "import ed25519; msg=b'hello world'"
         S2 = "sk,vk = ed25519.create_keypair()"
         S3 = "sig = sk.sign(msg)"
@@ -109,6 +130,23 @@ class Speed(Test):
         print("sign: %s" % abbrev(sign))
         print("verify: %s" % abbrev(verify))
 
+        # 512 signatures checked as a batch (smaller ones are checked one
+        # at a time anyway), with 0, 1, and 16 bad ones. The bad ones are
+        # spread out, so bisection has to find each.
+        B1 = ("import os; from ed25519.batch import verify_batch; "
+              "items = [(vk, sk.sign(m), m) for m in "
+              "[os.urandom(100) for i in range(512)]]")
+        B2 = ("bad = [(vk, sig[:40] + bytearray([sig[40] ^ 1]) + sig[41:], m)"
+              " for (vk, sig, m) in items]")
+        single = do([S1, S2, B1], "[vk.verify(s, m) for (vk, s, m) in items]")
+        print("verify x512 one at a time: %s" % abbrev(single))
+        for nbad in (0, 1, 16):
+            which = list(range(3, 512, 512 // nbad)) if nbad else []
+            B3 = ("items = [bad[i] if i in %r else items[i] "
+                  "for i in range(512)]" % which)
+            batch = do([S1, S2, B1, B2, B3], "verify_batch(items)")
+            print("verify x512 batch, %d bad: %s" % (nbad, abbrev(batch)))
+
 commands["speed"] = Speed
 
 setup(name="ed25519",
@@ -130,7 +168,7 @@ setup(name="ed25519",
           "Programming Language :: Python :: 3.4",
           "Topic :: Security :: Cryptography",
           ],
-      ext_modules=[m],
+      ext_modules=ext_modules,
       packages=["ed25519"],
       package_dir={"ed25519": "src/ed25519"},
       scripts=["bin/edsig"],
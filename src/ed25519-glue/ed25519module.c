@@ -22,6 +22,11 @@ typedef int Py_ssize_t;
 #define PY_SSIZE_T_MIN INT_MIN
 #endif
 
+/* for Point and Scalar: these must come before the 'y' macro below, which
+ * would clash with the coordinates in their structs */
+#include "ge25519.h"
+#include "sc25519.h"
+
 /* This is required for compatibility with Python 2. */
 #if PY_MAJOR_VERSION >= 3
 	#define y "y"
@@ -30,10 +35,292 @@ typedef int Py_ssize_t;
 #endif
 
 static PyObject *BadSignatureError;
+static PyObject *BadPrefixError;
 /* --------------------------------------------------------------------- */
 
 #include "crypto_sign.h"
 
+/* Operation counters and latency histograms. These cost nothing until
+ * stats_enable() turns them on (a clock read per operation after that).
+ * The GIL is released while operations run, so the counters are updated
+ * atomically. Histogram bucket i counts operations that took less than
+ * 2**i nanoseconds (and at least 2**(i-1)); the last bucket also counts
+ * anything slower. */
+
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <time.h>
+#endif
+
+#if defined(__GNUC__)
+#define STAT_ADD(x, v) __atomic_fetch_add(&(x), (v), __ATOMIC_RELAXED)
+#define STAT_GET(x) __atomic_load_n(&(x), __ATOMIC_RELAXED)
+#define STAT_SET(x, v) __atomic_store_n(&(x), (v), __ATOMIC_RELAXED)
+#elif defined(_MSC_VER)
+#define STAT_ADD(x, v) InterlockedExchangeAdd64((LONG64 *)&(x), (v))
+#define STAT_GET(x) InterlockedCompareExchange64((LONG64 *)&(x), 0, 0)
+#define STAT_SET(x, v) InterlockedExchange64((LONG64 *)&(x), (v))
+#else
+/* no atomics: counts may be lost when threads race */
+#define STAT_ADD(x, v) ((x) += (v))
+#define STAT_GET(x) (x)
+#define STAT_SET(x, v) ((x) = (v))
+#endif
+
+#define STAT_BUCKETS 40
+
+enum { STAT_PUBLICKEY, STAT_SIGN, STAT_VERIFY, STAT_VERIFY_BATCH, STAT_OPS };
+
+typedef struct {
+    const char *name;
+    unsigned long long calls, failures, items, bytes, nanoseconds;
+    unsigned long long buckets[STAT_BUCKETS];
+} op_stats;
+
+static op_stats stats[STAT_OPS] = {
+    {"publickey"}, {"sign"}, {"verify"}, {"verify_batch"},
+};
+static volatile int stats_enabled = 0;
+
+static unsigned long long
+stats_now(void)
+{
+#ifdef _WIN32
+    static LARGE_INTEGER freq;
+    LARGE_INTEGER now;
+    if (!freq.QuadPart)
+        QueryPerformanceFrequency(&freq);
+    QueryPerformanceCounter(&now);
+    return (unsigned long long)(now.QuadPart * (1e9 / freq.QuadPart));
+#else
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (unsigned long long)ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+#endif
+}
+
+/* Returns the start time of an operation, or 0 if stats are off. */
+static unsigned long long
+stats_start(void)
+{
+    return stats_enabled ? stats_now() : 0;
+}
+
+/* Records one call to 'op' that began at 'start' (from stats_start()),
+ * handled 'items' signatures (or keys) of which 'failures' were bad, and
+ * passed 'bytes' bytes through SHA-512. Safe without the GIL. */
+static void
+stats_record(int op, unsigned long long start, unsigned long long items,
+             unsigned long long failures, unsigned long long bytes)
+{
+    op_stats *s = &stats[op];
+    unsigned long long elapsed;
+    int bucket = 0;
+    if (!start)
+        return;
+    elapsed = stats_now() - start;
+    while (bucket < STAT_BUCKETS-1 && (elapsed >> bucket))
+        bucket++;
+    STAT_ADD(s->calls, 1);
+    STAT_ADD(s->items, items);
+    STAT_ADD(s->failures, failures);
+    STAT_ADD(s->bytes, bytes);
+    STAT_ADD(s->nanoseconds, elapsed);
+    STAT_ADD(s->buckets[bucket], 1);
+}
+
+/* USDT (SystemTap-style static) probes, for perf, bpftrace, and friends.
+ * They are compiled in when <sys/sdt.h> is available (e.g. from the
+ * systemtap-sdt-dev package) unless ED25519_NO_USDT is defined, and cost a
+ * single no-op instruction each when nobody is tracing. Each operation
+ * fires an _entry probe and a _return probe in the provider "ed25519":
+ *
+ *   keygen_entry()                 keygen_return()
+ *   sign_entry(msglen)             sign_return(msglen)
+ *   verify_entry(msglen)           verify_return(msglen, good)
+ *   verify_batch_entry(n, bytes)   verify_batch_return(n, good)
+ *
+ * where 'bytes' is the total length of the n messages, and 'good' is 1 or
+ * 0 for a single signature, or the number of good signatures in a batch
+ * (the whole-batch check only says n or 0). See tools/bpftrace/.
+ *
+ * Each probe has a semaphore, which tracers that support them (bpftrace,
+ * SystemTap) increment while attached, so that PROBE_ENABLED() can skip
+ * computing arguments that cost more than the probe itself. */
+
+#if !defined(ED25519_NO_USDT) && defined(__has_include)
+#if __has_include(<sys/sdt.h>)
+#define _SDT_HAS_SEMAPHORES 1
+#include <sys/sdt.h>
+#define HAVE_USDT 1
+#endif
+#endif
+
+#ifdef HAVE_USDT
+#define SEMAPHORE(name) \
+    __extension__ unsigned short ed25519_##name##_semaphore \
+    __attribute__((unused, visibility("hidden"), section(".probes")))
+SEMAPHORE(keygen_entry);
+SEMAPHORE(keygen_return);
+SEMAPHORE(sign_entry);
+SEMAPHORE(sign_return);
+SEMAPHORE(verify_entry);
+SEMAPHORE(verify_return);
+SEMAPHORE(verify_batch_entry);
+SEMAPHORE(verify_batch_return);
+#define PROBE_ENABLED(name) __builtin_expect(ed25519_##name##_semaphore, 0)
+#define PROBE0(name) DTRACE_PROBE(ed25519, name)
+#define PROBE1(name, a) DTRACE_PROBE1(ed25519, name, a)
+#define PROBE2(name, a, b) DTRACE_PROBE2(ed25519, name, a, b)
+#else
+#define PROBE_ENABLED(name) 0
+#define PROBE0(name) do {} while (0)
+#define PROBE1(name, a) do {} while (0)
+#define PROBE2(name, a, b) do {} while (0)
+#endif
+
+/* SHA-512 input sizes: a signature hashes the seed, then the nonce prefix
+ * and message, then R, A and the message; a verification only the last */
+#define SIGN_HASHED(mlen) (2*(unsigned long long)(mlen) + 128)
+#define VERIFY_HASHED(mlen) ((unsigned long long)(mlen) + 64)
+
+PyDoc_STRVAR(ed25519_stats_enable_doc,
+"stats_enable(flag)\n\
+\n\
+Turn the operation counters on or off, returning the previous setting.");
+
+static PyObject *
+ed25519_stats_enable(PyObject *self, PyObject *args)
+{
+    int flag, previous = stats_enabled;
+    if (!PyArg_ParseTuple(args, "i:stats_enable", &flag))
+        return NULL;
+    stats_enabled = flag != 0;
+    return PyBool_FromLong(previous);
+}
+
+PyDoc_STRVAR(ed25519_stats_snapshot_doc,
+"stats_snapshot()\n\
+\n\
+Return a dict mapping each operation name (publickey, sign, verify, and\n\
+verify_batch) to a dict of its counters: calls, items, failures, bytes\n\
+(passed through SHA-512), nanoseconds (in total), and buckets (a list of\n\
+STATS_BUCKETS counts, where bucket i counts calls that took less than\n\
+2**i nanoseconds). Each sign() or verification is one call of one item;\n\
+verify_batch counts a call per batch, and an item per signature.");
+
+static PyObject *
+ed25519_stats_snapshot(PyObject *self, PyObject *args)
+{
+    PyObject *result, *op = NULL, *buckets = NULL, *v;
+    op_stats *s;
+    int i, j;
+    result = PyDict_New();
+    if (!result)
+        return NULL;
+    for (i = 0; i < STAT_OPS; i++) {
+        s = &stats[i];
+        buckets = PyList_New(STAT_BUCKETS);
+        if (!buckets)
+            goto fail;
+        for (j = 0; j < STAT_BUCKETS; j++) {
+            v = PyLong_FromUnsignedLongLong(STAT_GET(s->buckets[j]));
+            if (!v)
+                goto fail;
+            PyList_SET_ITEM(buckets, j, v);
+        }
+        op = Py_BuildValue("{s:K,s:K,s:K,s:K,s:K,s:O}",
+                           "calls", STAT_GET(s->calls),
+                           "items", STAT_GET(s->items),
+                           "failures", STAT_GET(s->failures),
+                           "bytes", STAT_GET(s->bytes),
+                           "nanoseconds", STAT_GET(s->nanoseconds),
+                           "buckets", buckets);
+        Py_CLEAR(buckets);
+        if (!op || PyDict_SetItemString(result, s->name, op) < 0)
+            goto fail;
+        Py_CLEAR(op);
+    }
+    return result;
+ fail:
+    Py_XDECREF(op);
+    Py_XDECREF(buckets);
+    Py_DECREF(result);
+    return NULL;
+}
+
+PyDoc_STRVAR(ed25519_stats_reset_doc,
+"stats_reset()\n\
+\n\
+Set all the operation counters back to zero.");
+
+static PyObject *
+ed25519_stats_reset(PyObject *self, PyObject *args)
+{
+    op_stats *s;
+    int i, j;
+    for (i = 0; i < STAT_OPS; i++) {
+        s = &stats[i];
+        STAT_SET(s->calls, 0);
+        STAT_SET(s->items, 0);
+        STAT_SET(s->failures, 0);
+        STAT_SET(s->bytes, 0);
+        STAT_SET(s->nanoseconds, 0);
+        for (j = 0; j < STAT_BUCKETS; j++)
+            STAT_SET(s->buckets[j], 0);
+    }
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(ed25519_profile_snapshot_doc,
+"profile_snapshot()\n\
+\n\
+If the extension was built with ED25519_PROFILE, return a dict mapping\n\
+each phase of signing and single verification (key_hash, nonce_hash,\n\
+scalarmult_base, hram_hash, scalar, decompress, double_scalarmult,\n\
+pack_compare) to a dict of its counters: calls and nanoseconds (in\n\
+total). Otherwise return None.");
+
+static PyObject *
+ed25519_profile_snapshot(PyObject *self, PyObject *args)
+{
+    unsigned long long calls[crypto_sign_PROFILE_PHASES];
+    unsigned long long ns[crypto_sign_PROFILE_PHASES];
+    PyObject *result, *phase;
+    int i;
+    if (!crypto_sign_profile(calls, ns))
+        Py_RETURN_NONE;
+    result = PyDict_New();
+    if (!result)
+        return NULL;
+    for (i = 0; i < crypto_sign_PROFILE_PHASES; i++) {
+        phase = Py_BuildValue("{s:K,s:K}", "calls", calls[i],
+                              "nanoseconds", ns[i]);
+        if (!phase || PyDict_SetItemString(result,
+                                           crypto_sign_profile_names[i],
+                                           phase) < 0) {
+            Py_XDECREF(phase);
+            Py_DECREF(result);
+            return NULL;
+        }
+        Py_DECREF(phase);
+    }
+    return result;
+}
+
+PyDoc_STRVAR(ed25519_profile_reset_doc,
+"profile_reset()\n\
+\n\
+Set the phase counters of profile_snapshot() back to zero.");
+
+static PyObject *
+ed25519_profile_reset(PyObject *self, PyObject *args)
+{
+    crypto_sign_profile_reset();
+    Py_RETURN_NONE;
+}
+
 PyDoc_STRVAR(ed25519_publickey_doc,
 "publickey(signkey_seed)\n\
 \n\
@@ -42,6 +329,7 @@ Accepts a 32-byte seed. Return a tuple of (verfkey, signkey), with the\n\
 verfiying key.");
 
 #include <stdio.h>
+#include <string.h>
 
 static PyObject *
 ed25519_publickey(PyObject *self, PyObject *args)
@@ -50,9 +338,16 @@ ed25519_publickey(PyObject *self, PyObject *args)
     unsigned char signkey[SECRETKEYBYTES];
     unsigned char *seed;
     Py_ssize_t seed_len;
+    unsigned long long start;
     if (!PyArg_ParseTuple(args, y"#", &seed, &seed_len))
         return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    PROBE0(keygen_entry);
+    start = stats_start();
     crypto_sign_publickey(verfkey, signkey, seed);
+    stats_record(STAT_PUBLICKEY, start, 1, 0, 32);
+    PROBE0(keygen_return);
+    Py_END_ALLOW_THREADS
     return Py_BuildValue("("y"#"y"#)",
                          verfkey, (Py_ssize_t)PUBLICKEYBYTES,
                          signkey, (Py_ssize_t)SECRETKEYBYTES);
@@ -72,6 +367,7 @@ ed25519_sign(PyObject *self, PyObject *args)
     unsigned char *sig_and_msg; unsigned long long sig_and_msg_len1;
     Py_ssize_t sig_and_msg_len2;
     PyObject *ret;
+    unsigned long long start;
 
     // NOTE: using s# copies the message. It'd be nicer to use it in-place.
     // Consider s* and using a Py_buffer. Don't forget PyBuffer_Release.
@@ -90,31 +386,143 @@ ed25519_sign(PyObject *self, PyObject *args)
     sig_and_msg = PyMem_Malloc(msg_len + SIGNATUREBYTES);
     if (!sig_and_msg)
         return PyErr_NoMemory();
+    Py_BEGIN_ALLOW_THREADS
+    PROBE1(sign_entry, msg_len);
+    start = stats_start();
     crypto_sign(sig_and_msg, &sig_and_msg_len1, msg, msg_len, signkey);
+    stats_record(STAT_SIGN, start, 1, 0, SIGN_HASHED(msg_len));
+    PROBE1(sign_return, msg_len);
+    Py_END_ALLOW_THREADS
     sig_and_msg_len2 = sig_and_msg_len1;
     ret = Py_BuildValue(y"#", sig_and_msg, sig_and_msg_len2);
     PyMem_Free(sig_and_msg);
     return ret;
 }
 
+/* The state from sign_prefix_init(). It lives in memory Python code cannot
+ * reach, and keeps its own copy of the prefix: a state assembled from other
+ * bytes could crash the SHA-512 code, and signing under a different prefix
+ * than the one hashed into it would reuse nonces across messages. */
+typedef struct {
+    PyObject_HEAD
+    unsigned char state[crypto_sign_PREFIXSTATEBYTES];
+    PyObject *prefix; /* bytes */
+} PrefixStateObject;
+
+static void
+prefix_state_dealloc(PrefixStateObject *self)
+{
+    Py_XDECREF(self->prefix);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyTypeObject PrefixStateType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "ed25519.PrefixState",
+    .tp_basicsize = sizeof(PrefixStateObject),
+    .tp_dealloc = (destructor)prefix_state_dealloc,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = "The opaque state made by sign_prefix_init().",
+};
+
+PyDoc_STRVAR(ed25519_sign_prefix_init_doc,
+"sign_prefix_init(prefix, signing_key)\n\
+\n\
+Hash the parts of signing that are the same for every message beginning\n\
+with 'prefix', returning an opaque state for sign_prefixed(). The state\n\
+includes the expanded secret key, so keep it as secret as the key.");
+
+static PyObject *
+ed25519_sign_prefix_init(PyObject *self, PyObject *args)
+{
+    Py_buffer prefix;
+    const unsigned char *signkey; Py_ssize_t signkey_len;
+    PrefixStateObject *state = NULL;
+    const unsigned char *p;
+    if (!PyArg_ParseTuple(args, y"*" y"#:sign_prefix_init",
+                          &prefix, &signkey, &signkey_len))
+        return NULL;
+    if (signkey_len != SECRETKEYBYTES) { // 64
+        PyErr_SetString(PyExc_TypeError,
+                        "Private signing keys are 64 byte strings");
+        goto done;
+    }
+    state = PyObject_New(PrefixStateObject, &PrefixStateType);
+    if (!state)
+        goto done;
+    state->prefix = PyBytes_FromStringAndSize(prefix.buf, prefix.len);
+    if (!state->prefix) {
+        Py_DECREF(state);
+        state = NULL;
+        goto done;
+    }
+    p = (const unsigned char *)PyBytes_AS_STRING(state->prefix);
+    Py_BEGIN_ALLOW_THREADS
+    crypto_sign_prefix_init(state->state, p, prefix.len, signkey);
+    Py_END_ALLOW_THREADS
+ done:
+    PyBuffer_Release(&prefix);
+    return (PyObject *)state;
+}
+
+PyDoc_STRVAR(ed25519_sign_prefixed_doc,
+"sign_prefixed(state, message)\n\
+\n\
+Return the 64-byte signature of the state's prefix followed by 'message',\n\
+where 'state' is from sign_prefix_init(). Only 'message' is hashed for\n\
+the nonce.");
+
+static PyObject *
+ed25519_sign_prefixed(PyObject *self, PyObject *args)
+{
+    PrefixStateObject *state;
+    Py_buffer msg;
+    unsigned char sig[SIGNATUREBYTES];
+    const unsigned char *prefix;
+    unsigned long long start, prefix_len;
+    if (!PyArg_ParseTuple(args, "O!" y"*:sign_prefixed",
+                          &PrefixStateType, &state, &msg))
+        return NULL;
+    prefix = (const unsigned char *)PyBytes_AS_STRING(state->prefix);
+    prefix_len = PyBytes_GET_SIZE(state->prefix);
+    Py_BEGIN_ALLOW_THREADS
+    PROBE1(sign_entry, prefix_len + msg.len);
+    start = stats_start();
+    crypto_sign_prefixed(sig, state->state, prefix, prefix_len,
+                         msg.buf, msg.len);
+    /* the secret key and the start of the nonce hash were done already */
+    stats_record(STAT_SIGN, start, 1, 0,
+                 SIGN_HASHED(prefix_len + msg.len) - 64 - prefix_len);
+    PROBE1(sign_return, prefix_len + msg.len);
+    Py_END_ALLOW_THREADS
+    PyBuffer_Release(&msg);
+    return Py_BuildValue(y"#", sig, (Py_ssize_t)SIGNATUREBYTES);
+}
+
 PyDoc_STRVAR(ed25519_open_doc,
-"open(message+signature, verifying_key)\n\
+"open(message+signature, verifying_key, prepared=None)\n\
 \n\
 Check the signature for validity. Returns the message if valid, raises\n\
-ed25519.error if not.");
+ed25519.error if not. If 'prepared' is provided, it must be the output of\n\
+prepare(verifying_key), and saves the cost of decompressing the key. It\n\
+is checked against the key (far more cheaply), and the signature fails\n\
+if it does not match.");
 
 static PyObject *
 ed25519_open(PyObject *self, PyObject *args)
 {
     const unsigned char *sig_and_msg; Py_ssize_t sig_and_msg_len;
     const unsigned char *verfkey; Py_ssize_t verfkey_len;
+    const unsigned char *prepared = NULL; Py_ssize_t prepared_len = 0;
     unsigned char *msg; unsigned long long msg_len1;
     Py_ssize_t msg_len2;
     PyObject *ret;
     int result;
-    if (!PyArg_ParseTuple(args, y"#"y"#:checkvalid",
+    unsigned long long start;
+    if (!PyArg_ParseTuple(args, y"#"y"#|z#:checkvalid",
                           &sig_and_msg, &sig_and_msg_len,
-                          &verfkey, &verfkey_len ))
+                          &verfkey, &verfkey_len,
+                          &prepared, &prepared_len))
         return NULL;
     if (sig_and_msg_len < SIGNATUREBYTES) { // 64
         PyErr_SetString(PyExc_TypeError,
@@ -126,6 +534,11 @@ ed25519_open(PyObject *self, PyObject *args)
                         "Public verifying keys are 32 byte strings");
         return NULL;
     }
+    if (prepared && prepared_len != PREPAREDKEYBYTES) { // 64
+        PyErr_SetString(PyExc_TypeError,
+                        "Prepared verifying keys are 64 byte strings");
+        return NULL;
+    }
 
     // crypto_sign_open() uses the output buffer as a scratchpad, and thus
     // requires an extra 64 bytes beyond the expected message. So allocate
@@ -133,8 +546,22 @@ ed25519_open(PyObject *self, PyObject *args)
     msg = PyMem_Malloc(sig_and_msg_len);
     if (!msg)
         return PyErr_NoMemory();
-    result = crypto_sign_open(msg, &msg_len1, sig_and_msg, sig_and_msg_len,
-                              verfkey);
+    // the arguments are immutable bytes, kept alive by 'args', so it is
+    // safe to let other threads run while we work
+    Py_BEGIN_ALLOW_THREADS
+    PROBE1(verify_entry, sig_and_msg_len - SIGNATUREBYTES);
+    start = stats_start();
+    if (prepared)
+        result = crypto_sign_open_prepared(msg, &msg_len1,
+                                           sig_and_msg, sig_and_msg_len,
+                                           verfkey, prepared);
+    else
+        result = crypto_sign_open(msg, &msg_len1,
+                                  sig_and_msg, sig_and_msg_len, verfkey);
+    stats_record(STAT_VERIFY, start, 1, result != 0,
+                 VERIFY_HASHED(sig_and_msg_len - SIGNATUREBYTES));
+    PROBE2(verify_return, sig_and_msg_len - SIGNATUREBYTES, result == 0);
+    Py_END_ALLOW_THREADS
     // be faithful to the NaCl interface and return the message, even though
     // it's a waste.
     if (result == 0) {
@@ -151,13 +578,1438 @@ ed25519_open(PyObject *self, PyObject *args)
     return NULL;
 }
 
+PyDoc_STRVAR(ed25519_prepare_doc,
+"prepare(verifying_key)\n\
+\n\
+Decompress and validate a 32-byte verifying key, returning the 64-byte\n\
+prepared form accepted by open(). Raises ValueError if the key does not\n\
+encode a point on the curve.");
+
+static PyObject *
+ed25519_prepare(PyObject *self, PyObject *args)
+{
+    const unsigned char *verfkey; Py_ssize_t verfkey_len;
+    unsigned char prepared[PREPAREDKEYBYTES];
+    if (!PyArg_ParseTuple(args, y"#:prepare", &verfkey, &verfkey_len))
+        return NULL;
+    if (verfkey_len != PUBLICKEYBYTES) { // 32
+        PyErr_SetString(PyExc_TypeError,
+                        "Public verifying keys are 32 byte strings");
+        return NULL;
+    }
+    if (crypto_sign_prepare_publickey(prepared, verfkey)) {
+        PyErr_SetString(PyExc_ValueError, "invalid verifying key");
+        return NULL;
+    }
+    return Py_BuildValue(y"#", prepared, (Py_ssize_t)PREPAREDKEYBYTES);
+}
+
+PyDoc_STRVAR(ed25519_check_prepared_doc,
+"check_prepared(verifying_key, prepared)\n\
+\n\
+Raise ValueError unless 'prepared' is what prepare(verifying_key)\n\
+returns. This is much cheaper than calling prepare() again.");
+
+static PyObject *
+ed25519_check_prepared(PyObject *self, PyObject *args)
+{
+    const unsigned char *verfkey; Py_ssize_t verfkey_len;
+    const unsigned char *prepared; Py_ssize_t prepared_len;
+    if (!PyArg_ParseTuple(args, y"#" y"#:check_prepared",
+                          &verfkey, &verfkey_len, &prepared, &prepared_len))
+        return NULL;
+    if (verfkey_len != PUBLICKEYBYTES) { // 32
+        PyErr_SetString(PyExc_TypeError,
+                        "Public verifying keys are 32 byte strings");
+        return NULL;
+    }
+    if (prepared_len != PREPAREDKEYBYTES) { // 64
+        PyErr_SetString(PyExc_TypeError,
+                        "Prepared verifying keys are 64 byte strings");
+        return NULL;
+    }
+    if (crypto_sign_check_prepared(prepared, verfkey)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "prepared point does not match the verifying key");
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(ed25519_prepare_many_doc,
+"prepare_many(verifying_keys, prepared, valid)\n\
+\n\
+prepare() for N keys at once. 'verifying_keys' is N*32 bytes, and the\n\
+64-byte prepared form of key i is written to prepared[64*i:64*i+64].\n\
+valid[i] is set to 1 if key i is a point on the curve, or to 0 (with its\n\
+prepared form zeroed) if not. Returns the number of valid keys. The GIL\n\
+is released while decompressing.");
+
+static PyObject *
+ed25519_prepare_many(PyObject *self, PyObject *args)
+{
+    Py_buffer keys, prepared, valid;
+    Py_ssize_t n;
+    unsigned long long good = 0;
+    if (!PyArg_ParseTuple(args, y"*" "w*w*:prepare_many",
+                          &keys, &prepared, &valid))
+        return NULL;
+    n = keys.len / PUBLICKEYBYTES;
+    if (keys.len % PUBLICKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "verifying keys must be a multiple of 32 bytes long");
+        n = -1;
+    } else if (prepared.len < n * PREPAREDKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError, "prepared buffer is too small");
+        n = -1;
+    } else if (valid.len < n) {
+        PyErr_SetString(PyExc_ValueError, "valid buffer is too small");
+        n = -1;
+    }
+    if (n >= 0) {
+        Py_BEGIN_ALLOW_THREADS
+        good = crypto_sign_prepare_publickeys(prepared.buf, keys.buf, n,
+                                              valid.buf);
+        Py_END_ALLOW_THREADS
+    }
+    PyBuffer_Release(&keys);
+    PyBuffer_Release(&prepared);
+    PyBuffer_Release(&valid);
+    if (n < 0)
+        return NULL;
+    return PyLong_FromUnsignedLongLong(good);
+}
+
+PyDoc_STRVAR(ed25519_validate_keys_doc,
+"validate_keys(verifying_keys, flags, random=None)\n\
+\n\
+Check N 32-byte verifying keys, setting flags[i] to the KEY_* bits for\n\
+the problems found with key i, or 0 if there are none: KEY_NOT_ON_CURVE,\n\
+KEY_NONCANONICAL (an encoding other than the one to_bytes() would give),\n\
+KEY_SMALL_ORDER (one of the eight points of order dividing 8), and\n\
+KEY_MIXED_ORDER (outside the prime-order subgroup, with a small-order\n\
+component). KEY_MIXED_ORDER is only checked if 'random' is given: N*32\n\
+unpredictable bytes, e.g. from os.urandom(), for a batched check that\n\
+misses a bad key with probability at most 2^-128. Returns the number of\n\
+keys without flags. The GIL is released while checking.");
+
+static PyObject *
+ed25519_validate_keys(PyObject *self, PyObject *args)
+{
+    Py_buffer keys, flags, random = {0};
+    Py_ssize_t n;
+    unsigned long long good = 0;
+    void *scratch = NULL;
+    if (!PyArg_ParseTuple(args, y"*" "w*|z*:validate_keys",
+                          &keys, &flags, &random))
+        return NULL;
+    n = keys.len / PUBLICKEYBYTES;
+    if (keys.len % PUBLICKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "verifying keys must be a multiple of 32 bytes long");
+        n = -1;
+    } else if (flags.len < n) {
+        PyErr_SetString(PyExc_ValueError, "flags buffer is too small");
+        n = -1;
+    } else if (random.buf && random.len != n * 32) {
+        PyErr_SetString(PyExc_ValueError, "need 32 random bytes per key");
+        n = -1;
+    } else {
+        scratch = PyMem_Malloc(crypto_sign_validate_publickeys_scratchbytes(n));
+        if (!scratch) {
+            PyErr_NoMemory();
+            n = -1;
+        }
+    }
+    if (n >= 0) {
+        Py_BEGIN_ALLOW_THREADS
+        good = crypto_sign_validate_publickeys(flags.buf, keys.buf, n,
+                                               random.buf, scratch);
+        Py_END_ALLOW_THREADS
+    }
+    PyMem_Free(scratch);
+    PyBuffer_Release(&keys);
+    PyBuffer_Release(&flags);
+    PyBuffer_Release(&random);
+    if (n < 0)
+        return NULL;
+    return PyLong_FromUnsignedLongLong(good);
+}
+
+/* Copies the n+1 message offsets out of the caller's buffer, which may
+ * change under us (another thread can write to it while the GIL is
+ * released), and checks that the copy holds ascending positions within
+ * msgs. Returns the copy, to be freed with PyMem_Free(), or NULL with an
+ * exception set. */
+static long long *
+copy_offsets(Py_ssize_t n, const Py_buffer *msgs, const Py_buffer *offsets)
+{
+    long long *off;
+    Py_ssize_t i;
+    if (offsets->len != (n+1) * (Py_ssize_t)sizeof(long long)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need N+1 64-bit message offsets");
+        return NULL;
+    }
+    off = PyMem_Malloc((n+1) * sizeof(*off));
+    if (!off) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    /* offsets buffers are not necessarily aligned */
+    memcpy(off, offsets->buf, (n+1) * sizeof(*off));
+    for (i = 0; i < n; i++) {
+        if (off[i] < 0 || off[i] > off[i+1] || off[i+1] > msgs->len) {
+            PyErr_SetString(PyExc_ValueError, "bad message offsets");
+            PyMem_Free(off);
+            return NULL;
+        }
+    }
+    return off;
+}
+
+PyDoc_STRVAR(ed25519_verify_many_doc,
+"verify_many(signatures, verifying_keys, messages, offsets, results)\n\
+\n\
+Check N signatures at once. 'signatures' is N*64 bytes, 'verifying_keys'\n\
+is N*32 bytes, and message i is messages[offsets[i]:offsets[i+1]], where\n\
+'offsets' holds N+1 native-endian signed 64-bit integers. Any object that\n\
+supports the buffer protocol is accepted, without copying. For each item,\n\
+results[i] is set to 1 if the signature is good, 0 if not. Returns the\n\
+number of good signatures. The GIL is released while checking.");
+
+static PyObject *
+ed25519_verify_many(PyObject *self, PyObject *args)
+{
+    Py_buffer sigs, keys, msgs, offsets, results;
+    Py_ssize_t n, i, good = 0;
+    const unsigned char *sig, *key, *m;
+    long long start, end, *off = NULL;
+    unsigned long long t;
+    unsigned char *res;
+    if (!PyArg_ParseTuple(args, y"*" y"*" y"*" y"*" "w*:verify_many",
+                          &sigs, &keys, &msgs, &offsets, &results))
+        return NULL;
+    n = sigs.len / SIGNATUREBYTES;
+    if (sigs.len % SIGNATUREBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "signatures must be a multiple of 64 bytes long");
+        n = -1;
+    } else if (keys.len != n * PUBLICKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need one 32-byte verifying key per signature");
+        n = -1;
+    } else if (results.len < n) {
+        PyErr_SetString(PyExc_ValueError, "results buffer is too small");
+        n = -1;
+    } else if (!(off = copy_offsets(n, &msgs, &offsets)))
+        n = -1;
+    if (n >= 0) {
+        sig = sigs.buf; key = keys.buf; m = msgs.buf; res = results.buf;
+        Py_BEGIN_ALLOW_THREADS
+        for (i = 0; i < n; i++) {
+            start = off[i];
+            end = off[i+1];
+            PROBE1(verify_entry, end - start);
+            t = stats_start();
+            res[i] = !crypto_sign_verify_detached(
+                sig + i*SIGNATUREBYTES, m + start, end - start,
+                key + i*PUBLICKEYBYTES, NULL);
+            stats_record(STAT_VERIFY, t, 1, !res[i],
+                         VERIFY_HASHED(end - start));
+            PROBE2(verify_return, end - start, res[i]);
+            good += res[i];
+        }
+        Py_END_ALLOW_THREADS
+    }
+    PyMem_Free(off);
+    PyBuffer_Release(&sigs);
+    PyBuffer_Release(&keys);
+    PyBuffer_Release(&msgs);
+    PyBuffer_Release(&offsets);
+    PyBuffer_Release(&results);
+    if (n < 0)
+        return NULL;
+    return PyLong_FromSsize_t(good);
+}
+
+/* Checks the arguments of verify_batch() and verify_batch_items().
+ * Returns the number of signatures, or -1 with an exception set. */
+static Py_ssize_t
+check_batch(const Py_buffer *sigs, const Py_buffer *keys,
+            const Py_buffer *msgs, const Py_buffer *offsets,
+            const Py_buffer *random, const Py_buffer *prepared)
+{
+    Py_ssize_t n = sigs->len / SIGNATUREBYTES;
+    if (sigs->len % SIGNATUREBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "signatures must be a multiple of 64 bytes long");
+        return -1;
+    }
+    if (keys->len != n * PUBLICKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need one 32-byte verifying key per signature");
+        return -1;
+    }
+    if (random->len != n * 32) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need 32 random bytes per signature");
+        return -1;
+    }
+    if (prepared->buf && prepared->len != n * PREPAREDKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need one 64-byte prepared key per signature");
+        return -1;
+    }
+    return n;
+}
+
+/* Allocates the message pointer and length arrays (filled in from a
+ * checked copy of the offsets) and the scratch space for a batch of n.
+ * Returns 0, or -1 with an exception set; the caller frees whatever was
+ * allocated either way. */
+static int
+batch_alloc(Py_ssize_t n, const Py_buffer *msgs, const Py_buffer *offsets,
+            const unsigned char ***m, unsigned long long **mlen,
+            void **scratch)
+{
+    Py_ssize_t i;
+    long long *off = copy_offsets(n, msgs, offsets);
+    if (!off)
+        return -1;
+    *m = PyMem_Malloc((n+1) * sizeof(**m));
+    *mlen = PyMem_Malloc((n+1) * sizeof(**mlen));
+    *scratch = PyMem_Malloc(crypto_sign_verify_batch_scratchbytes(n));
+    if (!*m || !*mlen || !*scratch) {
+        PyMem_Free(off);
+        PyErr_NoMemory();
+        return -1;
+    }
+    for (i = 0; i < n; i++) {
+        (*m)[i] = (const unsigned char *)msgs->buf + off[i];
+        (*mlen)[i] = off[i+1] - off[i];
+    }
+    PyMem_Free(off);
+    return 0;
+}
+
+static unsigned long long
+batch_bytes(Py_ssize_t n, const unsigned long long *mlen)
+{
+    unsigned long long bytes = 0;
+    Py_ssize_t i;
+    for (i = 0; i < n; i++)
+        bytes += mlen[i];
+    return bytes;
+}
+
+static unsigned long long
+batch_hashed(Py_ssize_t n, const unsigned long long *mlen)
+{
+    return batch_bytes(n, mlen) + 64 * (unsigned long long)n;
+}
+
+PyDoc_STRVAR(ed25519_verify_batch_doc,
+"verify_batch(signatures, verifying_keys, messages, offsets, random,\n\
+             prepared=None)\n\
+\n\
+Check N signatures (packed as for verify_many()) together, with a\n\
+multi-scalar multiplication over a random linear combination of their\n\
+verification equations, after checking that none of them has a\n\
+small-order part that the combination could miss. 'random' must be N*32\n\
+unpredictable bytes, e.g. from os.urandom(). Returns True if every\n\
+signature is good, and False if at least one is bad, without saying\n\
+which. The answer is the one checking each signature with open() would\n\
+give, except with probability around 2^-128. Batches of 160 signatures\n\
+or fewer are checked one signature at a time, which is cheaper for them.\n\
+Consecutive signatures by the same key share one term of the\n\
+combination, so a batch from a single signer is much cheaper. If given,\n\
+'prepared' holds the prepare() output for every key (N*64 bytes, as from\n\
+prepare_many()), and the keys are not decompressed again. Each entry is\n\
+checked against its key, and a signature whose entry does not match\n\
+fails. The GIL is released while checking.");
+
+static PyObject *
+ed25519_verify_batch(PyObject *self, PyObject *args)
+{
+    Py_buffer sigs, keys, msgs, offsets, random, prepared = {0};
+    Py_ssize_t n;
+    const unsigned char **m = NULL;
+    unsigned long long *mlen = NULL;
+    void *scratch = NULL;
+    unsigned long long start;
+    int result = -1, ok = 0;
+    if (!PyArg_ParseTuple(args, y"*" y"*" y"*" y"*" y"*" "|z*:verify_batch",
+                          &sigs, &keys, &msgs, &offsets, &random, &prepared))
+        return NULL;
+    n = check_batch(&sigs, &keys, &msgs, &offsets, &random, &prepared);
+    if (n < 0)
+        goto done;
+    if (batch_alloc(n, &msgs, &offsets, &m, &mlen, &scratch) < 0)
+        goto done;
+    Py_BEGIN_ALLOW_THREADS
+    /* both of these add up the message lengths, so only when wanted */
+    if (PROBE_ENABLED(verify_batch_entry))
+        PROBE2(verify_batch_entry, n, batch_bytes(n, mlen));
+    start = stats_start();
+    result = crypto_sign_verify_batch(sigs.buf, m, mlen, keys.buf,
+                                      prepared.buf, random.buf, n, scratch);
+    /* a failed batch does not say how many were bad: count one */
+    stats_record(STAT_VERIFY_BATCH, start, n, result != 0,
+                 start ? batch_hashed(n, mlen) : 0);
+    PROBE2(verify_batch_return, n, result == 0 ? n : 0);
+    Py_END_ALLOW_THREADS
+    ok = 1;
+ done:
+    PyMem_Free(m);
+    PyMem_Free(mlen);
+    PyMem_Free(scratch);
+    PyBuffer_Release(&sigs);
+    PyBuffer_Release(&keys);
+    PyBuffer_Release(&msgs);
+    PyBuffer_Release(&offsets);
+    PyBuffer_Release(&random);
+    PyBuffer_Release(&prepared);
+    if (!ok)
+        return NULL;
+    return PyBool_FromLong(result == 0);
+}
+
+PyDoc_STRVAR(ed25519_verify_batch_items_doc,
+"verify_batch_items(signatures, verifying_keys, messages, offsets, random,\n\
+                   results, threshold, prepared=None)\n\
+\n\
+Like verify_batch(), but finds the bad signatures: results[i] is set to 1\n\
+if signature i is good, 0 if not (again as open() would say, except with\n\
+probability around 2^-128), and the number of good signatures is\n\
+returned. If a batch fails, it is split in half and each half\n\
+checked again (reusing the decoded points and hashes), down to pieces of\n\
+'threshold' signatures, which are checked one by one. The GIL is released\n\
+while checking.");
+
+static PyObject *
+ed25519_verify_batch_items(PyObject *self, PyObject *args)
+{
+    Py_buffer sigs, keys, msgs, offsets, random, results, prepared = {0};
+    Py_ssize_t n, threshold;
+    const unsigned char **m = NULL;
+    unsigned long long *mlen = NULL;
+    void *scratch = NULL;
+    unsigned long long good = 0, start;
+    int ok = 0;
+    if (!PyArg_ParseTuple(args,
+                          y"*" y"*" y"*" y"*" y"*" "w*n|z*:verify_batch_items",
+                          &sigs, &keys, &msgs, &offsets, &random, &results,
+                          &threshold, &prepared))
+        return NULL;
+    n = check_batch(&sigs, &keys, &msgs, &offsets, &random, &prepared);
+    if (n < 0)
+        goto done;
+    if (results.len < n) {
+        PyErr_SetString(PyExc_ValueError, "results buffer is too small");
+        goto done;
+    }
+    if (threshold < 1) {
+        PyErr_SetString(PyExc_ValueError, "threshold must be at least 1");
+        goto done;
+    }
+    if (batch_alloc(n, &msgs, &offsets, &m, &mlen, &scratch) < 0)
+        goto done;
+    Py_BEGIN_ALLOW_THREADS
+    /* both of these add up the message lengths, so only when wanted */
+    if (PROBE_ENABLED(verify_batch_entry))
+        PROBE2(verify_batch_entry, n, batch_bytes(n, mlen));
+    start = stats_start();
+    good = crypto_sign_verify_batch_items(sigs.buf, m, mlen, keys.buf,
+                                          prepared.buf, random.buf, n,
+                                          results.buf, threshold, scratch);
+    stats_record(STAT_VERIFY_BATCH, start, n, n - good,
+                 start ? batch_hashed(n, mlen) : 0);
+    PROBE2(verify_batch_return, n, good);
+    Py_END_ALLOW_THREADS
+    ok = 1;
+ done:
+    PyMem_Free(m);
+    PyMem_Free(mlen);
+    PyMem_Free(scratch);
+    PyBuffer_Release(&sigs);
+    PyBuffer_Release(&keys);
+    PyBuffer_Release(&msgs);
+    PyBuffer_Release(&offsets);
+    PyBuffer_Release(&random);
+    PyBuffer_Release(&results);
+    PyBuffer_Release(&prepared);
+    if (!ok)
+        return NULL;
+    return PyLong_FromUnsignedLongLong(good);
+}
+
+PyDoc_STRVAR(ed25519_sign_many_doc,
+"sign_many(signing_keys, messages, offsets, signatures)\n\
+\n\
+Sign N messages at once. 'signing_keys' is N*64 bytes (one key per\n\
+message), message i is messages[offsets[i]:offsets[i+1]] as for\n\
+verify_many(), and the 64-byte signatures are written into the writable\n\
+'signatures' buffer, which must hold N*64 bytes. The GIL is released\n\
+while signing.");
+
+static PyObject *
+ed25519_sign_many(PyObject *self, PyObject *args)
+{
+    Py_buffer keys, msgs, offsets, sigs;
+    Py_ssize_t n = -1, i;
+    long long start, end, longest = 0, *off = NULL;
+    unsigned long long t;
+    unsigned char *sm = NULL; unsigned long long smlen;
+    const unsigned char *key, *m;
+    unsigned char *sig;
+    if (!PyArg_ParseTuple(args, y"*" y"*" y"*" "w*:sign_many",
+                          &keys, &msgs, &offsets, &sigs))
+        return NULL;
+    if (keys.len % SECRETKEYBYTES) {
+        PyErr_SetString(PyExc_ValueError,
+                        "signing keys must be a multiple of 64 bytes long");
+        goto done;
+    }
+    if (sigs.len < keys.len) {
+        PyErr_SetString(PyExc_ValueError, "signatures buffer is too small");
+        goto done;
+    }
+    if (!(off = copy_offsets(keys.len / SECRETKEYBYTES, &msgs, &offsets)))
+        goto done;
+    n = keys.len / SECRETKEYBYTES;
+    for (i = 0; i < n; i++) {
+        end = off[i+1] - off[i];
+        if (end > longest)
+            longest = end;
+    }
+    sm = PyMem_Malloc(longest + SIGNATUREBYTES);
+    if (!sm) {
+        PyErr_NoMemory();
+        n = -1;
+        goto done;
+    }
+    key = keys.buf; m = msgs.buf; sig = sigs.buf;
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < n; i++) {
+        start = off[i];
+        end = off[i+1];
+        PROBE1(sign_entry, end - start);
+        t = stats_start();
+        crypto_sign(sm, &smlen, m + start, end - start,
+                    key + i*SECRETKEYBYTES);
+        stats_record(STAT_SIGN, t, 1, 0, SIGN_HASHED(end - start));
+        PROBE1(sign_return, end - start);
+        memcpy(sig + i*SIGNATUREBYTES, sm, SIGNATUREBYTES);
+    }
+    Py_END_ALLOW_THREADS
+    PyMem_Free(sm);
+ done:
+    PyMem_Free(off);
+    PyBuffer_Release(&keys);
+    PyBuffer_Release(&msgs);
+    PyBuffer_Release(&offsets);
+    PyBuffer_Release(&sigs);
+    if (n < 0)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(ed25519_multiscalar_mul_doc,
+"multiscalar_mul(scalars, points, constant_time=False)\n\
+\n\
+Return the 32-byte encoding of the sum of [k_i]P_i, for N 32-byte\n\
+little-endian scalars k_i (taken modulo the group order) and N 32-byte\n\
+encoded points P_i, each packed into one buffer. Raises ValueError if a\n\
+point does not decode. Small N use Straus' method and large N\n\
+Pippenger's, with the window chosen by N. If 'constant_time' is true, a\n\
+(slower) method whose running time does not depend on the scalars is\n\
+used instead. The GIL is released while computing.");
+
+static PyObject *
+ed25519_multiscalar_mul(PyObject *self, PyObject *args)
+{
+    Py_buffer scalars, points;
+    int consttime = 0, result = 0;
+    Py_ssize_t n;
+    unsigned long long bad = 0;
+    unsigned char out[32];
+    void *scratch = NULL;
+    if (!PyArg_ParseTuple(args, y"*" y"*|i:multiscalar_mul",
+                          &scalars, &points, &consttime))
+        return NULL;
+    n = scalars.len / 32;
+    if (scalars.len % 32 || points.len != scalars.len) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need one 32-byte point per 32-byte scalar");
+        result = -1;
+        goto done;
+    }
+    /* PyMem_Malloc(0) still returns a pointer */
+    scratch = PyMem_Malloc(crypto_sign_multiscalar_scratchbytes(n));
+    if (!scratch) {
+        PyErr_NoMemory();
+        result = -1;
+        goto done;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    result = crypto_sign_multiscalar(out, scalars.buf, points.buf, n,
+                                     consttime, &bad, scratch);
+    Py_END_ALLOW_THREADS
+    if (result)
+        PyErr_Format(PyExc_ValueError, "point %zd is not on the curve",
+                     (Py_ssize_t)bad);
+ done:
+    PyMem_Free(scratch);
+    PyBuffer_Release(&scalars);
+    PyBuffer_Release(&points);
+    if (result)
+        return NULL;
+    return Py_BuildValue(y"#", out, (Py_ssize_t)32);
+}
+
+/* Unpadded base16/32/64 text encodings, as used by to_ascii() and
+ * from_ascii(): lowercase for base16 and base32, either case accepted when
+ * decoding, and any trailing '=' padding ignored. */
+
+static const char b16_alphabet[] = "0123456789abcdef";
+static const char b32_alphabet[] = "abcdefghijklmnopqrstuvwxyz234567";
+static const char b64_alphabet[] =
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+
+/* the value of each character, or 0xff, filled in by init_codecs() */
+static unsigned char b16_values[256], b32_values[256], b64_values[256];
+
+static void
+init_codecs(void)
+{
+    int i;
+    memset(b16_values, 0xff, 256);
+    memset(b32_values, 0xff, 256);
+    memset(b64_values, 0xff, 256);
+    for (i = 0; i < 16; i++) {
+        b16_values[(unsigned char)b16_alphabet[i]] = i;
+        if (i >= 10)
+            b16_values[(unsigned char)b16_alphabet[i] - 'a' + 'A'] = i;
+    }
+    for (i = 0; i < 32; i++) {
+        b32_values[(unsigned char)b32_alphabet[i]] = i;
+        if (i < 26)
+            b32_values['A' + i] = i;
+    }
+    for (i = 0; i < 64; i++)
+        b64_values[(unsigned char)b64_alphabet[i]] = i;
+}
+
+typedef struct {
+    int bits; /* per character */
+    const char *alphabet;
+    const unsigned char *values;
+} codec;
+
+/* Looks up the codec for 'base' (16, 32, or 64). Returns NULL, with an
+ * exception set, for any other base. */
+static const codec *
+get_codec(int base)
+{
+    static const codec codecs[] = {
+        {4, b16_alphabet, b16_values},
+        {5, b32_alphabet, b32_values},
+        {6, b64_alphabet, b64_values},
+    };
+    switch (base) {
+    case 16: return &codecs[0];
+    case 32: return &codecs[1];
+    case 64: return &codecs[2];
+    }
+    PyErr_SetString(PyExc_ValueError, "base must be 16, 32, or 64");
+    return NULL;
+}
+
+static Py_ssize_t
+encoded_len(const codec *c, Py_ssize_t len)
+{
+    return (len * 8 + c->bits - 1) / c->bits;
+}
+
+/* writes encoded_len(c, len) characters to out */
+static void
+encode_into(const codec *c, const unsigned char *in, Py_ssize_t len,
+            char *out)
+{
+    unsigned int acc = 0, nbits = 0, mask = (1 << c->bits) - 1;
+    Py_ssize_t i;
+    for (i = 0; i < len; i++) {
+        acc = (acc << 8) | in[i];
+        nbits += 8;
+        while (nbits >= (unsigned int)c->bits) {
+            nbits -= c->bits;
+            *out++ = c->alphabet[(acc >> nbits) & mask];
+        }
+    }
+    if (nbits)
+        *out++ = c->alphabet[(acc << (c->bits - nbits)) & mask];
+}
+
+/* Decodes len characters into out (which must hold len*bits/8 bytes).
+ * Returns the number of bytes written, or -1 (with ValueError set) if a
+ * character is not in the alphabet or the length is impossible. */
+static Py_ssize_t
+decode_into(const codec *c, const unsigned char *in, Py_ssize_t len,
+            unsigned char *out)
+{
+    unsigned int acc = 0, nbits = 0;
+    unsigned char v;
+    Py_ssize_t i, n = 0;
+    while (len > 0 && in[len-1] == '=')
+        len--;
+    for (i = 0; i < len; i++) {
+        v = c->values[in[i]];
+        if (v == 0xff) {
+            PyErr_SetString(PyExc_ValueError, "invalid character in input");
+            return -1;
+        }
+        acc = (acc << c->bits) | v;
+        nbits += c->bits;
+        if (nbits >= 8) {
+            nbits -= 8;
+            out[n++] = (acc >> nbits) & 0xff;
+        }
+    }
+    /* leftover bits are padding, so a whole leftover character means the
+     * input was truncated */
+    if (nbits >= (unsigned int)c->bits) {
+        PyErr_SetString(PyExc_ValueError, "invalid length of encoded input");
+        return -1;
+    }
+    return n;
+}
+
+PyDoc_STRVAR(ed25519_encode_doc,
+"encode(data, prefix, base)\n\
+\n\
+Return prefix followed by 'data' in unpadded base16, base32 (both in\n\
+lowercase), or base64, for 'base' of 16, 32, or 64.");
+
+static PyObject *
+ed25519_encode(PyObject *self, PyObject *args)
+{
+    Py_buffer data, prefix;
+    int base;
+    const codec *c;
+    PyObject *result = NULL;
+    char *out;
+    if (!PyArg_ParseTuple(args, y"*" y"*" "i:encode", &data, &prefix, &base))
+        return NULL;
+    c = get_codec(base);
+    if (c) {
+        result = PyBytes_FromStringAndSize(NULL, prefix.len +
+                                           encoded_len(c, data.len));
+        if (result) {
+            out = PyBytes_AS_STRING(result);
+            memcpy(out, prefix.buf, prefix.len);
+            encode_into(c, data.buf, data.len, out + prefix.len);
+        }
+    }
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&prefix);
+    return result;
+}
+
+/* Checks for the prefix and decodes the rest of s. Returns a new bytes
+ * object, or NULL with BadPrefixError or ValueError set. */
+static PyObject *
+decode_one(const codec *c, const unsigned char *s, Py_ssize_t len,
+           const Py_buffer *prefix)
+{
+    PyObject *result;
+    Py_ssize_t n;
+    if (len < prefix->len || memcmp(s, prefix->buf, prefix->len)) {
+        PyErr_SetString(BadPrefixError, "did not see expected prefix");
+        return NULL;
+    }
+    s += prefix->len;
+    len -= prefix->len;
+    result = PyBytes_FromStringAndSize(NULL, len * c->bits / 8);
+    if (!result)
+        return NULL;
+    n = decode_into(c, s, len, (unsigned char *)PyBytes_AS_STRING(result));
+    if (n < 0) {
+        Py_DECREF(result);
+        return NULL;
+    }
+    if (n != PyBytes_GET_SIZE(result))
+        _PyBytes_Resize(&result, n);
+    return result;
+}
+
+PyDoc_STRVAR(ed25519_decode_doc,
+"decode(s, prefix, base)\n\
+\n\
+The opposite of encode(). Raises BadPrefixError if 's' does not start\n\
+with 'prefix', and ValueError if the rest is not valid.");
+
+static PyObject *
+ed25519_decode(PyObject *self, PyObject *args)
+{
+    Py_buffer s, prefix;
+    int base;
+    const codec *c;
+    PyObject *result = NULL;
+    if (!PyArg_ParseTuple(args, y"*" y"*" "i:decode", &s, &prefix, &base))
+        return NULL;
+    c = get_codec(base);
+    if (c)
+        result = decode_one(c, s.buf, s.len, &prefix);
+    PyBuffer_Release(&s);
+    PyBuffer_Release(&prefix);
+    return result;
+}
+
+PyDoc_STRVAR(ed25519_encode_many_doc,
+"encode_many(data, itemsize, prefix, base)\n\
+\n\
+Split 'data' into pieces of 'itemsize' bytes (e.g. 64 for an array of\n\
+signatures) and return a list with the encode() of each one.");
+
+static PyObject *
+ed25519_encode_many(PyObject *self, PyObject *args)
+{
+    Py_buffer data, prefix;
+    Py_ssize_t itemsize, n, i, size;
+    int base;
+    const codec *c;
+    PyObject *result = NULL, *item;
+    char *out;
+    if (!PyArg_ParseTuple(args, y"*" "n" y"*" "i:encode_many",
+                          &data, &itemsize, &prefix, &base))
+        return NULL;
+    c = get_codec(base);
+    if (!c)
+        goto done;
+    if (itemsize <= 0 || data.len % itemsize) {
+        PyErr_SetString(PyExc_ValueError,
+                        "data must be a whole number of items long");
+        goto done;
+    }
+    n = data.len / itemsize;
+    size = prefix.len + encoded_len(c, itemsize);
+    result = PyList_New(n);
+    if (!result)
+        goto done;
+    for (i = 0; i < n; i++) {
+        item = PyBytes_FromStringAndSize(NULL, size);
+        if (!item) {
+            Py_CLEAR(result);
+            goto done;
+        }
+        out = PyBytes_AS_STRING(item);
+        memcpy(out, prefix.buf, prefix.len);
+        encode_into(c, (const unsigned char *)data.buf + i*itemsize,
+                    itemsize, out + prefix.len);
+        PyList_SET_ITEM(result, i, item);
+    }
+ done:
+    PyBuffer_Release(&data);
+    PyBuffer_Release(&prefix);
+    return result;
+}
+
+PyDoc_STRVAR(ed25519_decode_many_doc,
+"decode_many(strings, prefix, base, itemsize)\n\
+\n\
+decode() each of a sequence of strings, each of which must decode to\n\
+'itemsize' bytes, and return the results joined together (ready for\n\
+verify_many() and friends).");
+
+static PyObject *
+ed25519_decode_many(PyObject *self, PyObject *args)
+{
+    PyObject *strings, *seq = NULL, *result = NULL, *item;
+    Py_buffer prefix, s;
+    Py_ssize_t itemsize, n, i, len, got;
+    int base;
+    const codec *c;
+    unsigned char *out, *tmp = NULL;
+    if (!PyArg_ParseTuple(args, "O" y"*" "in:decode_many",
+                          &strings, &prefix, &base, &itemsize))
+        return NULL;
+    c = get_codec(base);
+    if (!c)
+        goto done;
+    if (itemsize <= 0) {
+        PyErr_SetString(PyExc_ValueError, "itemsize must be positive");
+        goto done;
+    }
+    seq = PySequence_Fast(strings, "strings must be a sequence");
+    if (!seq)
+        goto done;
+    n = PySequence_Fast_GET_SIZE(seq);
+    result = PyBytes_FromStringAndSize(NULL, n * itemsize);
+    /* room to decode an over-long string before rejecting it */
+    tmp = PyMem_Malloc(itemsize + 8);
+    if (!result || !tmp) {
+        if (!tmp)
+            PyErr_NoMemory();
+        Py_CLEAR(result);
+        goto done;
+    }
+    out = (unsigned char *)PyBytes_AS_STRING(result);
+    for (i = 0; i < n; i++) {
+        item = PySequence_Fast_GET_ITEM(seq, i);
+        if (PyObject_GetBuffer(item, &s, PyBUF_SIMPLE) < 0) {
+            Py_CLEAR(result);
+            goto done;
+        }
+        len = s.len - prefix.len;
+        got = -2;
+        if (len < 0 || memcmp(s.buf, prefix.buf, prefix.len))
+            PyErr_SetString(BadPrefixError, "did not see expected prefix");
+        else if (len * c->bits / 8 > itemsize + 8)
+            got = -1;
+        else
+            got = decode_into(c, (const unsigned char *)s.buf + prefix.len,
+                              len, tmp);
+        PyBuffer_Release(&s);
+        if (got != itemsize) {
+            if (got >= -1 && !PyErr_Occurred())
+                PyErr_Format(PyExc_ValueError,
+                             "item %zd does not decode to %zd bytes",
+                             i, itemsize);
+            Py_CLEAR(result);
+            goto done;
+        }
+        memcpy(out + i*itemsize, tmp, itemsize);
+    }
+ done:
+    PyMem_Free(tmp);
+    Py_XDECREF(seq);
+    PyBuffer_Release(&prefix);
+    return result;
+}
+
+
+/* --------------------------------------------------------------------- */
+
+/* Point and Scalar objects: the curve's group of points and its scalars
+ * (integers modulo the group order), for protocols built on top of the
+ * signatures. Both are immutable, and each caches its 32-byte encoding,
+ * which for a point costs an inversion to compute. */
+
+typedef struct {
+    PyObject_HEAD
+    ge25519 p;
+    PyObject *encoded; /* bytes, or NULL until needed */
+} PointObject;
+
+typedef struct {
+    PyObject_HEAD
+    sc25519 s;
+    PyObject *encoded;
+} ScalarObject;
+
+static PyTypeObject PointType, ScalarType;
+#define Point_Check(o) PyObject_TypeCheck(o, &PointType)
+#define Scalar_Check(o) PyObject_TypeCheck(o, &ScalarType)
+
+#if PY_VERSION_HEX < 0x03020000
+typedef long Py_hash_t;
+#endif
+#ifndef Py_RETURN_NOTIMPLEMENTED
+#define Py_RETURN_NOTIMPLEMENTED \
+    return Py_INCREF(Py_NotImplemented), Py_NotImplemented
+#endif
+
+#if PY_MAJOR_VERSION >= 3
+#define GROUP_TPFLAGS Py_TPFLAGS_DEFAULT
+#else
+/* let the number methods see operands of other types */
+#define GROUP_TPFLAGS (Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES)
+#endif
+
+static PyObject *
+point_from(const ge25519 *p)
+{
+    PointObject *self = PyObject_New(PointObject, &PointType);
+    if (self) {
+        self->p = *p;
+        self->encoded = NULL;
+    }
+    return (PyObject *)self;
+}
+
+static PyObject *
+scalar_from(const sc25519 *s)
+{
+    ScalarObject *self = PyObject_New(ScalarObject, &ScalarType);
+    if (self) {
+        self->s = *s;
+        self->encoded = NULL;
+    }
+    return (PyObject *)self;
+}
+
+static void
+point_dealloc(PointObject *self)
+{
+    Py_XDECREF(self->encoded);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static void
+scalar_dealloc(ScalarObject *self)
+{
+    Py_XDECREF(self->encoded);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+PyDoc_STRVAR(point_doc,
+"Point(encoding)\n\
+\n\
+A point on the curve, decoded from its 32-byte encoding (the format of\n\
+verifying keys and of the first half of signatures). Raises ValueError\n\
+if it is not on the curve. Points can be added, subtracted and negated,\n\
+and multiplied by a Scalar (p * s or s * p, in constant time; see also\n\
+mul_vartime()). to_bytes() returns the encoding, computed once.");
+
+static PyObject *
+point_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"encoding", NULL};
+    const unsigned char *enc; Py_ssize_t enc_len;
+    ge25519 p;
+    int canonical;
+    PointObject *self;
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, y"#:Point", kwlist,
+                                     &enc, &enc_len))
+        return NULL;
+    if (enc_len != 32) {
+        PyErr_SetString(PyExc_TypeError, "points are 32 byte strings");
+        return NULL;
+    }
+    canonical = ge25519_unpack_vartime(&p, enc);
+    if (canonical < 0) {
+        PyErr_SetString(PyExc_ValueError, "not a point on the curve");
+        return NULL;
+    }
+    self = (PointObject *)type->tp_alloc(type, 0);
+    if (!self)
+        return NULL;
+    self->p = p;
+    /* the argument can serve as the cached encoding, if it is the one
+     * to_bytes() would give */
+    self->encoded = NULL;
+    if (canonical) {
+        self->encoded = PyBytes_FromStringAndSize((const char *)enc, 32);
+        if (!self->encoded) {
+            Py_DECREF(self);
+            return NULL;
+        }
+    }
+    return (PyObject *)self;
+}
+
+static PyObject *
+point_to_bytes(PointObject *self)
+{
+    unsigned char out[32];
+    if (!self->encoded) {
+        ge25519_pack(out, &self->p);
+        self->encoded = PyBytes_FromStringAndSize((const char *)out, 32);
+        if (!self->encoded)
+            return NULL;
+    }
+    Py_INCREF(self->encoded);
+    return self->encoded;
+}
+
+static PyObject *
+point_reduce(PointObject *self)
+{
+    PyObject *enc = point_to_bytes(self), *result;
+    if (!enc)
+        return NULL;
+    result = Py_BuildValue("(O(O))", Py_TYPE(self), enc);
+    Py_DECREF(enc);
+    return result;
+}
+
+PyDoc_STRVAR(point_mul_vartime_doc,
+"mul_vartime(scalar)\n\
+\n\
+Return [scalar]self, faster than self * scalar, but in time that depends\n\
+on the scalar: use it only for public scalars.");
+
+static PyObject *
+point_mul_vartime(PointObject *self, PyObject *arg)
+{
+    ge25519 r, p = self->p;
+    sc25519 s;
+    if (!Scalar_Check(arg)) {
+        PyErr_SetString(PyExc_TypeError, "mul_vartime() takes a Scalar");
+        return NULL;
+    }
+    s = ((ScalarObject *)arg)->s;
+    Py_BEGIN_ALLOW_THREADS
+    ge25519_scalarmult_vartime(&r, &p, &s);
+    Py_END_ALLOW_THREADS
+    return point_from(&r);
+}
+
+PyDoc_STRVAR(point_base_doc,
+"base()\n\
+\n\
+Return the base point B, whose multiples are the verifying keys.");
+
+static PyObject *
+point_base(PyObject *cls)
+{
+    return point_from(&ge25519_base);
+}
+
+PyDoc_STRVAR(point_identity_doc,
+"identity()\n\
+\n\
+Return the neutral element of the group.");
+
+static PyObject *
+point_identity(PyObject *cls)
+{
+    ge25519 r;
+    ge25519_setneutral(&r);
+    return point_from(&r);
+}
+
+PyDoc_STRVAR(point_mul_base_doc,
+"mul_base(scalar)\n\
+\n\
+Return [scalar]B, in constant time, using the table of multiples of B\n\
+that signing uses, so it is several times faster than base() * scalar.");
+
+static PyObject *
+point_mul_base(PyObject *cls, PyObject *arg)
+{
+    ge25519 r;
+    sc25519 s;
+    if (!Scalar_Check(arg)) {
+        PyErr_SetString(PyExc_TypeError, "mul_base() takes a Scalar");
+        return NULL;
+    }
+    s = ((ScalarObject *)arg)->s;
+    Py_BEGIN_ALLOW_THREADS
+    ge25519_scalarmult_base(&r, &s);
+    Py_END_ALLOW_THREADS
+    return point_from(&r);
+}
+
+static PyObject *
+point_add(PyObject *a, PyObject *b)
+{
+    ge25519 r;
+    if (!Point_Check(a) || !Point_Check(b))
+        Py_RETURN_NOTIMPLEMENTED;
+    ge25519_add(&r, &((PointObject *)a)->p, &((PointObject *)b)->p);
+    return point_from(&r);
+}
+
+static PyObject *
+point_sub(PyObject *a, PyObject *b)
+{
+    ge25519 r;
+    if (!Point_Check(a) || !Point_Check(b))
+        Py_RETURN_NOTIMPLEMENTED;
+    ge25519_sub(&r, &((PointObject *)a)->p, &((PointObject *)b)->p);
+    return point_from(&r);
+}
+
+static PyObject *
+point_neg(PointObject *self)
+{
+    ge25519 r;
+    ge25519_neg(&r, &self->p);
+    return point_from(&r);
+}
+
+/* nb_multiply for both types: Point * Scalar (either way round, in
+ * constant time) and Scalar * Scalar */
+static PyObject *
+group_multiply(PyObject *a, PyObject *b)
+{
+    ge25519 r, p;
+    sc25519 s;
+    if (Scalar_Check(a) && Scalar_Check(b)) {
+        sc25519_mul(&s, &((ScalarObject *)a)->s, &((ScalarObject *)b)->s);
+        return scalar_from(&s);
+    }
+    if (Scalar_Check(a)) {
+        PyObject *t = a; a = b; b = t;
+    }
+    if (!Point_Check(a) || !Scalar_Check(b))
+        Py_RETURN_NOTIMPLEMENTED;
+    p = ((PointObject *)a)->p;
+    s = ((ScalarObject *)b)->s;
+    Py_BEGIN_ALLOW_THREADS
+    ge25519_scalarmult(&r, &p, &s);
+    Py_END_ALLOW_THREADS
+    return point_from(&r);
+}
+
+static PyObject *
+point_richcompare(PyObject *a, PyObject *b, int op)
+{
+    PointObject *p = (PointObject *)a, *q = (PointObject *)b;
+    int eq;
+    if (!Point_Check(a) || !Point_Check(b) || (op != Py_EQ && op != Py_NE))
+        Py_RETURN_NOTIMPLEMENTED;
+    if (p->encoded && q->encoded)
+        eq = !memcmp(PyBytes_AS_STRING(p->encoded),
+                     PyBytes_AS_STRING(q->encoded), 32);
+    else
+        eq = ge25519_iseq_vartime(&p->p, &q->p);
+    return PyBool_FromLong(eq == (op == Py_EQ));
+}
+
+static Py_hash_t
+point_hash(PointObject *self)
+{
+    Py_hash_t h;
+    PyObject *enc = point_to_bytes(self);
+    if (!enc)
+        return -1;
+    h = PyObject_Hash(enc);
+    Py_DECREF(enc);
+    return h;
+}
+
+static PyMethodDef point_methods[] = {
+    {"to_bytes", (PyCFunction)point_to_bytes, METH_NOARGS,
+     "to_bytes()\n\nReturn the 32-byte encoding."},
+    {"mul_vartime", (PyCFunction)point_mul_vartime, METH_O,
+     point_mul_vartime_doc},
+    {"base", (PyCFunction)point_base, METH_NOARGS | METH_CLASS,
+     point_base_doc},
+    {"identity", (PyCFunction)point_identity, METH_NOARGS | METH_CLASS,
+     point_identity_doc},
+    {"mul_base", (PyCFunction)point_mul_base, METH_O | METH_CLASS,
+     point_mul_base_doc},
+    {"__reduce__", (PyCFunction)point_reduce, METH_NOARGS, NULL},
+    {NULL, NULL} /* sentinel */
+};
+
+static PyNumberMethods point_as_number = {
+    .nb_add = point_add,
+    .nb_subtract = point_sub,
+    .nb_multiply = group_multiply,
+    .nb_negative = (unaryfunc)point_neg,
+};
+
+static PyTypeObject PointType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "ed25519.Point",
+    .tp_basicsize = sizeof(PointObject),
+    .tp_dealloc = (destructor)point_dealloc,
+    .tp_as_number = &point_as_number,
+    .tp_hash = (hashfunc)point_hash,
+    .tp_flags = GROUP_TPFLAGS,
+    .tp_doc = point_doc,
+    .tp_richcompare = point_richcompare,
+    .tp_methods = point_methods,
+    .tp_new = point_new,
+};
+
+PyDoc_STRVAR(scalar_doc,
+"Scalar(data)\n\
+\n\
+An integer modulo the group order L, from 32 little-endian bytes or (for\n\
+example, to turn a SHA-512 digest into a uniformly distributed scalar) 64,\n\
+reduced modulo L. Scalars can be added, subtracted, negated and\n\
+multiplied, all in constant time, and multiply Points. to_bytes()\n\
+returns the 32-byte encoding of the reduced value.");
+
+static PyObject *
+scalar_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"data", NULL};
+    const unsigned char *data; Py_ssize_t data_len;
+    ScalarObject *self;
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, y"#:Scalar", kwlist,
+                                     &data, &data_len))
+        return NULL;
+    if (data_len != 32 && data_len != 64) {
+        PyErr_SetString(PyExc_TypeError,
+                        "scalars are made from 32 or 64 byte strings");
+        return NULL;
+    }
+    self = (ScalarObject *)type->tp_alloc(type, 0);
+    if (!self)
+        return NULL;
+    if (data_len == 32)
+        sc25519_from32bytes(&self->s, data);
+    else
+        sc25519_from64bytes(&self->s, data);
+    self->encoded = NULL;
+    return (PyObject *)self;
+}
+
+static PyObject *
+scalar_to_bytes(ScalarObject *self)
+{
+    unsigned char out[32];
+    if (!self->encoded) {
+        sc25519_to32bytes(out, &self->s);
+        self->encoded = PyBytes_FromStringAndSize((const char *)out, 32);
+        if (!self->encoded)
+            return NULL;
+    }
+    Py_INCREF(self->encoded);
+    return self->encoded;
+}
+
+static PyObject *
+scalar_reduce(ScalarObject *self)
+{
+    PyObject *enc = scalar_to_bytes(self), *result;
+    if (!enc)
+        return NULL;
+    result = Py_BuildValue("(O(O))", Py_TYPE(self), enc);
+    Py_DECREF(enc);
+    return result;
+}
+
+static PyObject *
+scalar_add(PyObject *a, PyObject *b)
+{
+    sc25519 r;
+    if (!Scalar_Check(a) || !Scalar_Check(b))
+        Py_RETURN_NOTIMPLEMENTED;
+    sc25519_add(&r, &((ScalarObject *)a)->s, &((ScalarObject *)b)->s);
+    return scalar_from(&r);
+}
+
+static PyObject *
+scalar_sub(PyObject *a, PyObject *b)
+{
+    sc25519 r;
+    if (!Scalar_Check(a) || !Scalar_Check(b))
+        Py_RETURN_NOTIMPLEMENTED;
+    sc25519_neg(&r, &((ScalarObject *)b)->s);
+    sc25519_add(&r, &((ScalarObject *)a)->s, &r);
+    return scalar_from(&r);
+}
+
+static PyObject *
+scalar_neg(ScalarObject *self)
+{
+    sc25519 r;
+    sc25519_neg(&r, &self->s);
+    return scalar_from(&r);
+}
+
+static PyObject *
+scalar_richcompare(PyObject *a, PyObject *b, int op)
+{
+    int eq;
+    if (!Scalar_Check(a) || !Scalar_Check(b) || (op != Py_EQ && op != Py_NE))
+        Py_RETURN_NOTIMPLEMENTED;
+    eq = sc25519_iseq(&((ScalarObject *)a)->s, &((ScalarObject *)b)->s);
+    return PyBool_FromLong(eq == (op == Py_EQ));
+}
+
+static Py_hash_t
+scalar_hash(ScalarObject *self)
+{
+    Py_hash_t h;
+    PyObject *enc = scalar_to_bytes(self);
+    if (!enc)
+        return -1;
+    h = PyObject_Hash(enc);
+    Py_DECREF(enc);
+    return h;
+}
+
+static PyMethodDef scalar_methods[] = {
+    {"to_bytes", (PyCFunction)scalar_to_bytes, METH_NOARGS,
+     "to_bytes()\n\nReturn the 32-byte little-endian encoding."},
+    {"__reduce__", (PyCFunction)scalar_reduce, METH_NOARGS, NULL},
+    {NULL, NULL} /* sentinel */
+};
+
+static PyNumberMethods scalar_as_number = {
+    .nb_add = scalar_add,
+    .nb_subtract = scalar_sub,
+    .nb_multiply = group_multiply,
+    .nb_negative = (unaryfunc)scalar_neg,
+};
+
+static PyTypeObject ScalarType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "ed25519.Scalar",
+    .tp_basicsize = sizeof(ScalarObject),
+    .tp_dealloc = (destructor)scalar_dealloc,
+    .tp_as_number = &scalar_as_number,
+    .tp_hash = (hashfunc)scalar_hash,
+    .tp_flags = GROUP_TPFLAGS,
+    .tp_doc = scalar_doc,
+    .tp_richcompare = scalar_richcompare,
+    .tp_methods = scalar_methods,
+    .tp_new = scalar_new,
+};
+
+static int
+add_group_types(PyObject *m)
+{
+    if (PyType_Ready(&PointType) < 0 || PyType_Ready(&ScalarType) < 0 ||
+        PyType_Ready(&PrefixStateType) < 0)
+        return -1;
+    Py_INCREF(&PointType);
+    PyModule_AddObject(m, "Point", (PyObject *)&PointType);
+    Py_INCREF(&ScalarType);
+    PyModule_AddObject(m, "Scalar", (PyObject *)&ScalarType);
+    return 0;
+}
 
 /* List of functions defined in the module */
 
 static PyMethodDef ed25519_methods[] = {
     {"publickey",  ed25519_publickey,  METH_VARARGS, ed25519_publickey_doc},
     {"sign",  ed25519_sign,  METH_VARARGS, ed25519_sign_doc},
+    {"sign_prefix_init", ed25519_sign_prefix_init, METH_VARARGS,
+     ed25519_sign_prefix_init_doc},
+    {"sign_prefixed", ed25519_sign_prefixed, METH_VARARGS,
+     ed25519_sign_prefixed_doc},
     {"open", ed25519_open, METH_VARARGS, ed25519_open_doc},
+    {"prepare", ed25519_prepare, METH_VARARGS, ed25519_prepare_doc},
+    {"check_prepared", ed25519_check_prepared, METH_VARARGS,
+     ed25519_check_prepared_doc},
+    {"prepare_many", ed25519_prepare_many, METH_VARARGS,
+     ed25519_prepare_many_doc},
+    {"validate_keys", ed25519_validate_keys, METH_VARARGS,
+     ed25519_validate_keys_doc},
+    {"verify_many", ed25519_verify_many, METH_VARARGS,
+     ed25519_verify_many_doc},
+    {"verify_batch", ed25519_verify_batch, METH_VARARGS,
+     ed25519_verify_batch_doc},
+    {"verify_batch_items", ed25519_verify_batch_items, METH_VARARGS,
+     ed25519_verify_batch_items_doc},
+    {"sign_many", ed25519_sign_many, METH_VARARGS, ed25519_sign_many_doc},
+    {"multiscalar_mul", ed25519_multiscalar_mul, METH_VARARGS,
+     ed25519_multiscalar_mul_doc},
+    {"encode", ed25519_encode, METH_VARARGS, ed25519_encode_doc},
+    {"decode", ed25519_decode, METH_VARARGS, ed25519_decode_doc},
+    {"encode_many", ed25519_encode_many, METH_VARARGS,
+     ed25519_encode_many_doc},
+    {"decode_many", ed25519_decode_many, METH_VARARGS,
+     ed25519_decode_many_doc},
+    {"stats_enable", ed25519_stats_enable, METH_VARARGS,
+     ed25519_stats_enable_doc},
+    {"stats_snapshot", ed25519_stats_snapshot, METH_NOARGS,
+     ed25519_stats_snapshot_doc},
+    {"stats_reset", ed25519_stats_reset, METH_NOARGS,
+     ed25519_stats_reset_doc},
+    {"profile_snapshot", ed25519_profile_snapshot, METH_NOARGS,
+     ed25519_profile_snapshot_doc},
+    {"profile_reset", ed25519_profile_reset, METH_NOARGS,
+     ed25519_profile_reset_doc},
     {NULL, NULL} /* sentinel */
 };
 
@@ -211,9 +2063,38 @@ init_ed25519(void)
     }
     Py_INCREF(BadSignatureError);
     PyModule_AddObject(m, "BadSignatureError", BadSignatureError);
+    if (BadPrefixError == NULL) {
+        BadPrefixError = PyErr_NewException("ed25519.BadPrefixError",
+                                            NULL, NULL);
+        if (BadPrefixError == NULL) {
+#if PY_MAJOR_VERSION >= 3
+            return NULL;
+#else
+            return;
+#endif
+        }
+    }
+    Py_INCREF(BadPrefixError);
+    PyModule_AddObject(m, "BadPrefixError", BadPrefixError);
+    init_codecs();
+    if (add_group_types(m) < 0) {
+#if PY_MAJOR_VERSION >= 3
+        return NULL;
+#else
+        return;
+#endif
+    }
     PyModule_AddIntConstant(m, "SECRETKEYBYTES", SECRETKEYBYTES);
     PyModule_AddIntConstant(m, "PUBLICKEYBYTES", PUBLICKEYBYTES);
     PyModule_AddIntConstant(m, "SIGNATUREKEYBYTES", SIGNATUREBYTES);
+    PyModule_AddIntConstant(m, "PREPAREDKEYBYTES", PREPAREDKEYBYTES);
+    PyModule_AddIntConstant(m, "KEY_NOT_ON_CURVE",
+                            crypto_sign_KEY_NOT_ON_CURVE);
+    PyModule_AddIntConstant(m, "KEY_NONCANONICAL",
+                            crypto_sign_KEY_NONCANONICAL);
+    PyModule_AddIntConstant(m, "KEY_SMALL_ORDER", crypto_sign_KEY_SMALL_ORDER);
+    PyModule_AddIntConstant(m, "KEY_MIXED_ORDER", crypto_sign_KEY_MIXED_ORDER);
+    PyModule_AddIntConstant(m, "STATS_BUCKETS", STAT_BUCKETS);
 #if PY_MAJOR_VERSION >= 3
     return m;
 #endif
@@ -0,0 +1,201 @@
+/* Microbenchmarks for the layers under crypto_sign: field and scalar
+ * arithmetic, group operations, and SHA-512.
+ *
+ * Each primitive is timed in runs of ITERATIONS calls, and the median of
+ * RUNS runs (divided by ITERATIONS) is reported, along with the fastest
+ * run. Times are in CPU cycles, counted with perf_event_open() where the
+ * kernel allows it, else with rdtsc (which counts reference cycles, at a
+ * constant rate that may differ from the actual clock), else nanoseconds.
+ * Set MICROBENCH_TIMER to "perf", "rdtsc" or "ns" to choose.
+ *
+ * The harness only uses the names declared in fe25519.h, sc25519.h,
+ * ge25519.h, sha512.h and crypto_sign.h, so it builds against any backend
+ * directory that provides them: see the Makefile. */
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#ifdef __linux__
+#include <unistd.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#include <linux/perf_event.h>
+#endif
+#include "crypto_sign.h"
+#include "fe25519.h"
+#include "sc25519.h"
+#include "ge25519.h"
+#include "sha512.h"
+
+#define RUNS 101
+#define MAXLEN 16384
+
+/* --- timers --- */
+
+typedef unsigned long long ticks;
+
+static const char *timer_unit = "ns";
+static ticks (*timer_read)(void);
+
+static ticks read_ns(void)
+{
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (ticks)ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+}
+
+#if defined(__x86_64__) || defined(__i386__)
+static ticks read_rdtsc(void)
+{
+  unsigned int lo, hi;
+  __asm__ __volatile__ ("rdtsc" : "=a" (lo), "=d" (hi));
+  return ((ticks)hi << 32) | lo;
+}
+#endif
+
+#ifdef __linux__
+static int perf_fd = -1;
+
+static ticks read_perf(void)
+{
+  ticks count = 0;
+  if (read(perf_fd, &count, sizeof(count)) != sizeof(count))
+    return 0;
+  return count;
+}
+
+static int open_perf(void)
+{
+  struct perf_event_attr attr;
+  memset(&attr, 0, sizeof(attr));
+  attr.size = sizeof(attr);
+  attr.type = PERF_TYPE_HARDWARE;
+  attr.config = PERF_COUNT_HW_CPU_CYCLES;
+  attr.exclude_kernel = 1;
+  attr.exclude_hv = 1;
+  perf_fd = syscall(__NR_perf_event_open, &attr, 0, -1, -1, 0);
+  if (perf_fd < 0)
+    return -1;
+  ioctl(perf_fd, PERF_EVENT_IOC_RESET, 0);
+  ioctl(perf_fd, PERF_EVENT_IOC_ENABLE, 0);
+  return 0;
+}
+#endif
+
+static void timer_init(void)
+{
+  const char *choice = getenv("MICROBENCH_TIMER");
+  if (!choice) choice = "";
+#ifdef __linux__
+  if ((!*choice || !strcmp(choice, "perf")) && open_perf() == 0)
+  {
+    timer_read = read_perf;
+    timer_unit = "cycles (perf)";
+    return;
+  }
+#endif
+#if defined(__x86_64__) || defined(__i386__)
+  if (!*choice || !strcmp(choice, "rdtsc") || !strcmp(choice, "perf"))
+  {
+    timer_read = read_rdtsc;
+    timer_unit = "cycles (rdtsc)";
+    return;
+  }
+#endif
+  timer_read = read_ns;
+  timer_unit = "ns";
+}
+
+/* --- the primitives --- */
+
+static fe25519 fa, fb;
+static sc25519 sa, sb;
+static ge25519 pa, pb;
+static unsigned char bytes[MAXLEN + 64];
+static unsigned long long hashlen;
+static unsigned char sk[SECRETKEYBYTES], pk[PUBLICKEYBYTES];
+static unsigned char sm[SIGNATUREBYTES + 64], m[SIGNATUREBYTES + 64];
+static unsigned long long smlen, mlen;
+
+/* Each one feeds its output back into its input, so calls cannot be
+ * overlapped or skipped. */
+static void do_fe_mul(void) { fe25519_mul(&fa, &fa, &fb); }
+static void do_fe_square(void) { fe25519_square(&fa, &fa); }
+static void do_fe_invert(void) { fe25519_invert(&fa, &fa); }
+static void do_sc_from64(void) { sc25519_from64bytes(&sa, bytes); bytes[0] ^= sa.v[0]; }
+static void do_sc_mul(void) { sc25519_mul(&sa, &sa, &sb); }
+static void do_ge_base(void) { ge25519_scalarmult_base(&pa, &sa); sa.v[0] ^= pa.x.v[0] & 1; }
+static void do_ge_double(void) { ge25519_double_scalarmult_vartime(&pa, &pa, &sa, &pb, &sb); }
+static void do_ge_pack(void) { ge25519_pack(bytes, &pa); pa.x.v[0] ^= bytes[0] & 1; }
+static void do_ge_unpack(void) { ge25519_unpackneg_vartime(&pb, pk); }
+static void do_sha512(void) { crypto_hash_sha512(bytes, bytes, hashlen); }
+static void do_sign(void) { crypto_sign(sm, &smlen, m, 64, sk); }
+static void do_open(void) { crypto_sign_open(m, &mlen, sm, smlen, pk); }
+
+static int compare_ticks(const void *a, const void *b)
+{
+  ticks x = *(const ticks *)a, y = *(const ticks *)b;
+  return x < y ? -1 : x > y;
+}
+
+static void bench(const char *name, void (*fn)(void), int iterations)
+{
+  ticks runs[RUNS], start;
+  int r, i;
+  for (i = 0; i < iterations; i++) fn(); /* warm up */
+  for (r = 0; r < RUNS; r++)
+  {
+    start = timer_read();
+    for (i = 0; i < iterations; i++) fn();
+    runs[r] = timer_read() - start;
+  }
+  qsort(runs, RUNS, sizeof(ticks), compare_ticks);
+  printf("%-36s %12.1f %12.1f\n", name,
+         (double)runs[RUNS/2] / iterations, (double)runs[0] / iterations);
+  fflush(stdout);
+}
+
+int main(int argc, char *argv[])
+{
+  static const unsigned long long lengths[] = {0, 64, 128, 1024, MAXLEN};
+  unsigned char seed[32];
+  char name[64];
+  unsigned int i;
+  const char *only = argc > 1 ? argv[1] : NULL;
+
+  timer_init();
+  for (i = 0; i < sizeof(bytes); i++) bytes[i] = (unsigned char)(i * 151 + 7);
+  for (i = 0; i < 32; i++) seed[i] = (unsigned char)(i * 37 + 1);
+  crypto_sign_publickey(pk, sk, seed);
+  memcpy(m, bytes, 64);
+  crypto_sign(sm, &smlen, m, 64, sk);
+  fe25519_unpack(&fa, bytes);
+  fe25519_unpack(&fb, bytes + 32);
+  sc25519_from64bytes(&sa, bytes);
+  sc25519_from64bytes(&sb, bytes + 64);
+  ge25519_scalarmult_base(&pa, &sa);
+  ge25519_scalarmult_base(&pb, &sb);
+
+  printf("%-36s %12s %12s\n", timer_unit, "median", "min");
+#define BENCH(label, fn, iterations) \
+  if (!only || strstr(label, only)) bench(label, fn, iterations)
+  BENCH("fe25519_mul", do_fe_mul, 1000);
+  BENCH("fe25519_square", do_fe_square, 1000);
+  BENCH("fe25519_invert", do_fe_invert, 10);
+  BENCH("sc25519_from64bytes", do_sc_from64, 100);
+  BENCH("sc25519_mul", do_sc_mul, 100);
+  BENCH("ge25519_scalarmult_base", do_ge_base, 1);
+  BENCH("ge25519_double_scalarmult_vartime", do_ge_double, 1);
+  BENCH("ge25519_pack", do_ge_pack, 10);
+  BENCH("ge25519_unpackneg_vartime", do_ge_unpack, 10);
+  for (i = 0; i < sizeof(lengths)/sizeof(lengths[0]); i++)
+  {
+    hashlen = lengths[i];
+    snprintf(name, sizeof(name), "crypto_hash_sha512(%llu)", hashlen);
+    BENCH(name, do_sha512, hashlen > 1024 ? 1 : 10);
+  }
+  BENCH("crypto_sign(64)", do_sign, 1);
+  BENCH("crypto_sign_open(64)", do_open, 1);
+  return 0;
+}
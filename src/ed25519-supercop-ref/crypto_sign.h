@@ -4,10 +4,38 @@
 #define SECRETKEYBYTES 64
 #define PUBLICKEYBYTES 32
 #define SIGNATUREBYTES 64
+#define PREPAREDKEYBYTES 64
 
 extern int crypto_sign(unsigned char *,unsigned long long *,const unsigned char *,unsigned long long,const unsigned char *);
 extern int crypto_sign_open(unsigned char *,unsigned long long *,const unsigned char *,unsigned long long,const unsigned char *);
 extern int crypto_sign_keypair(unsigned char *,unsigned char *);
 extern int crypto_sign_publickey(unsigned char *pk, unsigned char *sk, unsigned char *seed);
+extern int crypto_sign_prepare_publickey(unsigned char *prepared, const unsigned char *pk);
+extern int crypto_sign_check_prepared(const unsigned char *prepared, const unsigned char *pk);
+extern unsigned long long crypto_sign_prepare_publickeys(unsigned char *prepared,const unsigned char *pks,unsigned long long n,unsigned char *valid);
+extern int crypto_sign_open_prepared(unsigned char *,unsigned long long *,const unsigned char *,unsigned long long,const unsigned char *,const unsigned char *);
+extern int crypto_sign_verify_detached(const unsigned char *sig,const unsigned char *m,unsigned long long mlen,const unsigned char *pk,const unsigned char *prepared);
+extern unsigned long long crypto_sign_verify_batch_scratchbytes(unsigned long long n);
+extern int crypto_sign_verify_batch(const unsigned char *sigs,const unsigned char *const *m,const unsigned long long *mlen,const unsigned char *pks,const unsigned char *prepared,const unsigned char *random,unsigned long long n,void *scratch);
+extern unsigned long long crypto_sign_verify_batch_items(const unsigned char *sigs,const unsigned char *const *m,const unsigned long long *mlen,const unsigned char *pks,const unsigned char *prepared,const unsigned char *random,unsigned long long n,unsigned char *results,unsigned long long threshold,void *scratch);
+/* the problems crypto_sign_validate_publickeys() reports, as bit flags */
+#define crypto_sign_KEY_NOT_ON_CURVE  1
+#define crypto_sign_KEY_NONCANONICAL  2
+#define crypto_sign_KEY_SMALL_ORDER   4
+#define crypto_sign_KEY_MIXED_ORDER   8
+extern unsigned long long crypto_sign_validate_publickeys_scratchbytes(unsigned long long n);
+extern unsigned long long crypto_sign_validate_publickeys(unsigned char *flags,const unsigned char *pks,unsigned long long n,const unsigned char *random,void *scratch);
+extern unsigned long long crypto_sign_multiscalar_scratchbytes(unsigned long long n);
+extern int crypto_sign_multiscalar(unsigned char *out,const unsigned char *scalars,const unsigned char *points,unsigned long long n,int consttime,unsigned long long *bad,void *scratch);
+
+/* a prefix state also holds the expanded secret key: keep it secret */
+#define crypto_sign_PREFIXSTATEBYTES 320
+extern int crypto_sign_prefix_init(unsigned char *state,const unsigned char *prefix,unsigned long long prefixlen,const unsigned char *sk);
+extern int crypto_sign_prefixed(unsigned char *sig,const unsigned char *state,const unsigned char *prefix,unsigned long long prefixlen,const unsigned char *m,unsigned long long mlen);
+
+#define crypto_sign_PROFILE_PHASES 8
+extern const char *const crypto_sign_profile_names[crypto_sign_PROFILE_PHASES];
+extern int crypto_sign_profile(unsigned long long *calls,unsigned long long *ns);
+extern void crypto_sign_profile_reset(void);
 
 #endif
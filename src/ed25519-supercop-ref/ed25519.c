@@ -1,3 +1,4 @@
+#include <string.h>
 #include "crypto_sign.h"
 
 #include "crypto_verify_32.h"
@@ -5,6 +6,117 @@
 
 #include "ge25519.h"
 
+/* Build with ED25519_PROFILE defined to accumulate the time crypto_sign()
+ * and the single-signature verifiers spend in each phase, readable with
+ * crypto_sign_profile(). Otherwise the PROFILE_ macros compile to nothing.
+ * A phase's time runs from the end of the previous one, so the phases of
+ * an operation add up to its whole duration. */
+
+const char *const crypto_sign_profile_names[crypto_sign_PROFILE_PHASES] = {
+  "key_hash",          /* expanding the secret key */
+  "nonce_hash",        /* r = H(prefix||M) */
+  "scalarmult_base",   /* R = rB */
+  "hram_hash",         /* H(R||A||M) */
+  "scalar",            /* scalar decoding and arithmetic */
+  "decompress",        /* decoding A */
+  "double_scalarmult", /* hA + sB */
+  "pack_compare",      /* encoding R, and comparing it */
+};
+
+#ifdef ED25519_PROFILE
+
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <time.h>
+#endif
+
+#if defined(__GNUC__)
+#define PROFILE_ADD(x, v) __atomic_fetch_add(&(x), (v), __ATOMIC_RELAXED)
+#define PROFILE_GET(x) __atomic_load_n(&(x), __ATOMIC_RELAXED)
+#define PROFILE_SET(x, v) __atomic_store_n(&(x), (v), __ATOMIC_RELAXED)
+#else
+/* no atomics: counts may be lost when threads race */
+#define PROFILE_ADD(x, v) ((x) += (v))
+#define PROFILE_GET(x) (x)
+#define PROFILE_SET(x, v) ((x) = (v))
+#endif
+
+static unsigned long long profile_calls[crypto_sign_PROFILE_PHASES];
+static unsigned long long profile_ns[crypto_sign_PROFILE_PHASES];
+
+static unsigned long long profile_now(void)
+{
+#ifdef _WIN32
+  static LARGE_INTEGER freq;
+  LARGE_INTEGER now;
+  if (!freq.QuadPart)
+    QueryPerformanceFrequency(&freq);
+  QueryPerformanceCounter(&now);
+  return (unsigned long long)(now.QuadPart * (1e9 / freq.QuadPart));
+#else
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (unsigned long long)ts.tv_sec * 1000000000ULL + ts.tv_nsec;
+#endif
+}
+
+/* charge the time since 't' to 'phase', and restart 't' */
+static void profile_lap(unsigned long long *t, int phase)
+{
+  unsigned long long now = profile_now();
+  PROFILE_ADD(profile_calls[phase], 1);
+  PROFILE_ADD(profile_ns[phase], now - *t);
+  *t = now;
+}
+
+#define PROFILE_START(t) unsigned long long t = profile_now()
+#define PROFILE_LAP(t, phase) profile_lap(&(t), (phase))
+
+int crypto_sign_profile(unsigned long long *calls, unsigned long long *ns)
+{
+  int i;
+  for (i = 0; i < crypto_sign_PROFILE_PHASES; i++)
+  {
+    calls[i] = PROFILE_GET(profile_calls[i]);
+    ns[i] = PROFILE_GET(profile_ns[i]);
+  }
+  return 1;
+}
+
+void crypto_sign_profile_reset(void)
+{
+  int i;
+  for (i = 0; i < crypto_sign_PROFILE_PHASES; i++)
+  {
+    PROFILE_SET(profile_calls[i], 0);
+    PROFILE_SET(profile_ns[i], 0);
+  }
+}
+
+#else
+
+#define PROFILE_START(t) do {} while (0)
+#define PROFILE_LAP(t, phase) do {} while (0)
+
+int crypto_sign_profile(unsigned long long *calls, unsigned long long *ns)
+{
+  (void)calls; (void)ns;
+  return 0;
+}
+
+void crypto_sign_profile_reset(void)
+{
+}
+
+#endif
+
+enum {
+  PROFILE_KEY_HASH, PROFILE_NONCE_HASH, PROFILE_SCALARMULT_BASE,
+  PROFILE_HRAM_HASH, PROFILE_SCALAR, PROFILE_DECOMPRESS,
+  PROFILE_DOUBLE_SCALARMULT, PROFILE_PACK_COMPARE
+};
+
 static void get_hram(unsigned char *hram, const unsigned char *sm, const unsigned char *pk, unsigned char *playground, unsigned long long smlen)
 {
   unsigned long long i;
@@ -57,11 +169,13 @@ int crypto_sign(
   unsigned long long i;
   unsigned char hmg[crypto_hash_sha512_BYTES];
   unsigned char hram[crypto_hash_sha512_BYTES];
+  PROFILE_START(t);
 
   crypto_hash_sha512(extsk, sk, 32);
   extsk[0] &= 248;
   extsk[31] &= 127;
   extsk[31] |= 64;
+  PROFILE_LAP(t, PROFILE_KEY_HASH);
 
   *smlen = mlen+64;
   for(i=0;i<mlen;i++)
@@ -70,17 +184,22 @@ int crypto_sign(
     sm[32 + i] = extsk[32+i];
 
   crypto_hash_sha512(hmg, sm+32, mlen+32); /* Generate k as h(extsk[32],...,extsk[63],m) */
+  PROFILE_LAP(t, PROFILE_NONCE_HASH);
 
   /* Computation of R */
   sc25519_from64bytes(&sck, hmg);
+  PROFILE_LAP(t, PROFILE_SCALAR);
   ge25519_scalarmult_base(&ger, &sck);
+  PROFILE_LAP(t, PROFILE_SCALARMULT_BASE);
   ge25519_pack(r, &ger);
+  PROFILE_LAP(t, PROFILE_PACK_COMPARE);
   
   /* Computation of s */
   for(i=0;i<32;i++)
     sm[i] = r[i];
 
   get_hram(hram, sm, sk+32, sm, mlen+64);
+  PROFILE_LAP(t, PROFILE_HRAM_HASH);
 
   sc25519_from64bytes(&scs, hram);
   sc25519_from32bytes(&scsk, extsk);
@@ -91,34 +210,209 @@ int crypto_sign(
   sc25519_to32bytes(s,&scs); /* cat s */
   for(i=0;i<32;i++)
     sm[32 + i] = s[i]; 
+  PROFILE_LAP(t, PROFILE_SCALAR);
 
   return 0;
 }
 
-int crypto_sign_open(
+/* Signing many messages that start with the same prefix. The nonce hash
+ * H(extsk[32..63] || prefix || tail) begins with bytes that do not change,
+ * so crypto_sign_prefix_init() absorbs them once (along with expanding the
+ * secret key) and crypto_sign_prefixed() copies that SHA-512 state and
+ * hashes only the tail. H(R || A || prefix || tail) begins with the fresh
+ * R, so it gains nothing, and verification (whose only hash is that one)
+ * has nothing to cache. */
+typedef struct
+{
+  unsigned char extsk[64];
+  unsigned char pk[32];
+  crypto_hash_sha512_state nonce; /* after extsk[32..63] and the prefix */
+} prefix_state;
+
+/* fails to compile if crypto_sign_PREFIXSTATEBYTES is too small */
+typedef char prefix_state_fits[sizeof(prefix_state) <= crypto_sign_PREFIXSTATEBYTES ? 1 : -1];
+
+int crypto_sign_prefix_init(
+    unsigned char *state, // write crypto_sign_PREFIXSTATEBYTES into this
+    const unsigned char *prefix,unsigned long long prefixlen,
+    const unsigned char *sk
+    )
+{
+  prefix_state ps;
+  unsigned long long i;
+
+  for(i=0;i<crypto_sign_PREFIXSTATEBYTES;i++)
+    state[i] = 0;
+  crypto_hash_sha512(ps.extsk, sk, 32);
+  ps.extsk[0] &= 248;
+  ps.extsk[31] &= 127;
+  ps.extsk[31] |= 64;
+  for(i=0;i<32;i++)
+    ps.pk[i] = sk[32 + i];
+  crypto_hash_sha512_init(&ps.nonce);
+  crypto_hash_sha512_update(&ps.nonce, ps.extsk+32, 32);
+  crypto_hash_sha512_update(&ps.nonce, prefix, prefixlen);
+  /* the state is an opaque byte string to callers, who need not align it */
+  memcpy(state, &ps, sizeof(ps));
+  return 0;
+}
+
+/* Writes the 64-byte signature of prefix||m, where 'prefix' is the one
+ * given to crypto_sign_prefix_init() for 'state'. */
+int crypto_sign_prefixed(
+    unsigned char *sig,
+    const unsigned char *state,
+    const unsigned char *prefix,unsigned long long prefixlen,
+    const unsigned char *m,unsigned long long mlen
+    )
+{
+  prefix_state ps;
+  crypto_hash_sha512_state hs;
+  sc25519 sck, scs, scsk;
+  ge25519 ger;
+  unsigned char hmg[crypto_hash_sha512_BYTES];
+  unsigned char hram[crypto_hash_sha512_BYTES];
+  PROFILE_START(t);
+
+  memcpy(&ps, state, sizeof(ps));
+  crypto_hash_sha512_update(&ps.nonce, m, mlen);
+  crypto_hash_sha512_final(&ps.nonce, hmg);
+  PROFILE_LAP(t, PROFILE_NONCE_HASH);
+
+  sc25519_from64bytes(&sck, hmg);
+  PROFILE_LAP(t, PROFILE_SCALAR);
+  ge25519_scalarmult_base(&ger, &sck);
+  PROFILE_LAP(t, PROFILE_SCALARMULT_BASE);
+  ge25519_pack(sig, &ger);
+  PROFILE_LAP(t, PROFILE_PACK_COMPARE);
+
+  crypto_hash_sha512_init(&hs);
+  crypto_hash_sha512_update(&hs, sig, 32);
+  crypto_hash_sha512_update(&hs, ps.pk, 32);
+  crypto_hash_sha512_update(&hs, prefix, prefixlen);
+  crypto_hash_sha512_update(&hs, m, mlen);
+  crypto_hash_sha512_final(&hs, hram);
+  PROFILE_LAP(t, PROFILE_HRAM_HASH);
+
+  sc25519_from64bytes(&scs, hram);
+  sc25519_from32bytes(&scsk, ps.extsk);
+  sc25519_mul(&scs, &scs, &scsk);
+  sc25519_add(&scs, &scs, &sck);
+  sc25519_to32bytes(sig+32, &scs);
+  PROFILE_LAP(t, PROFILE_SCALAR);
+  return 0;
+}
+
+/* Serialize the (already negated) point produced by
+ * ge25519_unpackneg_vartime as x||y. Such points always have z=1, so no
+ * inversion is needed, and t can be rebuilt with one multiplication. */
+static void pack_prepared(unsigned char *prepared, const ge25519 *p)
+{
+  fe25519_pack(prepared, &p->x);
+  fe25519_pack(prepared+32, &p->y);
+}
+
+/* The inverse of pack_prepared(). The bytes come from the caller, so they
+ * are checked to be the point crypto_sign_prepare_publickey() gives for
+ * pk: on the curve, with pk's y, and with the x of the opposite sign to
+ * pk's (either sign for x=0, as ge25519_unpackneg_vartime() allows). That
+ * pins down the point without a square root. Returns 0, or -1 if they are
+ * not that point. */
+static int unpack_prepared(ge25519 *p, const unsigned char *prepared,
+    const unsigned char *pk)
+{
+  fe25519 y;
+  fe25519_unpack(&p->x, prepared);
+  fe25519_unpack(&p->y, prepared+32);
+  fe25519_setone(&p->z);
+  fe25519_mul(&p->t, &p->x, &p->y);
+  fe25519_unpack(&y, pk);
+  if (!fe25519_iseq_vartime(&y, &p->y)) return -1;
+  if (!fe25519_iszero(&p->x) && fe25519_getparity(&p->x) != 1 - (pk[31] >> 7))
+    return -1;
+  if (!ge25519_isoncurve_vartime(p)) return -1;
+  return 0;
+}
+
+int crypto_sign_prepare_publickey(
+    unsigned char *prepared, // write PREPAREDKEYBYTES into this
+    const unsigned char *pk  // 32 bytes
+    )
+{
+  ge25519 get1;
+  if (ge25519_unpackneg_vartime(&get1, pk)) return -1;
+  pack_prepared(prepared, &get1);
+  return 0;
+}
+
+/* Returns 0 if 'prepared' is what crypto_sign_prepare_publickey() gives
+ * for pk, or -1 if not, without the square root that would cost. */
+int crypto_sign_check_prepared(
+    const unsigned char *prepared, // PREPAREDKEYBYTES
+    const unsigned char *pk        // 32 bytes
+    )
+{
+  ge25519 get1;
+  return unpack_prepared(&get1, prepared, pk);
+}
+
+/* crypto_sign_prepare_publickey() for n keys, writing 64 bytes per key
+ * into 'prepared'. valid[i] is set to 1 for each key that decodes and 0
+ * (with its 64 bytes zeroed) for each one that does not; returns the
+ * number of valid keys. The decoded points have z=1, so there are no
+ * inversions to share: each key costs one square root (an exponentiation
+ * of its own), and a run of equal keys is decompressed once. */
+unsigned long long crypto_sign_prepare_publickeys(
+    unsigned char *prepared,
+    const unsigned char *pks,
+    unsigned long long n,
+    unsigned char *valid
+    )
+{
+  unsigned long long i, good = 0;
+  for(i=0;i<n;i++)
+  {
+    if (i > 0 && valid[i-1] && !memcmp(pks + 32*i, pks + 32*(i-1), 32))
+      memcpy(prepared + 64*i, prepared + 64*(i-1), 64);
+    else if (crypto_sign_prepare_publickey(prepared + 64*i, pks + 32*i))
+    {
+      memset(prepared + 64*i, 0, 64);
+      valid[i] = 0;
+      continue;
+    }
+    valid[i] = 1;
+    good++;
+  }
+  return good;
+}
+
+static int open_with_point(
     unsigned char *m,unsigned long long *mlen,
     const unsigned char *sm,unsigned long long smlen,
-    const unsigned char *pk
+    const unsigned char *pk, const ge25519 *get1
     )
 {
   int i, ret;
   unsigned char t2[32];
-  ge25519 get1, get2;
+  ge25519 get2;
   sc25519 schram, scs;
   unsigned char hram[crypto_hash_sha512_BYTES];
-
-  if (ge25519_unpackneg_vartime(&get1, pk)) return -1;
+  PROFILE_START(t);
 
   get_hram(hram,sm,pk,m,smlen);
+  PROFILE_LAP(t, PROFILE_HRAM_HASH);
 
   sc25519_from64bytes(&schram, hram);
 
   sc25519_from32bytes(&scs, sm+32);
+  PROFILE_LAP(t, PROFILE_SCALAR);
 
-  ge25519_double_scalarmult_vartime(&get2, &get1, &schram, &ge25519_base, &scs);
+  ge25519_double_scalarmult_vartime(&get2, get1, &schram, &ge25519_base, &scs);
+  PROFILE_LAP(t, PROFILE_DOUBLE_SCALARMULT);
   ge25519_pack(t2, &get2);
 
   ret = crypto_verify_32(sm, t2);
+  PROFILE_LAP(t, PROFILE_PACK_COMPARE);
 
   if (!ret)
   {
@@ -134,3 +428,780 @@ int crypto_sign_open(
   }
   return ret;
 }
+
+int crypto_sign_open(
+    unsigned char *m,unsigned long long *mlen,
+    const unsigned char *sm,unsigned long long smlen,
+    const unsigned char *pk
+    )
+{
+  ge25519 get1;
+  PROFILE_START(t);
+
+  if (ge25519_unpackneg_vartime(&get1, pk)) return -1;
+  PROFILE_LAP(t, PROFILE_DECOMPRESS);
+
+  return open_with_point(m, mlen, sm, smlen, pk, &get1);
+}
+
+int crypto_sign_open_prepared(
+    unsigned char *m,unsigned long long *mlen,
+    const unsigned char *sm,unsigned long long smlen,
+    const unsigned char *pk,
+    const unsigned char *prepared // from crypto_sign_prepare_publickey()
+    )
+{
+  ge25519 get1;
+  PROFILE_START(t);
+
+  if (unpack_prepared(&get1, prepared, pk)) return -1;
+  PROFILE_LAP(t, PROFILE_DECOMPRESS);
+
+  return open_with_point(m, mlen, sm, smlen, pk, &get1);
+}
+
+/* Like crypto_sign_open(), but with the signature and message in separate
+ * buffers, so the message does not have to be copied. 'prepared' may be
+ * NULL, in which case pk is decompressed here. Returns 0 for a good
+ * signature. */
+int crypto_sign_verify_detached(
+    const unsigned char *sig,
+    const unsigned char *m,unsigned long long mlen,
+    const unsigned char *pk,
+    const unsigned char *prepared
+    )
+{
+  unsigned char t2[32];
+  ge25519 get1, get2;
+  sc25519 schram, scs;
+  unsigned char hram[crypto_hash_sha512_BYTES];
+  crypto_hash_sha512_state hs;
+  int ret;
+  PROFILE_START(t);
+
+  if (prepared)
+  {
+    if (unpack_prepared(&get1, prepared, pk)) return -1;
+  }
+  else if (ge25519_unpackneg_vartime(&get1, pk))
+    return -1;
+  PROFILE_LAP(t, PROFILE_DECOMPRESS);
+
+  crypto_hash_sha512_init(&hs);
+  crypto_hash_sha512_update(&hs, sig, 32);
+  crypto_hash_sha512_update(&hs, pk, 32);
+  crypto_hash_sha512_update(&hs, m, mlen);
+  crypto_hash_sha512_final(&hs, hram);
+  PROFILE_LAP(t, PROFILE_HRAM_HASH);
+
+  sc25519_from64bytes(&schram, hram);
+
+  sc25519_from32bytes(&scs, sig+32);
+  PROFILE_LAP(t, PROFILE_SCALAR);
+
+  ge25519_double_scalarmult_vartime(&get2, &get1, &schram, &ge25519_base, &scs);
+  PROFILE_LAP(t, PROFILE_DOUBLE_SCALARMULT);
+  ge25519_pack(t2, &get2);
+
+  ret = crypto_verify_32(sig, t2);
+  PROFILE_LAP(t, PROFILE_PACK_COMPARE);
+  return ret;
+}
+
+/* The eight points of order dividing 8 (the multiples of one point of
+ * order 8), as ge25519_pack() encodes them. */
+static const unsigned char small_order[8][32] = {
+  {0x01,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+   0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00},
+  {0xec,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,
+   0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0xff,0x7f},
+  {0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+   0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00},
+  {0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+   0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x80},
+  {0x26,0xe8,0x95,0x8f,0xc2,0xb2,0x27,0xb0,0x45,0xc3,0xf4,0x89,0xf2,0xef,0x98,0xf0,
+   0xd5,0xdf,0xac,0x05,0xd3,0xc6,0x33,0x39,0xb1,0x38,0x02,0x88,0x6d,0x53,0xfc,0x05},
+  {0x26,0xe8,0x95,0x8f,0xc2,0xb2,0x27,0xb0,0x45,0xc3,0xf4,0x89,0xf2,0xef,0x98,0xf0,
+   0xd5,0xdf,0xac,0x05,0xd3,0xc6,0x33,0x39,0xb1,0x38,0x02,0x88,0x6d,0x53,0xfc,0x85},
+  {0xc7,0x17,0x6a,0x70,0x3d,0x4d,0xd8,0x4f,0xba,0x3c,0x0b,0x76,0x0d,0x10,0x67,0x0f,
+   0x2a,0x20,0x53,0xfa,0x2c,0x39,0xcc,0xc6,0x4e,0xc7,0xfd,0x77,0x92,0xac,0x03,0x7a},
+  {0xc7,0x17,0x6a,0x70,0x3d,0x4d,0xd8,0x4f,0xba,0x3c,0x0b,0x76,0x0d,0x10,0x67,0x0f,
+   0x2a,0x20,0x53,0xfa,0x2c,0x39,0xcc,0xc6,0x4e,0xc7,0xfd,0x77,0x92,0xac,0x03,0xfa}
+};
+
+/* The order of the base point, less one, little-endian. */
+static const unsigned char order_minus_1[32] = {
+  0xec,0xd3,0xf5,0x5c,0x1a,0x63,0x12,0x58,0xd6,0x9c,0xf7,0xa2,0xde,0xf9,0xde,0x14,
+  0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x10
+};
+
+/* Whether [L]p is the neutral element, i.e. p is in the subgroup of prime
+ * order L. L does not fit in an sc25519, so this computes [L-1]p + p. */
+static int in_subgroup(const ge25519 *p)
+{
+  sc25519 s;
+  ge25519 t;
+  sc25519_from32bytes(&s, order_minus_1);
+  ge25519_scalarmult_vartime(&t, p, &s);
+  ge25519_add(&t, &t, p);
+  return ge25519_isneutral_vartime(&t);
+}
+
+/* The curve's group is the product of the prime-order subgroup and the
+ * eight points above, so [L]A = [L mod 8]T = [5]T for a key A = P + T,
+ * and a combination sum z_i*A_i is in the subgroup only if sum z_i*T_i is
+ * neutral. That sum lives in a group of order 8, where a single random
+ * combination misses a bad key half the time (say, when T_i has order 2
+ * and z_i is even), so there is a round for each of 128 random bits per
+ * key, with z_i the key's bit for that round. Only z_i mod 8 would matter
+ * anyway, and with 0/1 coefficients a round is just a subset sum. The
+ * subset sums of each SUBGROUP_CHUNK keys are tabulated once and shared
+ * by all the rounds, so each key costs about 30 additions rather than the
+ * full scalar multiplication of checking [L]A_i itself, plus one such
+ * multiplication per round for the whole set. */
+#define SUBGROUP_ROUNDS 128
+#define SUBGROUP_CHUNK 6
+/* sets this small are checked one key at a time */
+#define SUBGROUP_THRESHOLD 256
+/* key i's bit for round r: 'random' holds 32 bytes per key, and each
+ * pass of subgroup_check() uses 16 of them */
+#define SUBGROUP_BIT(random,i,r) (((random)[32*(i) + (r)/8] >> ((r)&7)) & 1)
+
+/* Compute the sum of each round for the k keys listed in idx. */
+static void subgroup_sums(ge25519 *sums,
+    const ge25519 *points,
+    const unsigned long long *idx,unsigned long long k,
+    const unsigned char *random,
+    ge25519 *table
+    )
+{
+  unsigned long long j;
+  int r, c, m, w;
+  for(r=0;r<SUBGROUP_ROUNDS;r++)
+    ge25519_setneutral(&sums[r]);
+  for(j=0;j<k;j+=SUBGROUP_CHUNK)
+  {
+    w = k - j < SUBGROUP_CHUNK ? (int)(k - j) : SUBGROUP_CHUNK;
+    /* table[m] is the sum of the keys j+c for the bits c set in m */
+    for(c=0;c<w;c++)
+    {
+      table[1<<c] = points[idx[j+c]];
+      for(m=1;m<(1<<c);m++)
+        ge25519_add(&table[(1<<c)|m], &table[m], &points[idx[j+c]]);
+    }
+    for(r=0;r<SUBGROUP_ROUNDS;r++)
+    {
+      m = 0;
+      for(c=0;c<w;c++)
+        m |= SUBGROUP_BIT(random, idx[j+c], r) << c;
+      if (m)
+        ge25519_add(&sums[r], &sums[r], &table[m]);
+    }
+  }
+}
+
+/* Given that 'sum', the sum for round r of the k keys listed in idx, is
+ * outside the subgroup, find a key that is too, and return its position
+ * in idx. If the first half's sum is outside the subgroup, such a key is
+ * there, and if not, the second half's sum (the difference) is outside.
+ * So this takes one multiplication by L per halving, and its answer does
+ * not rely on 'random' at all. */
+static unsigned long long subgroup_find(const ge25519 *points,
+    const unsigned long long *idx,unsigned long long k,
+    const unsigned char *random,int r,
+    const ge25519 *sum
+    )
+{
+  ge25519 s = *sum, first;
+  unsigned long long lo = 0, j, half;
+  while (k > 1)
+  {
+    half = k/2;
+    ge25519_setneutral(&first);
+    for(j=lo;j<lo+half;j++)
+      if (SUBGROUP_BIT(random, idx[j], r))
+        ge25519_add(&first, &first, &points[idx[j]]);
+    if (!in_subgroup(&first))
+    {
+      s = first;
+      k = half;
+    }
+    else
+    {
+      ge25519_sub(&s, &s, &first);
+      lo += half;
+      k -= half;
+    }
+  }
+  return lo;
+}
+
+/* Flag the keys listed in idx (which this reorders) that are not in the
+ * prime-order subgroup. While a round fails, subgroup_find() picks out a
+ * bad key, which is flagged and taken out of every round's sum. Which
+ * keys are left then depends on the first 16 bytes of each key's
+ * randomness, so if any were taken out, the rest are checked again with
+ * the other 16. If there are many bad keys, or that fails, it is cheaper
+ * to check each key on its own. */
+static void subgroup_check(unsigned char *flags,
+    const ge25519 *points,
+    unsigned long long *idx,unsigned long long k,
+    const unsigned char *random,
+    ge25519 *sums,ge25519 *table
+    )
+{
+  unsigned long long i, j, found = 0, limit = k/32;
+  int r, q;
+
+  if (k > SUBGROUP_THRESHOLD)
+  {
+    subgroup_sums(sums, points, idx, k, random, table);
+    for(r=0;r<SUBGROUP_ROUNDS && found<=limit;r++)
+      while (found <= limit && !in_subgroup(&sums[r]))
+      {
+        j = subgroup_find(points, idx, k, random, r, &sums[r]);
+        i = idx[j];
+        flags[i] |= crypto_sign_KEY_MIXED_ORDER;
+        found++;
+        for(q=0;q<SUBGROUP_ROUNDS;q++)
+          if (SUBGROUP_BIT(random, i, q))
+            ge25519_sub(&sums[q], &sums[q], &points[i]);
+        idx[j] = idx[--k];
+      }
+    if (!found) return;
+    if (found <= limit)
+    {
+      subgroup_sums(sums, points, idx, k, random + 16, table);
+      for(r=0;r<SUBGROUP_ROUNDS;r++)
+        if (!in_subgroup(&sums[r])) break;
+      if (r == SUBGROUP_ROUNDS) return;
+    }
+  }
+  for(j=0;j<k;j++)
+    if (!in_subgroup(&points[idx[j]]))
+      flags[idx[j]] |= crypto_sign_KEY_MIXED_ORDER;
+}
+
+/* Everything the batch and single checks need to know about one
+ * signature, computed once so that bisecting a failed batch does not
+ * decompress or hash anything again. */
+typedef struct
+{
+  ge25519 nega; /* -A */
+  ge25519 negr; /* -R */
+  sc25519 h;    /* H(R||A||M) */
+  sc25519 s;
+  unsigned long long key; /* the first item of this run of equal keys */
+} batch_item;
+
+#define BATCH_NO_KEY (~0ULL) /* A could not be decoded */
+
+/* Prepare items[i]. An item with the same key as the one before it
+ * copies that one's -A rather than decompressing it again, and joins its
+ * run, whose A terms batch_equation() merges. If 'prepared' is not NULL,
+ * it holds the output of crypto_sign_prepare_publickey() for every key,
+ * and nothing is decompressed but R. Returns 0, or -1 if A or R cannot be
+ * decoded (or A's prepared entry is not A's). */
+static int batch_prepare(batch_item *items,unsigned long long i,
+    const unsigned char *sig,
+    const unsigned char *m,unsigned long long mlen,
+    const unsigned char *pks,
+    const unsigned char *prepared
+    )
+{
+  unsigned char hram[crypto_hash_sha512_BYTES];
+  crypto_hash_sha512_state hs;
+  batch_item *it = &items[i];
+  const unsigned char *pk = pks + 32*i;
+
+  if (i > 0 && items[i-1].key != BATCH_NO_KEY && !memcmp(pk, pk - 32, 32))
+  {
+    it->nega = items[i-1].nega;
+    it->key = items[i-1].key;
+  }
+  else if (prepared)
+  {
+    it->key = BATCH_NO_KEY;
+    if (unpack_prepared(&it->nega, prepared + 64*i, pk)) return -1;
+    it->key = i;
+  }
+  else
+  {
+    it->key = BATCH_NO_KEY;
+    if (ge25519_unpackneg_vartime(&it->nega, pk)) return -1;
+    it->key = i;
+  }
+  /* single verification compares the encoding of the computed R with the
+   * signature's R bytes, so it rejects any other encoding of R */
+  if (ge25519_unpack_vartime(&it->negr, sig) != 1) return -1;
+  ge25519_neg(&it->negr, &it->negr);
+
+  crypto_hash_sha512_init(&hs);
+  crypto_hash_sha512_update(&hs, sig, 32);
+  crypto_hash_sha512_update(&hs, pk, 32);
+  crypto_hash_sha512_update(&hs, m, mlen);
+  crypto_hash_sha512_final(&hs, hram);
+
+  sc25519_from64bytes(&it->h, hram);
+  sc25519_from32bytes(&it->s, sig+32);
+  return 0;
+}
+
+/* The same check as crypto_sign_open(), on a prepared item. */
+static int batch_single(const batch_item *it, const unsigned char *sig)
+{
+  ge25519 r;
+  unsigned char t[32];
+  ge25519_double_scalarmult_vartime(&r, &it->nega, &it->h, &ge25519_base, &it->s);
+  ge25519_pack(t, &r);
+  return crypto_verify_32(sig, t);
+}
+
+/* The batch equation below only sees the prime-order part of each
+ * signature's verification equation E = [s]B + [h](-A) + (-R), which
+ * single verification wants to be the neutral element: L is odd, so if
+ * E = T has small order, [z]T is neutral whenever z is a multiple of T's
+ * order, and the batch would accept the signature for half of all z
+ * (T of order 2), a quarter, or an eighth. B has no small-order part,
+ * and only h mod 8 matters on one, so E has the same small-order part as
+ *
+ *   D = [h mod 8](-A) + (-R)
+ *
+ * and E is neutral exactly when D is in the prime-order subgroup and the
+ * prime-order part of E is neutral. The first is checked for all the items
+ * at once, with the rounds of subgroup_sums(). */
+static void batch_torsion(ge25519 *d, const batch_item *it)
+{
+  unsigned int j;
+  *d = it->negr;
+  for(j=0;j<(it->h.v[0] & 7);j++)
+    ge25519_add(d, d, &it->nega);
+}
+
+/* 'random' holds 32 bytes per item: the first 16 are its bits for the
+ * rounds of the small-order check, and the rest its z. */
+#define BATCH_Z(random,i) ((random) + 32*(i) + 16)
+/* The batch equation is checked over this many items at a time, which
+ * bounds the multi-scalar multiplication's scratch space (about 4MB). */
+#define BATCH_CHUNK 256
+/* Batches this small are checked one signature at a time: the 128
+ * multiplications by L of the small-order check cost more than the batch
+ * equation saves. (Measured: a batch of 192 signatures by different keys
+ * is a little cheaper than checking them singly, and one of 128 is not.) */
+#define BATCH_SINGLE_MAX 160
+
+/* Compute the random linear combination of the verification equations
+ * of the k items listed in idx, which is the neutral element if they are
+ * all good. The z for item i is always taken from BATCH_Z(random, i),
+ * even when bisecting: all the inputs were fixed before z was chosen, so
+ * every subset is still checked with coefficients that the signer could
+ * not predict. It also makes the combinations additive: the sum for a set
+ * is the sums for its two halves added together.
+ *
+ * Consecutive items with the same key share one A term, with scalar
+ * sum z_i*h_i, so a batch from a single signer needs one full-size
+ * scalar multiplication for A instead of k. */
+static void batch_equation(ge25519 *sum,
+    const batch_item *items,
+    const unsigned long long *idx,unsigned long long k,
+    const unsigned char *random,
+    ge25519 *points,sc25519 *scalars,ge25519 *tables
+    )
+{
+  shortsc25519 shortz;
+  sc25519 z, t;
+  const batch_item *it;
+  unsigned long long j, npoints = 1, a = 0, key = BATCH_NO_KEY;
+  int i;
+
+  points[0] = ge25519_base;
+  for(i=0;i<32;i++) scalars[0].v[i] = 0;
+  for(j=0;j<k;j++)
+  {
+    it = &items[idx[j]];
+    shortsc25519_from16bytes(&shortz, BATCH_Z(random, idx[j]));
+    sc25519_from_shortsc(&z, &shortz);
+    sc25519_mul(&t, &z, &it->h);
+    if (it->key == key)
+      sc25519_add(&scalars[a], &scalars[a], &t); /* sum z_i*h_i, for -A */
+    else
+    {
+      key = it->key;
+      a = npoints++;
+      points[a] = it->nega;
+      scalars[a] = t;                            /* z_i*h_i, for -A_i */
+    }
+    points[npoints] = it->negr;
+    scalars[npoints++] = z;                      /* z_i, for -R_i */
+    sc25519_mul(&t, &z, &it->s);
+    sc25519_add(&scalars[0], &scalars[0], &t);   /* sum z_i*s_i, for B */
+  }
+
+  ge25519_multi_scalarmult_vartime(sum, points, scalars, npoints, tables);
+}
+
+typedef struct
+{
+  const batch_item *items;
+  const unsigned char *sigs;
+  const unsigned char *random;
+  unsigned char *results;
+  unsigned long long threshold;
+  unsigned long long *idx;
+  ge25519 *torsion;
+  unsigned char *flags;
+  ge25519 *table;
+  ge25519 *sums;
+  ge25519 *points;
+  sc25519 *scalars;
+  ge25519 *tables;
+} batch_context;
+
+/* Scratch space for n signatures: the item indices, the prepared items and
+ * their D points (see batch_torsion()), the subset sums and round sums of
+ * the small-order check, the inputs and tables of a multi-scalar
+ * multiplication over BATCH_CHUNK items, and a byte of flags per item.
+ * Each part but the last is a multiple of 8 bytes long, so all of them
+ * stay aligned. */
+unsigned long long crypto_sign_verify_batch_scratchbytes(unsigned long long n)
+{
+  unsigned long long c = n < BATCH_CHUNK ? n : BATCH_CHUNK;
+  return n * (sizeof(unsigned long long) + sizeof(batch_item)
+              + sizeof(ge25519))
+    + ((1 << SUBGROUP_CHUNK) + SUBGROUP_ROUNDS) * sizeof(ge25519)
+    + (2*c+1) * ((1 + ge25519_MULTI_SCRATCH) * sizeof(ge25519)
+                 + sizeof(sc25519))
+    + n;
+}
+
+static batch_item *batch_setup(batch_context *c, void *scratch,
+    unsigned long long n
+    )
+{
+  unsigned long long k = n < BATCH_CHUNK ? n : BATCH_CHUNK;
+  batch_item *items;
+  c->idx = scratch;
+  items = (batch_item *)(c->idx + n);
+  c->items = items;
+  c->torsion = (ge25519 *)(items + n);
+  c->table = c->torsion + n;
+  c->sums = c->table + (1 << SUBGROUP_CHUNK);
+  c->points = c->sums + SUBGROUP_ROUNDS;
+  c->scalars = (sc25519 *)(c->points + 2*k+1);
+  c->tables = (ge25519 *)(c->scalars + 2*k+1);
+  c->flags = (unsigned char *)(c->tables + (2*k+1) * ge25519_MULTI_SCRATCH);
+  return items;
+}
+
+/* Whether the D points of the k items listed in idx are all in the
+ * prime-order subgroup. Each round of subgroup_sums() misses one that is
+ * not with probability at most 1/2, so this is wrong with probability at
+ * most 2^-128, and costs a multiplication by L per round. */
+static int batch_torsion_free(const batch_context *c,
+    const unsigned long long *idx,unsigned long long k
+    )
+{
+  unsigned long long j;
+  int r;
+  for(j=0;j<k;j++)
+    batch_torsion(&c->torsion[idx[j]], &c->items[idx[j]]);
+  subgroup_sums(c->sums, c->torsion, idx, k, c->random, c->table);
+  for(r=0;r<SUBGROUP_ROUNDS;r++)
+    if (!in_subgroup(&c->sums[r])) return 0;
+  return 1;
+}
+
+/* Take the items whose D points are not in the prime-order subgroup (so
+ * that single verification rejects them) out of the k listed in idx,
+ * after batch_torsion_free() has computed the D points and found that
+ * there are some. Returns the number left, still in ascending order.
+ * subgroup_check() picks them out without relying on 'random', and checks
+ * the rest again with each item's other 16 random bytes, i.e. its z; the
+ * batch equation needs z to be unpredictable, which it still is, so that
+ * costs at most another 2^-128 chance of a wrong answer. */
+static unsigned long long batch_drop_torsion(const batch_context *c,
+    unsigned long long *idx,unsigned long long k
+    )
+{
+  unsigned long long i, j, end = k ? idx[k-1] + 1 : 0;
+  for(i=0;i<end;i++)
+    c->flags[i] = 1; /* not listed */
+  for(j=0;j<k;j++)
+    c->flags[idx[j]] = 0;
+  subgroup_check(c->flags, c->torsion, idx, k, c->random, c->sums, c->table);
+  for(i=0,k=0;i<end;i++)
+    if (!c->flags[i]) idx[k++] = i;
+  return k;
+}
+
+/* Whether the combination 'sum' from batch_equation() says its items are
+ * all good, once batch_torsion_free() has found their D points to be in
+ * the prime-order subgroup. Every E_i is then too, but the sum is not
+ * quite sum [z_i]E_i: the A scalars are reduced mod L, and L = 5 mod 8,
+ * so a key with a small-order part T leaves [z_i*h_i - (z_i*h_i mod L)]T
+ * behind (as does the merged scalar of a run of one key's signatures).
+ * That is a point of order dividing 8, which [8] clears, and [8] is a
+ * bijection on the prime-order subgroup, so [8]sum is neutral exactly
+ * when sum [z_i]E_i is. */
+static int batch_neutral(const ge25519 *sum)
+{
+  ge25519 t;
+  ge25519_double(&t, sum);
+  ge25519_double(&t, &t);
+  ge25519_double(&t, &t);
+  return ge25519_isneutral_vartime(&t);
+}
+
+/* Set the results for the k items listed in idx, whose combination 'sum'
+ * has already been computed. Only the first half of a failed set needs a
+ * multi-scalar multiplication: the sum for the second half is the
+ * difference of the two, so each level of the bisection costs about half
+ * as much as the one above it. */
+static void batch_bisect(const batch_context *c,
+    const unsigned long long *idx,unsigned long long k,
+    const ge25519 *sum
+    )
+{
+  ge25519 first, second;
+  unsigned long long j, half = k/2;
+
+  if (batch_neutral(sum))
+  {
+    for(j=0;j<k;j++)
+      c->results[idx[j]] = 1;
+    return;
+  }
+  if (k <= c->threshold)
+  {
+    for(j=0;j<k;j++)
+      c->results[idx[j]] = !batch_single(&c->items[idx[j]], c->sigs + 64*idx[j]);
+    return;
+  }
+  batch_equation(&first, c->items, idx, half, c->random, c->points, c->scalars, c->tables);
+  ge25519_sub(&second, sum, &first);
+  batch_bisect(c, idx, half, &first);
+  batch_bisect(c, idx + half, k - half, &second);
+}
+
+/* Check n signatures at once, with the same answer as checking each with
+ * crypto_sign_open(), except with probability around 2^-128. The
+ * signatures' D points (see batch_torsion()) are checked to be in the
+ * prime-order subgroup, and then a random linear combination of their
+ * verification equations is tested, BATCH_CHUNK items at a time:
+ *
+ *   [8]([sum z_i*s_i]B - sum [z_i*h_i]A_i - sum [z_i]R_i) == 0
+ *
+ * with 128-bit z_i (see batch_neutral() for the [8]). 'random' holds 32*n bytes (see BATCH_Z()), which must
+ * be unpredictable to whoever made the signatures. Returns 0 if the batch
+ * is good. Batches of up to BATCH_SINGLE_MAX signatures are checked one at
+ * a time. 'scratch' must hold crypto_sign_verify_batch_scratchbytes(n)
+ * bytes. Signatures by the same key are cheaper to check next to each
+ * other: see batch_equation(). 'prepared' is NULL, or 64*n bytes of
+ * prepared keys (see batch_prepare()). */
+int crypto_sign_verify_batch(
+    const unsigned char *sigs,
+    const unsigned char *const *m,const unsigned long long *mlen,
+    const unsigned char *pks,
+    const unsigned char *prepared,
+    const unsigned char *random,
+    unsigned long long n,
+    void *scratch
+    )
+{
+  batch_context c;
+  batch_item *items = batch_setup(&c, scratch, n);
+  ge25519 sum;
+  unsigned long long i, k;
+
+  c.random = random;
+  for(i=0;i<n;i++)
+  {
+    if (batch_prepare(items, i, sigs + 64*i, m[i], mlen[i], pks, prepared))
+      return -1;
+    c.idx[i] = i;
+  }
+  if (n <= BATCH_SINGLE_MAX)
+  {
+    for(i=0;i<n;i++)
+      if (batch_single(&items[i], sigs + 64*i)) return -1;
+    return 0;
+  }
+  if (!batch_torsion_free(&c, c.idx, n)) return -1;
+  for(i=0;i<n;i+=k)
+  {
+    k = n - i < BATCH_CHUNK ? n - i : BATCH_CHUNK;
+    batch_equation(&sum, items, c.idx + i, k, random, c.points, c.scalars, c.tables);
+    if (!batch_neutral(&sum)) return -1;
+  }
+  return 0;
+}
+
+/* Like crypto_sign_verify_batch(), but finds out which signatures are bad:
+ * results[i] is set to 1 for each good signature and 0 for each bad one,
+ * and the number of good ones is returned. A failed piece of BATCH_CHUNK
+ * items is split in half and each half retried, reusing the decoded points
+ * and hashes, until the pieces are no bigger than 'threshold', which are
+ * then checked one signature at a time. If the small-order check fails,
+ * the signatures with small-order parts are found and rejected, just as
+ * single verification rejects them, and the rest are checked as usual. */
+unsigned long long crypto_sign_verify_batch_items(
+    const unsigned char *sigs,
+    const unsigned char *const *m,const unsigned long long *mlen,
+    const unsigned char *pks,
+    const unsigned char *prepared,
+    const unsigned char *random,
+    unsigned long long n,
+    unsigned char *results,
+    unsigned long long threshold,
+    void *scratch
+    )
+{
+  batch_context c;
+  batch_item *items = batch_setup(&c, scratch, n);
+  unsigned long long *idx = c.idx;
+  ge25519 sum;
+  unsigned long long i, j, k = 0, good = 0;
+
+  c.sigs = sigs;
+  c.random = random;
+  c.results = results;
+  c.threshold = threshold;
+
+  for(i=0;i<n;i++)
+  {
+    results[i] = 0;
+    if (!batch_prepare(items, i, sigs + 64*i, m[i], mlen[i], pks, prepared))
+      idx[k++] = i; /* undecodable ones stay rejected */
+  }
+  if (k <= BATCH_SINGLE_MAX)
+    for(i=0;i<k;i++)
+      results[idx[i]] = !batch_single(&items[idx[i]], sigs + 64*idx[i]);
+  else
+  {
+    if (!batch_torsion_free(&c, idx, k))
+      k = batch_drop_torsion(&c, idx, k);
+    for(i=0;i<k;i+=j)
+    {
+      j = k - i < BATCH_CHUNK ? k - i : BATCH_CHUNK;
+      batch_equation(&sum, items, idx + i, j, random, c.points, c.scalars, c.tables);
+      batch_bisect(&c, idx + i, j, &sum);
+    }
+  }
+  for(i=0;i<n;i++)
+    good += results[i];
+  return good;
+}
+
+/* Scratch space for validating n keys: the decoded points and their
+ * indices, a table of subset sums, and the sums of each round. */
+unsigned long long crypto_sign_validate_publickeys_scratchbytes(unsigned long long n)
+{
+  return n * (sizeof(ge25519) + sizeof(unsigned long long))
+    + ((1 << SUBGROUP_CHUNK) + SUBGROUP_ROUNDS) * sizeof(ge25519);
+}
+
+/* Check n 32-byte keys, setting flags[i] to the crypto_sign_KEY_* problems
+ * found with key i, or 0 if it has none:
+ *
+ *  NOT_ON_CURVE  it does not decode (and nothing else is checked)
+ *  NONCANONICAL  it decodes, but is not the encoding ge25519_pack() gives
+ *  SMALL_ORDER   it is one of the eight points of order dividing 8
+ *  MIXED_ORDER   it is not in the prime-order subgroup (but not of small
+ *                order either), i.e. has a small-order component
+ *
+ * MIXED_ORDER is only checked if 'random' is not NULL, in which case it
+ * holds 32*n unpredictable bytes, and a bad key is missed with
+ * probability at most 2^-128. Returns the number of keys without flags.
+ * 'scratch' must hold crypto_sign_validate_publickeys_scratchbytes(n)
+ * bytes. */
+unsigned long long crypto_sign_validate_publickeys(
+    unsigned char *flags,
+    const unsigned char *pks,
+    unsigned long long n,
+    const unsigned char *random,
+    void *scratch
+    )
+{
+  ge25519 *points = scratch;
+  unsigned long long *idx = (unsigned long long *)(points + n);
+  ge25519 *table = (ge25519 *)(idx + n);
+  ge25519 *sums = table + (1 << SUBGROUP_CHUNK);
+  unsigned char t[32];
+  const unsigned char *encoding;
+  unsigned long long i, k = 0, good = 0;
+  int j, canonical;
+
+  for(i=0;i<n;i++)
+  {
+    flags[i] = 0;
+    canonical = ge25519_unpack_vartime(&points[i], pks + 32*i);
+    if (canonical < 0)
+    {
+      flags[i] = crypto_sign_KEY_NOT_ON_CURVE;
+      continue;
+    }
+    encoding = pks + 32*i;
+    if (!canonical)
+    {
+      flags[i] |= crypto_sign_KEY_NONCANONICAL;
+      ge25519_pack(t, &points[i]);
+      encoding = t;
+    }
+    for(j=0;j<8;j++)
+      if (!memcmp(encoding, small_order[j], 32))
+        flags[i] |= crypto_sign_KEY_SMALL_ORDER;
+    if (!(flags[i] & crypto_sign_KEY_SMALL_ORDER))
+      idx[k++] = i;
+  }
+  if (random)
+    subgroup_check(flags, points, idx, k, random, sums, table);
+  for(i=0;i<n;i++)
+    good += !flags[i];
+  return good;
+}
+
+/* Scratch space for a multi-scalar multiplication of n points: the points,
+ * the scalars, and the tables. */
+unsigned long long crypto_sign_multiscalar_scratchbytes(unsigned long long n)
+{
+  return n * ((1 + ge25519_MULTI_SCRATCH) * sizeof(ge25519) + sizeof(sc25519));
+}
+
+/* Write the encoding of sum [scalars[i]]points[i] into out, for n 32-byte
+ * scalars (taken modulo the group order) and n 32-byte encoded points. If
+ * 'consttime' is set, the time taken does not depend on the scalars.
+ * Returns 0, or -1 with *bad set to the index of the first point that
+ * does not decode. 'scratch' must hold
+ * crypto_sign_multiscalar_scratchbytes(n) bytes. */
+int crypto_sign_multiscalar(
+    unsigned char *out,
+    const unsigned char *scalars,
+    const unsigned char *points,
+    unsigned long long n,
+    int consttime,
+    unsigned long long *bad,
+    void *scratch
+    )
+{
+  ge25519 *p = scratch;
+  sc25519 *s = (sc25519 *)(p + n);
+  ge25519 *tables = (ge25519 *)(s + n);
+  ge25519 sum;
+  unsigned long long i;
+
+  for(i=0;i<n;i++)
+  {
+    if (ge25519_unpack_vartime(&p[i], points + 32*i) < 0)
+    {
+      *bad = i;
+      return -1;
+    }
+    sc25519_from32bytes(&s[i], scalars + 32*i);
+  }
+  if (consttime)
+    ge25519_multi_scalarmult(&sum, p, s, n, tables);
+  else
+    ge25519_multi_scalarmult_vartime(&sum, p, s, n, tables);
+  ge25519_pack(out, &sum);
+  return 0;
+}
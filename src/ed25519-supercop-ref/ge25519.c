@@ -230,6 +230,28 @@ int ge25519_unpackneg_vartime(ge25519_p3 *r, const unsigned char p[32])
   return 0;
 }
 
+/* Decodes p into r (as the point itself, not its negative). Returns -1 if
+ * p is not a point, 1 if it is the encoding ge25519_pack() gives (y below
+ * 2^255-19, and no sign bit on x=0), and 0 for other encodings. */
+int ge25519_unpack_vartime(ge25519_p3 *r, const unsigned char p[32])
+{
+  unsigned char t[32];
+  int i;
+  if (ge25519_unpackneg_vartime(r, p)) return -1;
+  fe25519_neg(&r->x, &r->x);
+  fe25519_neg(&r->t, &r->t);
+  fe25519_pack(t, &r->y);
+  t[31] |= p[31] & 128;
+  for(i=0;i<32;i++)
+    if(t[i] != p[i]) return 0;
+  return !(fe25519_iszero(&r->x) && (p[31] & 128));
+}
+
+void ge25519_setneutral(ge25519_p3 *r)
+{
+  setneutral(r);
+}
+
 void ge25519_pack(unsigned char r[32], const ge25519_p3 *p)
 {
   fe25519 tx, ty, zi;
@@ -248,6 +270,73 @@ int ge25519_isneutral_vartime(const ge25519_p3 *p)
   return ret;
 }
 
+/* computes p - q */
+void ge25519_sub(ge25519_p3 *r, const ge25519_p3 *p, const ge25519_p3 *q)
+{
+  ge25519_p1p1 tp1p1;
+  ge25519_p3 negq = *q;
+  fe25519_neg(&negq.x, &q->x);
+  fe25519_neg(&negq.t, &q->t);
+  add_p1p1(&tp1p1, p, &negq);
+  p1p1_to_p3(r, &tp1p1);
+}
+
+/* computes p + q */
+void ge25519_add(ge25519_p3 *r, const ge25519_p3 *p, const ge25519_p3 *q)
+{
+  ge25519_p1p1 tp1p1;
+  add_p1p1(&tp1p1, p, q);
+  p1p1_to_p3(r, &tp1p1);
+}
+
+/* computes -p */
+void ge25519_neg(ge25519_p3 *r, const ge25519_p3 *p)
+{
+  *r = *p;
+  fe25519_neg(&r->x, &p->x);
+  fe25519_neg(&r->t, &p->t);
+}
+
+/* computes [2]p */
+void ge25519_double(ge25519_p3 *r, const ge25519_p3 *p)
+{
+  ge25519_p1p1 tp1p1;
+  dbl_p1p1(&tp1p1, (const ge25519_p2 *)p);
+  p1p1_to_p3(r, &tp1p1);
+}
+
+/* returns 1 if p and q are the same point, without normalizing either */
+int ge25519_iseq_vartime(const ge25519_p3 *p, const ge25519_p3 *q)
+{
+  fe25519 a, b;
+  fe25519_mul(&a, &p->x, &q->z);
+  fe25519_mul(&b, &q->x, &p->z);
+  if(!fe25519_iseq_vartime(&a, &b)) return 0;
+  fe25519_mul(&a, &p->y, &q->z);
+  fe25519_mul(&b, &q->y, &p->z);
+  return fe25519_iseq_vartime(&a, &b);
+}
+
+/* returns 1 if p satisfies the curve equation -x^2+y^2 = 1+dx^2y^2, in
+ * projective form (y^2-x^2)z^2 = z^4+dx^2y^2, and has t = xy/z */
+int ge25519_isoncurve_vartime(const ge25519_p3 *p)
+{
+  fe25519 x2, y2, z2, l, r;
+  fe25519_square(&x2, &p->x);
+  fe25519_square(&y2, &p->y);
+  fe25519_square(&z2, &p->z);
+  fe25519_sub(&l, &y2, &x2);
+  fe25519_mul(&l, &l, &z2);
+  fe25519_mul(&r, &x2, &y2);
+  fe25519_mul(&r, &r, &ge25519_ecd);
+  fe25519_square(&z2, &z2);
+  fe25519_add(&r, &r, &z2);
+  if(!fe25519_iseq_vartime(&l, &r)) return 0;
+  fe25519_mul(&l, &p->x, &p->y);
+  fe25519_mul(&r, &p->t, &p->z);
+  return fe25519_iseq_vartime(&l, &r);
+}
+
 /* computes [s1]p1 + [s2]p2 */
 void ge25519_double_scalarmult_vartime(ge25519_p3 *r, const ge25519_p3 *p1, const sc25519 *s1, const ge25519_p3 *p2, const sc25519 *s2)
 {
@@ -309,3 +398,217 @@ void ge25519_scalarmult_base(ge25519_p3 *r, const sc25519 *s)
     ge25519_mixadd2(r, &t);
   }
 }
+
+/* Straus' method with 4-bit windows: the 252 doublings are shared between
+ * all n points, and each point costs 14 additions of precomputation plus
+ * at most 64 more. scratch[15*i+k] holds [k+1]p[i]. */
+static void straus_vartime(ge25519_p3 *r, const ge25519_p3 *p, const sc25519 *s, unsigned long long n, ge25519_p3 *scratch)
+{
+  ge25519_p1p1 tp1p1;
+  ge25519_p3 *pre;
+  unsigned long long j;
+  int i, k;
+  crypto_uint32 d;
+
+  for(j=0;j<n;j++)
+  {
+    pre = scratch + 15*j;
+    pre[0] = p[j];
+    dbl_p1p1(&tp1p1,(ge25519_p2 *)&p[j]); p1p1_to_p3(&pre[1], &tp1p1);
+    for(k=2;k<15;k++)
+    {
+      add_p1p1(&tp1p1, &pre[k-1], &p[j]);
+      p1p1_to_p3(&pre[k], &tp1p1);
+    }
+  }
+
+  setneutral(r);
+  for(i=63;i>=0;i--)
+  {
+    if(i != 63)
+    {
+      for(k=0;k<3;k++)
+      {
+        dbl_p1p1(&tp1p1, (ge25519_p2 *)r);
+        p1p1_to_p2((ge25519_p2 *)r, &tp1p1);
+      }
+      dbl_p1p1(&tp1p1, (ge25519_p2 *)r);
+      p1p1_to_p3(r, &tp1p1);
+    }
+    for(j=0;j<n;j++)
+    {
+      d = (s[j].v[i>>1] >> (4*(i&1))) & 15;
+      if(d)
+      {
+        add_p1p1(&tp1p1, r, &scratch[15*j+d-1]);
+        p1p1_to_p3(r, &tp1p1);
+      }
+    }
+  }
+}
+
+/* bits pos..pos+c-1 of s */
+static int sc_bits(const sc25519 *s, int pos, int c)
+{
+  int i, d = 0;
+  for(i=0;i<c && pos+i<256;i++)
+    d |= ((s->v[(pos+i)>>3] >> ((pos+i)&7)) & 1) << i;
+  return d;
+}
+
+/* Pippenger's bucket method with c-bit windows: for each window, add
+ * every point to the bucket for its digit, then sum [k]bucket[k] with two
+ * running sums. That costs about n + 3*2^c additions per window, so for
+ * large n it beats Straus' 4 + 60/c per point per c bits. 'buckets' holds
+ * 2^c-1 points. */
+static void pippenger_vartime(ge25519_p3 *r, const ge25519_p3 *p, const sc25519 *s, unsigned long long n, int c, ge25519_p3 *buckets)
+{
+  ge25519_p1p1 tp1p1;
+  ge25519_p3 sum, acc;
+  unsigned long long j;
+  int w, k, d, nbuckets = (1 << c) - 1;
+
+  setneutral(r);
+  for(w=(252/c)*c;w>=0;w-=c)
+  {
+    for(k=0;k<c;k++)
+    {
+      dbl_p1p1(&tp1p1, (ge25519_p2 *)r);
+      p1p1_to_p3(r, &tp1p1);
+    }
+    for(k=0;k<nbuckets;k++)
+      setneutral(&buckets[k]);
+    for(j=0;j<n;j++)
+    {
+      d = sc_bits(&s[j], w, c);
+      if(d)
+      {
+        add_p1p1(&tp1p1, &buckets[d-1], &p[j]);
+        p1p1_to_p3(&buckets[d-1], &tp1p1);
+      }
+    }
+    setneutral(&sum);
+    setneutral(&acc);
+    for(k=nbuckets-1;k>=0;k--)
+    {
+      add_p1p1(&tp1p1, &sum, &buckets[k]);
+      p1p1_to_p3(&sum, &tp1p1);
+      add_p1p1(&tp1p1, &acc, &sum);
+      p1p1_to_p3(&acc, &tp1p1);
+    }
+    add_p1p1(&tp1p1, r, &acc);
+    p1p1_to_p3(r, &tp1p1);
+  }
+}
+
+/* The Pippenger window for n points, or 0 if Straus is cheaper, counting
+ * additions and doublings alike. Windows are limited to buckets that fit
+ * in Straus' scratch space. */
+static int pippenger_window(unsigned long long n)
+{
+  unsigned long long cost, best = 74*n + 252;
+  int c, window = 0;
+  for(c=2;c<=20 && ((1ULL << c) - 1) <= 15*n;c++)
+  {
+    cost = (unsigned long long)((252 + c) / c) * (n + 3*(1ULL << c) + c);
+    if(cost < best)
+    {
+      best = cost;
+      window = c;
+    }
+  }
+  return window;
+}
+
+void ge25519_multi_scalarmult_vartime(ge25519_p3 *r, const ge25519_p3 *p, const sc25519 *s, unsigned long long n, ge25519_p3 *scratch)
+{
+  int c = pippenger_window(n);
+  if(c)
+    pippenger_vartime(r, p, s, n, c, scratch);
+  else
+    straus_vartime(r, p, s, n, scratch);
+}
+
+/* Constant-time version of: if(b) r = p */
+static void cmov_p3(ge25519_p3 *r, const ge25519_p3 *p, unsigned char b)
+{
+  fe25519_cmov(&r->x, &p->x, b);
+  fe25519_cmov(&r->y, &p->y, b);
+  fe25519_cmov(&r->z, &p->z, b);
+  fe25519_cmov(&r->t, &p->t, b);
+}
+
+/* [b]p, for b in -4..4, from pre[k] = [k]p, in constant time */
+static void choose_p3(ge25519_p3 *t, const ge25519_p3 *pre, signed char b)
+{
+  fe25519 v;
+  int k;
+  *t = pre[0];
+  for(k=1;k<5;k++)
+    cmov_p3(t, &pre[k], equal(b,k) | equal(b,-k));
+  fe25519_neg(&v, &t->x);
+  fe25519_cmov(&t->x, &v, negative(b));
+  fe25519_neg(&v, &t->t);
+  fe25519_cmov(&t->t, &v, negative(b));
+}
+
+/* Straus' method again, with signed 3-bit windows and a table lookup that
+ * touches every entry, so that the time taken does not depend on the
+ * scalars (the points are taken to be public). scratch[6*i..6*i+4] holds
+ * [k]p[i] for k = 0..4, and scratch[6*i+5] the digits of s[i]. */
+void ge25519_multi_scalarmult(ge25519_p3 *r, const ge25519_p3 *p, const sc25519 *s, unsigned long long n, ge25519_p3 *scratch)
+{
+  ge25519_p1p1 tp1p1;
+  ge25519_p3 *pre, t;
+  signed char *digits;
+  unsigned long long j;
+  int i, k;
+
+  for(j=0;j<n;j++)
+  {
+    pre = scratch + 6*j;
+    setneutral(&pre[0]);
+    pre[1] = p[j];
+    dbl_p1p1(&tp1p1,(ge25519_p2 *)&p[j]); p1p1_to_p3(&pre[2], &tp1p1);
+    add_p1p1(&tp1p1, &pre[2], &p[j]);     p1p1_to_p3(&pre[3], &tp1p1);
+    dbl_p1p1(&tp1p1,(ge25519_p2 *)&pre[2]); p1p1_to_p3(&pre[4], &tp1p1);
+    sc25519_window3((signed char *)&pre[5], &s[j]);
+  }
+
+  setneutral(r);
+  for(i=84;i>=0;i--)
+  {
+    if(i != 84)
+    {
+      for(k=0;k<2;k++)
+      {
+        dbl_p1p1(&tp1p1, (ge25519_p2 *)r);
+        p1p1_to_p2((ge25519_p2 *)r, &tp1p1);
+      }
+      dbl_p1p1(&tp1p1, (ge25519_p2 *)r);
+      p1p1_to_p3(r, &tp1p1);
+    }
+    for(j=0;j<n;j++)
+    {
+      pre = scratch + 6*j;
+      digits = (signed char *)&pre[5];
+      choose_p3(&t, pre, digits[i]);
+      add_p1p1(&tp1p1, r, &t);
+      p1p1_to_p3(r, &tp1p1);
+    }
+  }
+}
+
+/* computes [s]p, in time that does not depend on s */
+void ge25519_scalarmult(ge25519_p3 *r, const ge25519_p3 *p, const sc25519 *s)
+{
+  ge25519_p3 scratch[6];
+  ge25519_multi_scalarmult(r, p, s, 1, scratch);
+}
+
+/* computes [s]p */
+void ge25519_scalarmult_vartime(ge25519_p3 *r, const ge25519_p3 *p, const sc25519 *s)
+{
+  ge25519_p3 scratch[ge25519_MULTI_SCRATCH];
+  straus_vartime(r, p, s, 1, scratch);
+}
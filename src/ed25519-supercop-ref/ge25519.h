@@ -7,10 +7,23 @@
 #define ge25519                           crypto_sign_ed25519_ref_ge25519
 #define ge25519_base                      crypto_sign_ed25519_ref_ge25519_base
 #define ge25519_unpackneg_vartime         crypto_sign_ed25519_ref_unpackneg_vartime
+#define ge25519_unpack_vartime            crypto_sign_ed25519_ref_unpack_vartime
+#define ge25519_setneutral                crypto_sign_ed25519_ref_setneutral
 #define ge25519_pack                      crypto_sign_ed25519_ref_pack
 #define ge25519_isneutral_vartime         crypto_sign_ed25519_ref_isneutral_vartime
 #define ge25519_double_scalarmult_vartime crypto_sign_ed25519_ref_double_scalarmult_vartime
 #define ge25519_scalarmult_base           crypto_sign_ed25519_ref_scalarmult_base
+#define ge25519_multi_scalarmult_vartime  crypto_sign_ed25519_ref_multi_scalarmult_vartime
+#define ge25519_multi_scalarmult          crypto_sign_ed25519_ref_multi_scalarmult
+#define ge25519_sub                       crypto_sign_ed25519_ref_sub
+#define ge25519_add                       crypto_sign_ed25519_ref_add
+#define ge25519_neg                       crypto_sign_ed25519_ref_neg
+#define ge25519_double                    crypto_sign_ed25519_ref_double
+#define ge25519_iseq_vartime              crypto_sign_ed25519_ref_iseq_vartime
+#define ge25519_isoncurve_vartime         crypto_sign_ed25519_ref_isoncurve_vartime
+#define ge25519_scalarmult                crypto_sign_ed25519_ref_scalarmult
+#define ge25519_scalarmult_vartime        crypto_sign_ed25519_ref_scalarmult_vartime
+#define ge25519_MULTI_SCRATCH             15 /* points of scratch per input point */
 
 typedef struct
 {
@@ -24,12 +37,46 @@ extern const ge25519 ge25519_base;
 
 int ge25519_unpackneg_vartime(ge25519 *r, const unsigned char p[32]);
 
+/* returns -1 if p is not a point, else 1 if p is canonical, or 0 */
+int ge25519_unpack_vartime(ge25519 *r, const unsigned char p[32]);
+
+void ge25519_setneutral(ge25519 *r);
+
 void ge25519_pack(unsigned char r[32], const ge25519 *p);
 
 int ge25519_isneutral_vartime(const ge25519 *p);
 
+/* computes p + q */
+void ge25519_add(ge25519 *r, const ge25519 *p, const ge25519 *q);
+
+/* computes p - q */
+void ge25519_sub(ge25519 *r, const ge25519 *p, const ge25519 *q);
+
+/* computes -p */
+void ge25519_neg(ge25519 *r, const ge25519 *p);
+
+/* computes [2]p */
+void ge25519_double(ge25519 *r, const ge25519 *p);
+
+int ge25519_iseq_vartime(const ge25519 *p, const ge25519 *q);
+
+/* returns 1 if p satisfies the curve equation (and t = xy/z), else 0 */
+int ge25519_isoncurve_vartime(const ge25519 *p);
+
 void ge25519_double_scalarmult_vartime(ge25519 *r, const ge25519 *p1, const sc25519 *s1, const ge25519 *p2, const sc25519 *s2);
 
 void ge25519_scalarmult_base(ge25519 *r, const sc25519 *s);
 
+/* computes [s]p, in constant time, or (faster) in variable time */
+void ge25519_scalarmult(ge25519 *r, const ge25519 *p, const sc25519 *s);
+void ge25519_scalarmult_vartime(ge25519 *r, const ge25519 *p, const sc25519 *s);
+
+/* computes \sum_{i<n} [s[i]]p[i], using ge25519_MULTI_SCRATCH*n points of
+ * scratch space, with Straus' method for small n and Pippenger's for large
+ * n */
+void ge25519_multi_scalarmult_vartime(ge25519 *r, const ge25519 *p, const sc25519 *s, unsigned long long n, ge25519 *scratch);
+
+/* the same, in time that does not depend on s */
+void ge25519_multi_scalarmult(ge25519 *r, const ge25519 *p, const sc25519 *s, unsigned long long n, ge25519 *scratch);
+
 #endif
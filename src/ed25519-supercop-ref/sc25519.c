@@ -167,6 +167,32 @@ void sc25519_add(sc25519 *r, const sc25519 *x, const sc25519 *y)
   reduce_add_sub(r);
 }
 
+/* computes -x mod m, in constant time */
+void sc25519_neg(sc25519 *r, const sc25519 *x)
+{
+  crypto_uint32 b = 0;
+  crypto_uint32 t;
+  int i;
+  /* m - x is in 1..m, which reduce_add_sub() takes to 0..m-1 */
+  for(i=0;i<32;i++)
+  {
+    t = m[i] - x->v[i] - b;
+    r->v[i] = t & 255;
+    b = (t >> 8) & 1;
+  }
+  reduce_add_sub(r);
+}
+
+/* returns 1 if x == y, in constant time */
+int sc25519_iseq(const sc25519 *x, const sc25519 *y)
+{
+  crypto_uint32 d = 0;
+  int i;
+  for(i=0;i<32;i++)
+    d |= x->v[i] ^ y->v[i];
+  return (int)(1 & ((d - 1) >> 8));
+}
+
 void sc25519_sub_nored(sc25519 *r, const sc25519 *x, const sc25519 *y)
 {
   crypto_uint32 b = 0;
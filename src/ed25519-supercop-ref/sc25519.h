@@ -16,6 +16,8 @@
 #define sc25519_lt_vartime       crypto_sign_ed25519_ref_sc25519_lt_vartime
 #define sc25519_add              crypto_sign_ed25519_ref_sc25519_add
 #define sc25519_sub_nored        crypto_sign_ed25519_ref_sc25519_sub_nored
+#define sc25519_neg              crypto_sign_ed25519_ref_sc25519_neg
+#define sc25519_iseq             crypto_sign_ed25519_ref_sc25519_iseq
 #define sc25519_mul              crypto_sign_ed25519_ref_sc25519_mul
 #define sc25519_mul_shortsc      crypto_sign_ed25519_ref_sc25519_mul_shortsc
 #define sc25519_window3          crypto_sign_ed25519_ref_sc25519_window3
@@ -54,6 +56,10 @@ void sc25519_add(sc25519 *r, const sc25519 *x, const sc25519 *y);
 
 void sc25519_sub_nored(sc25519 *r, const sc25519 *x, const sc25519 *y);
 
+void sc25519_neg(sc25519 *r, const sc25519 *x);
+
+int sc25519_iseq(const sc25519 *x, const sc25519 *y);
+
 void sc25519_mul(sc25519 *r, const sc25519 *x, const sc25519 *y);
 
 void sc25519_mul_shortsc(sc25519 *r, const sc25519 *x, const shortsc25519 *y);
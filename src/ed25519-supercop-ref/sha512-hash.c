@@ -70,3 +70,72 @@ int crypto_hash_sha512(unsigned char *out,const unsigned char *in,unsigned long
 
   return 0;
 }
+
+void crypto_hash_sha512_init(crypto_hash_sha512_state *s)
+{
+  int i;
+  for (i = 0;i < 64;++i) s->h[i] = iv[i];
+  s->buflen = 0;
+  s->bytes = 0;
+}
+
+void crypto_hash_sha512_update(crypto_hash_sha512_state *s,const unsigned char *in,unsigned long long inlen)
+{
+  unsigned long long i, n;
+
+  s->bytes += inlen;
+  if (s->buflen) {
+    n = 128 - s->buflen;
+    if (n > inlen) n = inlen;
+    for (i = 0;i < n;++i) s->buf[s->buflen + i] = in[i];
+    s->buflen += n;
+    in += n;
+    inlen -= n;
+    if (s->buflen < 128) return;
+    blocks(s->h,s->buf,128);
+    s->buflen = 0;
+  }
+  blocks(s->h,in,inlen);
+  in += inlen;
+  inlen &= 127;
+  in -= inlen;
+  for (i = 0;i < inlen;++i) s->buf[i] = in[i];
+  s->buflen = inlen;
+}
+
+void crypto_hash_sha512_final(crypto_hash_sha512_state *s,unsigned char *out)
+{
+  unsigned char padded[256];
+  unsigned long long i, inlen = s->buflen, bytes = s->bytes;
+
+  for (i = 0;i < inlen;++i) padded[i] = s->buf[i];
+  padded[inlen] = 0x80;
+
+  if (inlen < 112) {
+    for (i = inlen + 1;i < 119;++i) padded[i] = 0;
+    padded[119] = bytes >> 61;
+    padded[120] = bytes >> 53;
+    padded[121] = bytes >> 45;
+    padded[122] = bytes >> 37;
+    padded[123] = bytes >> 29;
+    padded[124] = bytes >> 21;
+    padded[125] = bytes >> 13;
+    padded[126] = bytes >> 5;
+    padded[127] = bytes << 3;
+    blocks(s->h,padded,128);
+  } else {
+    for (i = inlen + 1;i < 247;++i) padded[i] = 0;
+    padded[247] = bytes >> 61;
+    padded[248] = bytes >> 53;
+    padded[249] = bytes >> 45;
+    padded[250] = bytes >> 37;
+    padded[251] = bytes >> 29;
+    padded[252] = bytes >> 21;
+    padded[253] = bytes >> 13;
+    padded[254] = bytes >> 5;
+    padded[255] = bytes << 3;
+    blocks(s->h,padded,256);
+  }
+
+  for (i = 0;i < 64;++i) out[i] = s->h[i];
+}
@@ -1,4 +1,22 @@
+#ifndef SHA512_H
+#define SHA512_H
+
 extern int crypto_hashblocks(unsigned char *statebytes,const unsigned char *in,unsigned long long inlen);
 extern int crypto_hash_sha512(unsigned char *out,const unsigned char *in,unsigned long long inlen);
 
 #define crypto_hash_sha512_BYTES 64
+
+/* incremental interface, for inputs that are not contiguous in memory */
+typedef struct
+{
+  unsigned char h[64];
+  unsigned char buf[128];
+  unsigned long long buflen; /* bytes waiting in buf, always < 128 */
+  unsigned long long bytes;  /* total bytes absorbed */
+} crypto_hash_sha512_state;
+
+extern void crypto_hash_sha512_init(crypto_hash_sha512_state *s);
+extern void crypto_hash_sha512_update(crypto_hash_sha512_state *s,const unsigned char *in,unsigned long long inlen);
+extern void crypto_hash_sha512_final(crypto_hash_sha512_state *s,unsigned char *out);
+
+#endif
@@ -1,11 +1,80 @@
+import os
+import sys
+
+# The C extension, or else the pure-Python one with the same API, which is
+# slower and not constant-time. $ED25519_BACKEND can insist on either.
+_backend_mode = os.environ.get("ED25519_BACKEND", "")
+if _backend_mode not in ("", "c", "pure"):
+    raise ValueError("ED25519_BACKEND must be 'c' or 'pure', not %r"
+                     % (_backend_mode,))
+if _backend_mode == "pure":
+    _ed25519 = None
+else:
+    try:
+        from . import _ed25519
+    except ImportError:
+        if _backend_mode == "c":
+            raise
+        _ed25519 = None
+if _ed25519 is None:
+    from . import _pure as _ed25519
+    # so 'from . import _ed25519' and 'import ed25519._ed25519' find it
+    sys.modules[__name__ + "._ed25519"] = _ed25519
+    backend = "pure"
+else:
+    backend = "c"
+
 from .keys import (BadSignatureError, BadPrefixError,
-                  create_keypair, SigningKey, VerifyingKey,
+                  create_keypair, SigningKey, VerifyingKey, PrefixSigner,
                   remove_prefix, to_ascii, from_ascii)
+from .cache import PointCache, point_cache, VerificationCache
+from .codec import Codec
+from .group import Point, Scalar, multiscalar_mul
+from .metrics import stats
 
 (BadSignatureError, BadPrefixError,
- create_keypair, SigningKey, VerifyingKey,
- remove_prefix, to_ascii, from_ascii) # hush pyflakes
+ create_keypair, SigningKey, VerifyingKey, PrefixSigner,
+ remove_prefix, to_ascii, from_ascii,
+ PointCache, point_cache, VerificationCache, Codec,
+ Point, Scalar, multiscalar_mul, stats) # hush pyflakes
+
+# These pull in concurrent.futures, multiprocessing, or (for __version__,
+# in a source tree) a 'git describe' subprocess, so they are only loaded
+# when first used.
+_lazy = {"Executor": ".executor",
+         "Keyring": ".keyring",
+         "verify_batch": ".batch",
+         "verify_arrays": ".batch",
+         "sign_arrays": ".batch",
+         "PackedBatch": ".batch",
+         "decompress_many": ".batch",
+         "validate_keys": ".batch",
+         "verify_stream": ".stream",
+         }
+# these used to be imported eagerly, so ed25519.batch (etc.) still works
+# without an explicit import
+_submodules = ("batch", "executor")
+
+def _get_version():
+    from ._version import get_versions
+    return str(get_versions()['version'])
+
+def __getattr__(name):
+    from importlib import import_module
+    if name == "__version__":
+        value = _get_version()
+    elif name in _lazy:
+        value = getattr(import_module(_lazy[name], __name__), name)
+    elif name in _submodules:
+        value = import_module("." + name, __name__)
+    else:
+        raise AttributeError("module %r has no attribute %r"
+                             % (__name__, name))
+    globals()[name] = value
+    return value
 
-from ._version import get_versions
-__version__ = str(get_versions()['version'])
-del get_versions
+if sys.version_info < (3, 7):
+    # no module-level __getattr__ (PEP 562): load everything now
+    for _name in list(_lazy) + ["__version__"]:
+        __getattr__(_name)
+    del _name
@@ -0,0 +1,929 @@
+"""A pure-Python implementation of the _ed25519 extension's API.
+
+ed25519 falls back to this when the C extension is missing (e.g. on a host
+without a compiler), or uses it when $ED25519_BACKEND is "pure";
+ed25519.backend says which one is loaded. It gives the same results as the
+C code, including the prepare() format and the handling of malformed keys
+and signatures. Python's big integers make it about as fast as the
+portable C code at signing, but it verifies at half the speed, releases no
+GIL, and (being Python) makes no attempt to run in constant time: see
+"Security" in the README.
+
+Points are kept in extended coordinates (X:Y:Z:T, with x=X/Z, y=Y/Z and
+xy=T/Z), so additions and doublings need no inversions. Multiples of the
+base point come from a table of j*16**i*B (built on first use), so a
+fixed-base multiplication is 64 additions and no doublings; other points
+are multiplied with a 4-bit fixed window. The batch functions check each
+signature on its own: without the C code's multi-scalar multiplication,
+a random linear combination would save nothing.
+"""
+
+import struct
+import threading
+import time
+
+SECRETKEYBYTES = 64
+PUBLICKEYBYTES = 32
+SIGNATUREKEYBYTES = 64
+PREPAREDKEYBYTES = 64
+KEY_NOT_ON_CURVE = 1
+KEY_NONCANONICAL = 2
+KEY_SMALL_ORDER = 4
+KEY_MIXED_ORDER = 8
+STATS_BUCKETS = 40
+
+class BadSignatureError(Exception):
+    pass
+class BadPrefixError(Exception):
+    pass
+# the extension creates them as ed25519.BadSignatureError and so on
+BadSignatureError.__module__ = BadPrefixError.__module__ = "ed25519"
+
+P = 2**255 - 19
+L = 2**252 + 27742317777372353535851937790883648493
+
+try:
+    pow(2, -1, P)
+    def _inv(x):
+        return pow(x, -1, P)
+except (ValueError, TypeError):
+    # before Python 3.8: Fermat
+    def _inv(x):
+        return pow(x, P-2, P)
+
+if hasattr(int, "from_bytes"):
+    def _int(b):
+        return int.from_bytes(b, "little")
+    def _bytes(n):
+        return n.to_bytes(32, "little")
+else:
+    from binascii import hexlify, unhexlify
+    def _int(b):
+        return int(hexlify(b[::-1]), 16)
+    def _bytes(n):
+        return unhexlify(("%064x" % n).encode("ascii"))[::-1]
+
+D = -121665 * _inv(121666) % P
+D2 = 2 * D % P
+SQRTM1 = pow(2, (P-1) // 4, P)
+IDENTITY = (0, 1, 1, 0)
+
+def _add(p, q):
+    X1, Y1, Z1, T1 = p
+    X2, Y2, Z2, T2 = q
+    A = (Y1 - X1) * (Y2 - X2) % P
+    B = (Y1 + X1) * (Y2 + X2) % P
+    C = T1 * D2 * T2 % P
+    D_ = 2 * Z1 * Z2 % P
+    E, F, G, H = B - A, D_ - C, D_ + C, B + A
+    return (E * F % P, G * H % P, F * G % P, E * H % P)
+
+def _add_cached(p, q):
+    # q is (y+x, y-x, 2dxy) of a point with Z=1, as in the base table
+    X1, Y1, Z1, T1 = p
+    ypx, ymx, t2d = q
+    A = (Y1 - X1) * ymx % P
+    B = (Y1 + X1) * ypx % P
+    C = T1 * t2d % P
+    D_ = 2 * Z1
+    E, F, G, H = B - A, D_ - C, D_ + C, B + A
+    return (E * F % P, G * H % P, F * G % P, E * H % P)
+
+def _double(p):
+    X1, Y1, Z1, _ = p
+    A = X1 * X1 % P
+    B = Y1 * Y1 % P
+    C = 2 * Z1 * Z1 % P
+    H = A + B
+    E = H - (X1 + Y1) * (X1 + Y1)
+    G = A - B
+    F = C + G
+    return (E * F % P, G * H % P, F * G % P, E * H % P)
+
+def _neg(p):
+    X, Y, Z, T = p
+    return (-X % P, Y, Z, -T % P)
+
+def _encode(p):
+    X, Y, Z, _ = p
+    zi = _inv(Z)
+    x, y = X * zi % P, Y * zi % P
+    return _bytes(y | (x & 1) << 255)
+
+def _recover_x(y, sign):
+    """The x with the given parity (sign) on the curve at y, or None."""
+    u = (y * y - 1) % P
+    v = (D * y * y + 1) % P
+    x = u * pow(v, 3, P) * pow(u * pow(v, 7, P), (P-5) // 8, P) % P
+    if v * x * x % P != u:
+        x = x * SQRTM1 % P
+        if v * x * x % P != u:
+            return None
+    if (x & 1) != sign:
+        x = -x % P
+    return x
+
+def _decompress(s):
+    """Decode a 32-byte point, or return None. Like the C code, this takes
+    y modulo p, and accepts x=0 with either sign."""
+    y = _int(s) & ((1 << 255) - 1)
+    y %= P
+    x = _recover_x(y, bytearray(s)[31] >> 7)
+    if x is None:
+        return None
+    return (x, y, 1, x * y % P)
+
+_BY = 4 * _inv(5) % P
+BASE = (_recover_x(_BY, 0), _BY, 1, _recover_x(_BY, 0) * _BY % P)
+
+_base_table = None
+_base_table_lock = threading.Lock()
+
+def _get_base_table():
+    # _base_table[i][j] is j*16**i*B, in the form _add_cached() takes
+    global _base_table
+    with _base_table_lock:
+        if _base_table is None:
+            table = []
+            point = BASE
+            for i in range(64):
+                row = [None]
+                multiple = point
+                for j in range(1, 16):
+                    X, Y, Z, T = multiple
+                    zi = _inv(Z)
+                    x, y = X * zi % P, Y * zi % P
+                    row.append(((y + x) % P, (y - x) % P, D2 * x * y % P))
+                    multiple = _add(multiple, point)
+                table.append(row)
+                point = multiple # 16*point
+            _base_table = table
+    return _base_table
+
+def _scalarmult_base(k):
+    table = _base_table or _get_base_table()
+    k %= L
+    acc = IDENTITY
+    for row in table:
+        if k & 15:
+            acc = _add_cached(acc, row[k & 15])
+        k >>= 4
+    return acc
+
+def _scalarmult(p, k):
+    k %= L
+    multiples = [IDENTITY, p]
+    for j in range(2, 16):
+        multiples.append(_add(multiples[-1], p))
+    acc = IDENTITY
+    for shift in range(252, -4, -4):
+        if acc is not IDENTITY:
+            acc = _double(_double(_double(_double(acc))))
+        nibble = (k >> shift) & 15
+        if nibble:
+            acc = _add(acc, multiples[nibble])
+    return acc
+
+def _hash_int(*parts):
+    import hashlib # slow to import, so not until needed
+    h = hashlib.sha512()
+    for part in parts:
+        h.update(part)
+    return _int(h.digest())
+
+def _secret_scalar(seed):
+    # the clamped scalar and the nonce prefix
+    import hashlib
+    e = hashlib.sha512(seed).digest()
+    a = _int(e[:32]) & ((1 << 254) - 8) | (1 << 254)
+    return a, e[32:]
+
+def _sign(m, sk):
+    a, prefix = _secret_scalar(sk[:32])
+    r = _hash_int(prefix, m) % L
+    R = _encode(_scalarmult_base(r))
+    h = _hash_int(R, sk[32:64], m) % L
+    return R + _bytes((r + h * a) % L)
+
+def _verify(sig, m, pk, nega=None):
+    """Check a 64-byte signature. 'nega' is -A, if already decoded."""
+    if nega is None:
+        a = _decompress(pk)
+        if a is None:
+            return False
+        nega = _neg(a)
+    h = _hash_int(sig[:32], pk, m) % L
+    s = _int(sig[32:64]) % L
+    # R = sB - hA
+    r = _add(_scalarmult_base(s), _scalarmult(nega, h))
+    return _encode(r) == sig[:32]
+
+def _unpack_prepared(prepared, pk):
+    """-A from prepare(pk)'s output, or None if 'prepared' is not that. As
+    in the C code, it is checked (against pk's y and sign, and the curve
+    equation) rather than recomputed."""
+    mask = (1 << 255) - 1
+    x = (_int(prepared[:32]) & mask) % P
+    y = (_int(prepared[32:64]) & mask) % P
+    if y != (_int(pk) & mask) % P:
+        return None
+    if x and (x & 1) != 1 - (bytearray(pk)[31] >> 7):
+        return None
+    if (y * y - x * x - 1 - D * x * x * y * y) % P:
+        return None
+    return (x, y, 1, x * y % P)
+
+def _verify_prepared(sig, m, pk, prepared):
+    """_verify(), with -A from 'prepared' (if not None)."""
+    if prepared is None:
+        return _verify(sig, m, pk)
+    nega = _unpack_prepared(prepared, pk)
+    return nega is not None and _verify(sig, m, pk, nega)
+
+def _buffer(data):
+    # bytes from any object with the buffer protocol
+    if isinstance(data, bytes):
+        return data
+    return memoryview(data).tobytes()
+
+def _writable(buf):
+    view = memoryview(buf)
+    if view.readonly:
+        raise TypeError("a writable buffer is required")
+    if hasattr(view, "cast") and view.format != "B":
+        view = view.cast("B")
+    return view
+
+def _check_key(key, size, kind):
+    if len(key) != size:
+        raise TypeError("%s are %d byte strings" % (kind, size))
+
+# --- operation counters, as in the extension
+
+_STAT_OPS = ("publickey", "sign", "verify", "verify_batch")
+_stats = {}
+_stats_enabled = False
+_timer = getattr(time, "perf_counter", time.time)
+
+def stats_reset():
+    """stats_reset()
+
+    Set all the operation counters back to zero."""
+    for op in _STAT_OPS:
+        _stats[op] = {"calls": 0, "items": 0, "failures": 0, "bytes": 0,
+                      "nanoseconds": 0, "buckets": [0] * STATS_BUCKETS}
+stats_reset()
+
+def stats_enable(flag):
+    """stats_enable(flag)
+
+    Turn the operation counters on or off, returning the previous setting."""
+    global _stats_enabled
+    previous, _stats_enabled = _stats_enabled, bool(int(flag))
+    return previous
+
+def stats_snapshot():
+    """stats_snapshot()
+
+    Return a dict mapping each operation name to a dict of its counters,
+    as the extension's stats_snapshot() does."""
+    return dict((op, dict(counters, buckets=list(counters["buckets"])))
+                for op, counters in _stats.items())
+
+def _stats_start():
+    return _timer() if _stats_enabled else 0
+
+def _stats_record(op, start, items, failures, nbytes):
+    if not start:
+        return
+    elapsed = int((_timer() - start) * 1e9)
+    s = _stats[op]
+    s["calls"] += 1
+    s["items"] += items
+    s["failures"] += failures
+    s["bytes"] += nbytes
+    s["nanoseconds"] += elapsed
+    s["buckets"][min(elapsed.bit_length(), STATS_BUCKETS-1)] += 1
+
+def profile_snapshot():
+    """profile_snapshot()
+
+    Phase profiling needs the extension built with ED25519_PROFILE, so
+    this always returns None."""
+    return None
+
+def profile_reset():
+    """profile_reset()
+
+    Does nothing: see profile_snapshot()."""
+
+# --- the extension's functions
+
+def publickey(seed):
+    """publickey(signkey_seed)
+
+    Accepts a 32-byte seed. Return a tuple of (verfkey, signkey), with the
+    64-byte private signing key and the corresponding 32-byte public
+    verfiying key."""
+    seed = _buffer(seed)
+    if len(seed) < 32:
+        raise ValueError("seeds are 32 bytes long")
+    seed = seed[:32]
+    start = _stats_start()
+    a, _ = _secret_scalar(seed)
+    pk = _encode(_scalarmult_base(a))
+    _stats_record("publickey", start, 1, 0, 32)
+    return pk, seed + pk
+
+def sign(msg, signkey):
+    """sign(message, signing_key)
+
+    Return the concatenation of three parts: the 32-byte R signature value,
+    the 32-byte S signature value, and the original message."""
+    msg, signkey = _buffer(msg), _buffer(signkey)
+    _check_key(signkey, SECRETKEYBYTES, "Private signing keys")
+    start = _stats_start()
+    sig = _sign(msg, signkey)
+    _stats_record("sign", start, 1, 0, 2 * len(msg) + 128)
+    return sig + msg
+
+class _PrefixState(object):
+    """The opaque state made by sign_prefix_init(). sign_prefixed() takes
+    only these, so it cannot be given a different prefix than the one in
+    the nonce hash, which would reuse nonces across messages."""
+    __slots__ = ("_a", "_nonce", "_pk", "_prefix")
+
+def sign_prefix_init(prefix, signkey):
+    """sign_prefix_init(prefix, signing_key)
+
+    Hash the parts of signing that are the same for every message beginning
+    with 'prefix', returning an opaque state for sign_prefixed(). The state
+    includes the expanded secret key, so keep it as secret as the key."""
+    import hashlib
+    prefix, signkey = _buffer(prefix), _buffer(signkey)
+    _check_key(signkey, SECRETKEYBYTES, "Private signing keys")
+    a, nonce_prefix = _secret_scalar(signkey[:32])
+    nonce = hashlib.sha512(nonce_prefix)
+    nonce.update(prefix)
+    state = _PrefixState()
+    state._a, state._nonce = a, nonce
+    state._pk, state._prefix = signkey[32:64], prefix
+    return state
+
+def sign_prefixed(state, msg):
+    """sign_prefixed(state, message)
+
+    Return the 64-byte signature of the state's prefix followed by
+    'message', where 'state' is from sign_prefix_init()."""
+    if not isinstance(state, _PrefixState):
+        raise TypeError("sign_prefixed() needs a sign_prefix_init() state")
+    a, nonce, pk, prefix = state._a, state._nonce, state._pk, state._prefix
+    msg = _buffer(msg)
+    start = _stats_start()
+    nonce = nonce.copy()
+    nonce.update(msg)
+    r = _int(nonce.digest()) % L
+    R = _encode(_scalarmult_base(r))
+    h = _hash_int(R, pk, prefix, msg) % L
+    _stats_record("sign", start, 1, 0, 2 * len(msg) + 64 + len(prefix))
+    return R + _bytes((r + h * a) % L)
+
+def open(sig_and_msg, verfkey, prepared=None):
+    """open(message+signature, verifying_key, prepared=None)
+
+    Check the signature for validity. Returns the message if valid, raises
+    BadSignatureError if not. If 'prepared' is provided, it must be the
+    output of prepare(verifying_key); the signature fails if it is not."""
+    sig_and_msg, verfkey = _buffer(sig_and_msg), _buffer(verfkey)
+    if len(sig_and_msg) < SIGNATUREKEYBYTES:
+        raise TypeError("signature-and-message must be at least 64 bytes long")
+    _check_key(verfkey, PUBLICKEYBYTES, "Public verifying keys")
+    if prepared is not None:
+        prepared = _buffer(prepared)
+        _check_key(prepared, PREPAREDKEYBYTES, "Prepared verifying keys")
+    msg = sig_and_msg[64:]
+    start = _stats_start()
+    good = _verify_prepared(sig_and_msg[:64], msg, verfkey, prepared)
+    _stats_record("verify", start, 1, not good, len(msg) + 64)
+    if not good:
+        raise BadSignatureError("Bad Signature")
+    return msg
+
+def prepare(verfkey):
+    """prepare(verifying_key)
+
+    Decompress and validate a 32-byte verifying key, returning the 64-byte
+    prepared form accepted by open(). Raises ValueError if the key does not
+    encode a point on the curve."""
+    verfkey = _buffer(verfkey)
+    _check_key(verfkey, PUBLICKEYBYTES, "Public verifying keys")
+    a = _decompress(verfkey)
+    if a is None:
+        raise ValueError("invalid verifying key")
+    x, y, _, _ = _neg(a)
+    return _bytes(x) + _bytes(y)
+
+def check_prepared(verfkey, prepared):
+    """check_prepared(verifying_key, prepared)
+
+    Raise ValueError unless 'prepared' is what prepare(verifying_key)
+    returns. This is much cheaper than calling prepare() again."""
+    verfkey, prepared = _buffer(verfkey), _buffer(prepared)
+    _check_key(verfkey, PUBLICKEYBYTES, "Public verifying keys")
+    _check_key(prepared, PREPAREDKEYBYTES, "Prepared verifying keys")
+    if _unpack_prepared(prepared, verfkey) is None:
+        raise ValueError("prepared point does not match the verifying key")
+
+def prepare_many(verfkeys, prepared, valid):
+    """prepare_many(verifying_keys, prepared, valid)
+
+    prepare() for N keys at once, writing 64 bytes per key into 'prepared'
+    and setting valid[i] to 1 for each key that decodes (and 0, with its
+    prepared form zeroed, for each one that does not). Returns the number
+    of valid keys."""
+    verfkeys = _buffer(verfkeys)
+    out, valid = _writable(prepared), _writable(valid)
+    if len(verfkeys) % PUBLICKEYBYTES:
+        raise ValueError("verifying keys must be a multiple of 32 bytes long")
+    n = len(verfkeys) // PUBLICKEYBYTES
+    if len(out) < n * PREPAREDKEYBYTES:
+        raise ValueError("prepared buffer is too small")
+    if len(valid) < n:
+        raise ValueError("valid buffer is too small")
+    good = 0
+    for i in range(n):
+        try:
+            out[64*i:64*i+64] = prepare(verfkeys[32*i:32*i+32])
+            valid[i:i+1] = b"\x01"
+            good += 1
+        except ValueError:
+            out[64*i:64*i+64] = b"\x00" * 64
+            valid[i:i+1] = b"\x00"
+    return good
+
+def _is_neutral(p):
+    X, Y, Z, _ = p
+    return X % P == 0 and (Y - Z) % P == 0
+
+def validate_keys(verfkeys, flags, random=None):
+    """validate_keys(verifying_keys, flags, random=None)
+
+    Check N 32-byte verifying keys, setting flags[i] to the KEY_* bits for
+    the problems found with key i, as the extension's validate_keys() does.
+    Keys are checked for KEY_MIXED_ORDER (one at a time) if 'random' is
+    given, which is otherwise only checked for its length."""
+    verfkeys = _buffer(verfkeys)
+    flags = _writable(flags)
+    if len(verfkeys) % PUBLICKEYBYTES:
+        raise ValueError("verifying keys must be a multiple of 32 bytes long")
+    n = len(verfkeys) // PUBLICKEYBYTES
+    if len(flags) < n:
+        raise ValueError("flags buffer is too small")
+    if random is not None and len(_buffer(random)) != n * 32:
+        raise ValueError("need 32 random bytes per key")
+    good = 0
+    for i in range(n):
+        key = verfkeys[32*i:32*i+32]
+        p = _decompress(key)
+        if p is None:
+            f = KEY_NOT_ON_CURVE
+        else:
+            f = 0
+            if _encode(p) != key:
+                f |= KEY_NONCANONICAL
+            if _is_neutral(_double(_double(_double(p)))):
+                f |= KEY_SMALL_ORDER
+            elif random is not None:
+                # [L]p, as [L-1]p + p, since _scalarmult() reduces mod L
+                if not _is_neutral(_add(_scalarmult(p, L - 1), p)):
+                    f |= KEY_MIXED_ORDER
+        flags[i:i+1] = bytearray([f])
+        good += not f
+    return good
+
+def _offsets(n, msgs, offsets):
+    offsets = _buffer(offsets)
+    if len(offsets) != (n+1) * 8:
+        raise ValueError("need N+1 64-bit message offsets")
+    offsets = struct.unpack("=%dq" % (n+1), offsets)
+    for start, end in zip(offsets, offsets[1:]):
+        if start < 0 or start > end or end > len(msgs):
+            raise ValueError("bad message offsets")
+    return offsets
+
+def _check_signatures(sigs, keys):
+    if len(sigs) % SIGNATUREKEYBYTES:
+        raise ValueError("signatures must be a multiple of 64 bytes long")
+    n = len(sigs) // SIGNATUREKEYBYTES
+    if len(keys) != n * PUBLICKEYBYTES:
+        raise ValueError("need one 32-byte verifying key per signature")
+    return n
+
+def _verify_each(sigs, keys, msgs, offsets, results):
+    good = 0
+    for i in range(len(offsets) - 1):
+        m = msgs[offsets[i]:offsets[i+1]]
+        start = _stats_start()
+        ok = _verify(sigs[64*i:64*i+64], m, keys[32*i:32*i+32])
+        _stats_record("verify", start, 1, not ok, len(m) + 64)
+        if results is not None:
+            results[i:i+1] = b"\x01" if ok else b"\x00"
+        good += ok
+    return good
+
+def verify_many(sigs, keys, msgs, offsets, results):
+    """verify_many(signatures, verifying_keys, messages, offsets, results)
+
+    Check N signatures at once, as the extension's verify_many() does:
+    results[i] is set to 1 if signature i is good, 0 if not, and the
+    number of good signatures is returned."""
+    sigs, keys, msgs = _buffer(sigs), _buffer(keys), _buffer(msgs)
+    results = _writable(results)
+    n = _check_signatures(sigs, keys)
+    if len(results) < n:
+        raise ValueError("results buffer is too small")
+    return _verify_each(sigs, keys, msgs, _offsets(n, msgs, offsets),
+                        results)
+
+def _check_batch(sigs, keys, msgs, offsets, random, prepared):
+    n = _check_signatures(sigs, keys)
+    if len(_buffer(random)) != n * 32:
+        raise ValueError("need 32 random bytes per signature")
+    if prepared is not None and len(prepared) != n * PREPAREDKEYBYTES:
+        raise ValueError("need one 64-byte prepared key per signature")
+    return _offsets(n, msgs, offsets)
+
+def _prepared_key(prepared, i):
+    if prepared is None:
+        return None
+    return prepared[64*i:64*i+64]
+
+def verify_batch(sigs, keys, msgs, offsets, random, prepared=None):
+    """verify_batch(signatures, verifying_keys, messages, offsets, random,
+                 prepared=None)
+
+    Returns True if every signature is good, and False if not. The
+    signatures are checked one at a time, so 'random' is only checked for
+    its length."""
+    sigs, keys, msgs = _buffer(sigs), _buffer(keys), _buffer(msgs)
+    if prepared is not None:
+        prepared = _buffer(prepared)
+    offsets = _check_batch(sigs, keys, msgs, offsets, random, prepared)
+    n = len(offsets) - 1
+    start = _stats_start()
+    good = all(_verify_prepared(sigs[64*i:64*i+64],
+                                msgs[offsets[i]:offsets[i+1]],
+                                keys[32*i:32*i+32], _prepared_key(prepared, i))
+               for i in range(n))
+    _stats_record("verify_batch", start, n, not good,
+                  offsets[-1] - offsets[0] + 64 * n)
+    return good
+
+def verify_batch_items(sigs, keys, msgs, offsets, random, results,
+                       threshold, prepared=None):
+    """verify_batch_items(signatures, verifying_keys, messages, offsets,
+                       random, results, threshold, prepared=None)
+
+    Like verify_many(): results[i] is set to 1 if signature i is good, 0 if
+    not, and the number of good signatures is returned. 'random' and
+    'threshold' are only checked."""
+    sigs, keys, msgs = _buffer(sigs), _buffer(keys), _buffer(msgs)
+    if prepared is not None:
+        prepared = _buffer(prepared)
+    offsets = _check_batch(sigs, keys, msgs, offsets, random, prepared)
+    n = len(offsets) - 1
+    results = _writable(results)
+    if len(results) < n:
+        raise ValueError("results buffer is too small")
+    if threshold < 1:
+        raise ValueError("threshold must be at least 1")
+    start = _stats_start()
+    good = 0
+    for i in range(n):
+        ok = _verify_prepared(sigs[64*i:64*i+64],
+                              msgs[offsets[i]:offsets[i+1]],
+                              keys[32*i:32*i+32], _prepared_key(prepared, i))
+        results[i:i+1] = b"\x01" if ok else b"\x00"
+        good += ok
+    _stats_record("verify_batch", start, n, n - good,
+                  offsets[-1] - offsets[0] + 64 * n)
+    return good
+
+def sign_many(keys, msgs, offsets, sigs):
+    """sign_many(signing_keys, messages, offsets, signatures)
+
+    Sign N messages at once, writing the 64-byte signatures into the
+    writable 'signatures' buffer, as the extension's sign_many() does."""
+    keys, msgs = _buffer(keys), _buffer(msgs)
+    out = _writable(sigs)
+    if len(keys) % SECRETKEYBYTES:
+        raise ValueError("signing keys must be a multiple of 64 bytes long")
+    if len(out) < len(keys):
+        raise ValueError("signatures buffer is too small")
+    n = len(keys) // SECRETKEYBYTES
+    offsets = _offsets(n, msgs, offsets)
+    for i in range(n):
+        m = msgs[offsets[i]:offsets[i+1]]
+        start = _stats_start()
+        out[64*i:64*i+64] = _sign(m, keys[64*i:64*i+64])
+        _stats_record("sign", start, 1, 0, 2 * len(m) + 128)
+
+# --- multiscalar_mul(), Point and Scalar, as in the extension
+
+def multiscalar_mul(scalars, points, constant_time=False):
+    """multiscalar_mul(scalars, points, constant_time=False)
+
+    Return the 32-byte encoding of the sum of [k_i]P_i, for N 32-byte
+    little-endian scalars k_i (taken modulo the group order) and N 32-byte
+    encoded points P_i, each packed into one buffer. Raises ValueError if
+    a point does not decode. (Here every point is simply multiplied on its
+    own, and constant_time is ignored.)"""
+    scalars, points = _buffer(scalars), _buffer(points)
+    if len(scalars) % 32 or len(points) != len(scalars):
+        raise ValueError("need one 32-byte point per 32-byte scalar")
+    acc = IDENTITY
+    for i in range(0, len(points), 32):
+        p = _decompress(points[i:i+32])
+        if p is None:
+            raise ValueError("point %d is not on the curve" % (i // 32))
+        acc = _add(acc, _scalarmult(p, _int(scalars[i:i+32])))
+    return _encode(acc)
+
+class Point(object):
+    """Point(encoding)
+
+    A point on the curve, decoded from its 32-byte encoding (the format of
+    verifying keys and of the first half of signatures). Raises ValueError
+    if it is not on the curve. Points can be added, subtracted and negated,
+    and multiplied by a Scalar (p * s or s * p; see also mul_vartime()).
+    to_bytes() returns the encoding, computed once."""
+
+    __slots__ = ("_p", "_encoded")
+
+    def __init__(self, encoding):
+        encoding = _buffer(encoding)
+        if len(encoding) != 32:
+            raise TypeError("points are 32 byte strings")
+        p = _decompress(encoding)
+        if p is None:
+            raise ValueError("not a point on the curve")
+        self._p = p
+        # the argument is the cached encoding, if it is the canonical one
+        y = _int(encoding) & ((1 << 255) - 1)
+        sign = bytearray(encoding)[31] >> 7
+        if y < P and not (p[0] == 0 and sign):
+            self._encoded = encoding
+        else:
+            self._encoded = None
+
+    @classmethod
+    def _from(cls, p):
+        self = cls.__new__(cls)
+        self._p = p
+        self._encoded = None
+        return self
+
+    @classmethod
+    def base(cls):
+        """Return the base point B, whose multiples are the verifying
+        keys."""
+        return cls._from(BASE)
+
+    @classmethod
+    def identity(cls):
+        """Return the neutral element of the group."""
+        return cls._from(IDENTITY)
+
+    @classmethod
+    def mul_base(cls, scalar):
+        """Return [scalar]B, using the table of multiples of B."""
+        if not isinstance(scalar, Scalar):
+            raise TypeError("mul_base() takes a Scalar")
+        return cls._from(_scalarmult_base(scalar._s))
+
+    def mul_vartime(self, scalar):
+        """Return [scalar]self. (Every multiplication here takes time that
+        depends on the scalar.)"""
+        if not isinstance(scalar, Scalar):
+            raise TypeError("mul_vartime() takes a Scalar")
+        return Point._from(_scalarmult(self._p, scalar._s))
+
+    def to_bytes(self):
+        """Return the 32-byte encoding."""
+        if self._encoded is None:
+            self._encoded = _encode(self._p)
+        return self._encoded
+
+    def __add__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return Point._from(_add(self._p, other._p))
+
+    def __sub__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return Point._from(_add(self._p, _neg(other._p)))
+
+    def __neg__(self):
+        return Point._from(_neg(self._p))
+
+    def __mul__(self, scalar):
+        if not isinstance(scalar, Scalar):
+            return NotImplemented
+        return Point._from(_scalarmult(self._p, scalar._s))
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        X1, Y1, Z1, _ = self._p
+        X2, Y2, Z2, _ = other._p
+        return (X1 * Z2 - X2 * Z1) % P == 0 and (Y1 * Z2 - Y2 * Z1) % P == 0
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+    def __reduce__(self):
+        return (Point, (self.to_bytes(),))
+
+class Scalar(object):
+    """Scalar(data)
+
+    An integer modulo the group order L, from 32 little-endian bytes or
+    64 (e.g. a SHA-512 digest), reduced modulo L. Scalars can be added,
+    subtracted, negated and multiplied, and multiply Points. to_bytes()
+    returns the 32-byte encoding of the reduced value."""
+
+    __slots__ = ("_s",)
+
+    def __init__(self, data):
+        data = _buffer(data)
+        if len(data) not in (32, 64):
+            raise TypeError("scalars are made from 32 or 64 byte strings")
+        if len(data) == 64:
+            # _int() takes 32 bytes
+            self._s = (_int(data[:32]) + (_int(data[32:]) << 256)) % L
+        else:
+            self._s = _int(data) % L
+
+    @classmethod
+    def _from(cls, s):
+        self = cls.__new__(cls)
+        self._s = s % L
+        return self
+
+    def to_bytes(self):
+        """Return the 32-byte little-endian encoding."""
+        return _bytes(self._s)
+
+    def __add__(self, other):
+        if not isinstance(other, Scalar):
+            return NotImplemented
+        return Scalar._from(self._s + other._s)
+
+    def __sub__(self, other):
+        if not isinstance(other, Scalar):
+            return NotImplemented
+        return Scalar._from(self._s - other._s)
+
+    def __neg__(self):
+        return Scalar._from(-self._s)
+
+    def __mul__(self, other):
+        if isinstance(other, Scalar):
+            return Scalar._from(self._s * other._s)
+        if isinstance(other, Point):
+            return other * self
+        return NotImplemented
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if not isinstance(other, Scalar):
+            return NotImplemented
+        return self._s == other._s
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+    def __reduce__(self):
+        return (Scalar, (self.to_bytes(),))
+
+# the extension's types are ed25519.Point and ed25519.Scalar too
+Point.__module__ = Scalar.__module__ = "ed25519"
+
+# --- unpadded base16/32/64, as in the extension
+
+_ALPHABETS = {16: (4, b"0123456789abcdef"),
+              32: (5, b"abcdefghijklmnopqrstuvwxyz234567"),
+              64: (6, b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                      b"abcdefghijklmnopqrstuvwxyz0123456789+/"),
+              }
+_VALUES = {}
+
+def _codec(base):
+    try:
+        bits, alphabet = _ALPHABETS[base]
+    except KeyError:
+        raise ValueError("base must be 16, 32, or 64")
+    if base not in _VALUES:
+        values = dict((c, i) for i, c in enumerate(bytearray(alphabet)))
+        if base != 64:
+            # either case is accepted
+            values.update((c, i) for i, c in
+                          enumerate(bytearray(alphabet.upper())))
+        _VALUES[base] = values
+    return bits, alphabet, _VALUES[base]
+
+def _encode_data(codec, data):
+    bits, alphabet, _ = codec
+    mask = (1 << bits) - 1
+    out = bytearray()
+    acc = nbits = 0
+    for byte in bytearray(data):
+        acc = (acc << 8 | byte) & 0xffff
+        nbits += 8
+        while nbits >= bits:
+            nbits -= bits
+            out.append(alphabet[(acc >> nbits) & mask])
+    if nbits:
+        out.append(alphabet[(acc << (bits - nbits)) & mask])
+    return bytes(out)
+
+def _decode_data(codec, s):
+    bits, _, values = codec
+    s = s.rstrip(b"=")
+    out = bytearray()
+    acc = nbits = 0
+    for c in bytearray(s):
+        v = values.get(c)
+        if v is None:
+            raise ValueError("invalid character in input")
+        acc = (acc << bits | v) & 0xffff
+        nbits += bits
+        if nbits >= 8:
+            nbits -= 8
+            out.append((acc >> nbits) & 0xff)
+    # leftover bits are padding, so a whole leftover character means the
+    # input was truncated
+    if nbits >= bits:
+        raise ValueError("invalid length of encoded input")
+    return bytes(out)
+
+def _decode_one(codec, s, prefix):
+    if not s.startswith(prefix):
+        raise BadPrefixError("did not see expected prefix")
+    return _decode_data(codec, s[len(prefix):])
+
+def encode(data, prefix, base):
+    """encode(data, prefix, base)
+
+    Return prefix followed by 'data' in unpadded base16, base32 (both in
+    lowercase), or base64, for 'base' of 16, 32, or 64."""
+    codec = _codec(base)
+    return _buffer(prefix) + _encode_data(codec, _buffer(data))
+
+def decode(s, prefix, base):
+    """decode(s, prefix, base)
+
+    The opposite of encode(). Raises BadPrefixError if 's' does not start
+    with 'prefix', and ValueError if the rest is not valid."""
+    codec = _codec(base)
+    return _decode_one(codec, _buffer(s), _buffer(prefix))
+
+def encode_many(data, itemsize, prefix, base):
+    """encode_many(data, itemsize, prefix, base)
+
+    Split 'data' into pieces of 'itemsize' bytes and return a list with
+    the encode() of each one."""
+    codec = _codec(base)
+    data, prefix = _buffer(data), _buffer(prefix)
+    if itemsize <= 0 or len(data) % itemsize:
+        raise ValueError("data must be a whole number of items long")
+    return [prefix + _encode_data(codec, data[i:i+itemsize])
+            for i in range(0, len(data), itemsize)]
+
+def decode_many(strings, prefix, base, itemsize):
+    """decode_many(strings, prefix, base, itemsize)
+
+    decode() each of a sequence of strings, each of which must decode to
+    'itemsize' bytes, and return the results joined together."""
+    codec = _codec(base)
+    prefix = _buffer(prefix)
+    if itemsize <= 0:
+        raise ValueError("itemsize must be positive")
+    out = []
+    for i, s in enumerate(strings):
+        data = _decode_one(codec, _buffer(s), prefix)
+        if len(data) != itemsize:
+            raise ValueError("item %d does not decode to %d bytes"
+                             % (i, itemsize))
+        out.append(data)
+    return b"".join(out)
@@ -0,0 +1,78 @@
+"""Signature verification for asyncio applications.
+
+Verifier.verify() is a coroutine. Concurrent calls are gathered for a short
+window (or until 'max_batch' of them are waiting), and then checked
+together, off the event loop, with the batch verifier. If the batch fails,
+it is bisected to find the bad signatures, so each caller still gets its
+own answer.
+
+This needs python3.7 or later.
+"""
+
+import asyncio
+from .keys import BadSignatureError, VerifyingKey
+from .batch import GATHER_BATCH, verify_batch
+
+class Verifier(object):
+    """Gather concurrent verifications into batches.
+
+    'window' is how long (in seconds: the default is 500 microseconds) the
+    first request of a batch may wait for others to join it. A batch is
+    dispatched early once 'max_batch' requests are waiting: the default,
+    batch.GATHER_BATCH, is more than the extension checks one signature at
+    a time, so a full batch uses the batch equation. Batches run on
+    'executor' (by default, the event loop's default executor). If 'cache'
+    is a VerificationCache, it is used as by verify_batch().
+    """
+
+    def __init__(self, max_batch=GATHER_BATCH, window=500e-6, executor=None,
+                 cache=None):
+        self.max_batch = max_batch
+        self.window = window
+        self.executor = executor
+        self.cache = cache
+        self._pending = []
+        self._timer = None
+
+    async def verify(self, vk, sig, msg):
+        """Return None if 'sig' is a good signature of 'msg' by 'vk' (a
+        VerifyingKey or 32-byte string), else raise BadSignatureError."""
+        if not isinstance(vk, VerifyingKey):
+            vk = VerifyingKey(vk)
+        if len(sig) != 64:
+            # rather than spoiling the whole batch later
+            raise ValueError("signatures are 64 bytes long")
+        loop = asyncio.get_running_loop()
+        f = loop.create_future()
+        self._pending.append((f, (vk, sig, msg)))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        if not await f:
+            raise BadSignatureError("Bad Signature")
+
+    def flush(self):
+        """Dispatch the waiting requests now, without waiting for the rest
+        of the window. Call it from the running event loop."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(self.executor, verify_batch,
+                                   [item for (f, item) in batch], self.cache)
+        def _resolve(job):
+            try:
+                results = job.result()
+            except BaseException as e:
+                for f, item in batch:
+                    if not f.done():
+                        f.set_exception(e)
+                return
+            for (f, item), good in zip(batch, results):
+                if not f.done(): # it may have been cancelled
+                    f.set_result(good)
+        job.add_done_callback(_resolve)
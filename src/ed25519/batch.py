@@ -0,0 +1,407 @@
+import os
+import array
+from . import _ed25519
+from .keys import SigningKey, VerifyingKey, _powerup
+from .cache import _timer
+
+# When bisecting a failed batch, pieces of this many signatures or fewer are
+# checked one at a time. (Measured with "setup.py speed": with one bad
+# signature in 64, anything from 1 to 8 does about as well.)
+SINGLE_THRESHOLD = 4
+# The batch check needs about 2kB of scratch space per signature (and 4MB
+# more), so long lists are checked in slices of this size. Its fixed cost
+# (the small-order check) is worth paying only for a few hundred
+# signatures at once.
+MAX_BATCH = 4096
+# The extension checks batches of 160 signatures or fewer one at a time
+# (BATCH_SINGLE_MAX in ed25519.c), so the Verifier and Executor gather up
+# to this many by default, for their batches to use the batch equation
+GATHER_BATCH = 256
+# decompress_many() and validate_keys() split inputs of more than this many
+# keys among threads
+THREAD_KEYS = 4096
+# validate_keys() hands the extension at most this many keys at a time (it
+# needs about 520 bytes of scratch space per key)
+VALIDATE_KEYS = 16384
+
+# the bits validate_keys() sets for each problem with a key
+KEY_NOT_ON_CURVE = _ed25519.KEY_NOT_ON_CURVE
+KEY_NONCANONICAL = _ed25519.KEY_NONCANONICAL
+KEY_SMALL_ORDER = _ed25519.KEY_SMALL_ORDER
+KEY_MIXED_ORDER = _ed25519.KEY_MIXED_ORDER
+
+def pack_messages(msgs):
+    """Concatenate 'msgs', returning the joined string and an array of the
+    N+1 offsets expected by the _ed25519 batch functions."""
+    offsets = array.array("q", [0])
+    for msg in msgs:
+        offsets.append(offsets[-1] + len(msg))
+    return b"".join(msgs), offsets
+
+def pack(items):
+    """Pack (verifying_key, signature, message) triples into the buffers
+    used by the _ed25519 batch functions: (signatures, keys, messages,
+    offsets). verifying_key may be a VerifyingKey or its 32-byte string."""
+    keys, sigs, msgs = [], [], []
+    for vk, sig, msg in items:
+        if isinstance(vk, VerifyingKey):
+            vk = vk.to_bytes()
+        if len(vk) != 32 or len(sig) != 64:
+            raise ValueError("need 32-byte verifying keys and "
+                             "64-byte signatures")
+        keys.append(vk)
+        sigs.append(sig)
+        msgs.append(msg)
+    msgs, offsets = pack_messages(msgs)
+    return b"".join(sigs), b"".join(keys), msgs, offsets
+
+class PackedBatch(object):
+    """A batch of signatures to check, packed into the four buffers taken
+    by verify_arrays(): sigs, keys, msgs and offsets (all N+1 boundaries).
+
+    Pickling one with protocol 5 (Python 3.8 and later) passes the buffers
+    as pickle.PickleBuffer objects, so with a buffer_callback (e.g. a
+    multiprocessing.shared_memory copy, or a transport that sends them
+    separately) they are never copied into the pickle stream. Older
+    protocols copy them in as bytes.
+    """
+
+    def __init__(self, sigs, keys, msgs, offsets):
+        self.sigs = sigs
+        self.keys = keys
+        self.msgs = msgs
+        self.offsets = offsets
+
+    @classmethod
+    def from_items(cls, items):
+        """Pack (verifying_key, signature, message) triples, as for
+        verify_batch()."""
+        return cls(*pack(items))
+
+    def __len__(self):
+        return memoryview(self.sigs).nbytes // 64
+
+    def verify(self, bitmap=False):
+        """Check the batch: see verify_arrays()."""
+        return verify_arrays(self.sigs, self.keys, self.msgs, self.offsets,
+                             bitmap)
+
+    def __reduce_ex__(self, protocol):
+        buffers = (self.sigs, self.keys, self.msgs, self.offsets)
+        if protocol >= 5:
+            from pickle import PickleBuffer
+            wrap = PickleBuffer
+        else:
+            wrap = lambda b: memoryview(b).tobytes()
+        # the offsets go as raw bytes too, and are cast back as needed
+        return (self.__class__, tuple(wrap(b) for b in buffers))
+
+def key_order(keys):
+    """Given the 32-byte keys of a batch, return the order to check it in
+    so that signatures by the same key are next to each other (which the
+    batch verifier makes cheaper: see verify_batch()), or None if that
+    would not merge any more of them than the current order."""
+    breaks = sum(1 for i in range(1, len(keys)) if keys[i] != keys[i-1])
+    if not keys or breaks < len(set(keys)):
+        # each key is already in a single run
+        return None
+    return sorted(range(len(keys)), key=keys.__getitem__)
+
+def _pack_keys(keys):
+    # a flat view of N*32 bytes of keys, from a buffer or a list of 32-byte
+    # strings or VerifyingKeys
+    if isinstance(keys, (list, tuple)):
+        keys = b"".join(vk.to_bytes() if isinstance(vk, VerifyingKey) else vk
+                        for vk in keys)
+    view = memoryview(keys).cast("B")
+    if view.nbytes % 32:
+        view.release()
+        raise ValueError("verifying keys must be a multiple of 32 bytes long")
+    return view
+
+def _run_slices(n, step, threads, run):
+    # call run(lo, hi) for each slice of up to 'step' of range(n), on up to
+    # 'threads' threads
+    starts = range(0, n, step)
+    if threads > 1 and len(starts) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(min(threads, len(starts))) as pool:
+            list(pool.map(lambda lo: run(lo, min(lo+step, n)), starts))
+    else:
+        for lo in starts:
+            run(lo, min(lo+step, n))
+
+def _threads(threads):
+    return threads or getattr(os, "cpu_count", lambda: None)() or 1
+
+def decompress_many(keys, threads=None):
+    """Decompress and validate N verifying keys at once. 'keys' is a buffer
+    of N*32 bytes, or a list of 32-byte strings or VerifyingKeys.
+
+    Returns (prepared, invalid): a bytearray of N*64 bytes holding the
+    prepared point of each key (as from _ed25519.prepare()), and the list
+    of the indices of the keys that are not points on the curve. The
+    prepared points can be passed on to verify_arrays(), or one at a time
+    to VerifyingKey(..., prepared=), which check each one against its key;
+    the entries for invalid keys are zeroed, which never passes.
+
+    The extension releases the GIL while it works, and inputs of more than
+    THREAD_KEYS keys are split among 'threads' threads (default: one per
+    CPU).
+    """
+    view = _pack_keys(keys)
+    n = view.nbytes // 32
+    prepared, valid = bytearray(64 * n), bytearray(n)
+    out, ok = memoryview(prepared), memoryview(valid)
+    def run(lo, hi):
+        _ed25519.prepare_many(view[32*lo:32*hi], out[64*lo:64*hi], ok[lo:hi])
+    try:
+        threads = _threads(threads)
+        _run_slices(n, max(THREAD_KEYS, -(-n // threads)), threads, run)
+    finally:
+        for v in (view, out, ok):
+            v.release()
+    return prepared, [i for i, good in enumerate(valid) if not good]
+
+def validate_keys(keys, check_subgroup=True, threads=None):
+    """Check N verifying keys (a buffer of N*32 bytes, or a list of 32-byte
+    strings or VerifyingKeys) for a key registry, which should refuse the
+    keys that verify() would accept but that let their owner make
+    signatures that not every implementation agrees on. Returns a
+    bytearray with one byte per key: 0 for a good key, or else the sum of
+    the bits for each problem found:
+
+     * KEY_NOT_ON_CURVE: not the encoding of a point (nothing else is
+       checked)
+     * KEY_NONCANONICAL: an encoding other than the one to_bytes() of the
+       point would give
+     * KEY_SMALL_ORDER: one of the eight points of order 1, 2, 4 or 8,
+       for which signatures can be made without a secret key
+     * KEY_MIXED_ORDER: outside the subgroup of prime order that real
+       keys are in (a real key plus a small-order point)
+
+    The last is only checked if 'check_subgroup' is true. It is batched: a
+    random linear combination of the keys is tested for each of 128
+    rounds, which costs about 30 point additions per key, rather than a
+    full scalar multiplication each, and misses a bad key with probability
+    at most 2^-128. Keys are handed to the extension VALIDATE_KEYS at a
+    time, on up to 'threads' threads (default: one per CPU) once there are
+    more than THREAD_KEYS of them.
+    """
+    view = _pack_keys(keys)
+    n = view.nbytes // 32
+    flags = bytearray(n)
+    out = memoryview(flags)
+    def run(lo, hi):
+        random = os.urandom(32 * (hi-lo)) if check_subgroup else None
+        _ed25519.validate_keys(view[32*lo:32*hi], out[lo:hi], random)
+    try:
+        threads = _threads(threads)
+        step = min(VALIDATE_KEYS, max(THREAD_KEYS, -(-n // threads)))
+        _run_slices(n, step, threads, run)
+    finally:
+        view.release()
+        out.release()
+    return flags
+
+def _prepared_keys(items):
+    # the keys' prepared points, if every key is a VerifyingKey that
+    # already has one (which saves the batch verifier decompressing them)
+    prepared = []
+    for vk, sig, msg in items:
+        if not (isinstance(vk, VerifyingKey) and vk._prepared):
+            return None
+        prepared.append(vk._prepared)
+    return b"".join(prepared)
+
+def verify_items(items):
+    """Check (verifying_key, signature, message) triples with
+    verify_packed(), grouped by key if key_order() says so. Returns a
+    bytearray of results, in the order of 'items'."""
+    keys = [vk.to_bytes() if isinstance(vk, VerifyingKey) else vk
+            for vk, sig, msg in items]
+    order = key_order(keys)
+    if order is None:
+        return verify_packed(*pack(items), prepared=_prepared_keys(items))
+    items = [items[i] for i in order]
+    checked = verify_packed(*pack(items), prepared=_prepared_keys(items))
+    results = bytearray(len(checked))
+    for i, good in zip(order, checked):
+        results[i] = good
+    return results
+
+def verify_packed(sigs, keys, msgs, offsets, results=None, prepared=None):
+    """Check a packed batch (see pack()), returning a bytearray with a 1
+    for each good signature and a 0 for each bad one. If 'results' is
+    given, it must be a writable buffer of (at least) N bytes, which is
+    filled in and returned instead. 'prepared' may hold the N*64 bytes of
+    prepared keys (see decompress_many()), which are then not decompressed
+    again."""
+    _powerup()
+    buffers = [sigs, keys, msgs, offsets]
+    if prepared is not None:
+        buffers.append(prepared)
+    views = [memoryview(b) for b in buffers]
+    try:
+        n = views[0].nbytes // 64
+        # the extension checks each slice, but not that the slices add up
+        if views[0].nbytes % 64:
+            raise ValueError("signatures must be a multiple of 64 bytes long")
+        if views[1].nbytes != 32 * n:
+            raise ValueError("need one 32-byte verifying key per signature")
+        if views[3].nbytes != 8 * (n+1):
+            raise ValueError("need N+1 64-bit message offsets")
+        if prepared is not None and views[4].nbytes != 64 * n:
+            raise ValueError("need one 64-byte prepared key per signature")
+        if results is None:
+            results = bytearray(n)
+        views.append(memoryview(results))
+        if views[-1].nbytes < n:
+            raise ValueError("results buffer is too small")
+        # slice everything as flat bytes, except for the offsets, which are
+        # sliced by item, whatever shape they came in
+        flat = [v.cast("B") for v in views]
+        views.extend(flat)
+        sigs, keys, msgs, offsets = flat[:4]
+        out = flat[-1]
+        if prepared is not None:
+            prepared = flat[4]
+        offsets = offsets.cast("q")
+        views.append(offsets)
+        for lo in range(0, n, MAX_BATCH):
+            hi = min(lo+MAX_BATCH, n)
+            # offsets holds absolute positions within msgs, so none of
+            # these slices copy anything
+            _ed25519.verify_batch_items(sigs[64*lo:64*hi], keys[32*lo:32*hi],
+                                        msgs, offsets[lo:hi+1],
+                                        os.urandom(32*(hi-lo)), out[lo:hi],
+                                        SINGLE_THRESHOLD,
+                                        None if prepared is None
+                                        else prepared[64*lo:64*hi])
+    finally:
+        # let callers close (or resize) the underlying buffers
+        for view in views:
+            view.release()
+    return results
+
+def _item_offsets(count, msgs, offsets):
+    # accept N offsets (the start of each message) as well as N+1
+    offsets = memoryview(offsets).cast("B").cast("q")
+    if len(offsets) == count:
+        end = memoryview(msgs).nbytes
+        offsets = array.array("q", offsets.tolist() + [end])
+    return offsets
+
+def _bitmap(results):
+    bitmap = bytearray((len(results) + 7) // 8)
+    for i, good in enumerate(results):
+        if good:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return bitmap
+
+def verify_arrays(sigs, keys, msgs, offsets, bitmap=False, prepared=None):
+    """Check N signatures that are already packed into arrays.
+
+    'sigs' holds N*64 bytes of signatures, 'keys' N*32 bytes of verifying
+    keys (or a single VerifyingKey that made all of them), and 'msgs' the
+    concatenated messages. 'offsets' holds signed
+    64-bit integers: either the N+1 boundaries (message i is
+    msgs[offsets[i]:offsets[i+1]]), or just the N starting positions. Any
+    object supporting the buffer protocol can be used (e.g. bytes,
+    bytearray, mmap, or NumPy arrays of shape (N,64), (N,32) and (N+1,)),
+    and none of them are copied.
+
+    Returns a bytearray with one byte per signature: 1 if good, 0 if not
+    (numpy.frombuffer(result, dtype=bool) views it as a bool array). With
+    bitmap=True, returns a bytearray of (N+7)//8 bytes instead, with the
+    result for signature i in bit (i % 8) of byte (i // 8), as produced by
+    numpy.packbits(..., bitorder="little"). Each result is the one
+    VerifyingKey.verify() gives, except with probability around 2^-128
+    (see verify_batch()).
+
+    'prepared' may be the N*64 bytes of prepared keys from
+    decompress_many(), which saves decompressing the keys again. Each is
+    checked against its key (far more cheaply), and a signature whose
+    prepared point does not match is reported bad.
+    """
+    count = memoryview(sigs).nbytes // 64
+    if isinstance(keys, VerifyingKey):
+        keys = keys.to_bytes() * count
+    results = verify_packed(sigs, keys, msgs,
+                            _item_offsets(count, msgs, offsets),
+                            prepared=prepared)
+    if bitmap:
+        return _bitmap(results)
+    return results
+
+def sign_arrays(keys, msgs, offsets, out=None):
+    """Sign N messages that are already packed into arrays.
+
+    'keys' is either N*64 bytes of signing keys (as from
+    SigningKey.to_bytes()), or a single SigningKey to sign every message
+    with, in which case 'offsets' must hold all N+1 boundaries. 'msgs' and
+    'offsets' are otherwise as for verify_arrays(). The N*64 bytes of signatures are written
+    into 'out', a writable buffer (e.g. a NumPy array of shape (N,64)), or
+    into a new bytearray. Returns the buffer.
+    """
+    _powerup()
+    if isinstance(keys, SigningKey):
+        # then only the offsets say how many messages there are, so they
+        # must include the final boundary
+        keys = keys.to_bytes() * (memoryview(offsets).nbytes // 8 - 1)
+    offsets = _item_offsets(memoryview(keys).nbytes // 64, msgs, offsets)
+    if out is None:
+        out = bytearray(64 * (len(offsets) - 1))
+    _ed25519.sign_many(keys, msgs, offsets, out)
+    return out
+
+def verify_batch(items, cache=None):
+    """Check a list of (verifying_key, signature, message) triples, where
+    verifying_key is a VerifyingKey or its 32-byte string. Returns a list
+    of booleans, True for each good signature.
+
+    The signatures are checked together, with multi-scalar
+    multiplications over slices of up to MAX_BATCH of them, which for a
+    long list is about twice as fast as checking them one at a time (a few
+    hundred or fewer are checked one at a time anyway). If a slice fails,
+    it is bisected to find the bad signatures, which still leaves a slice
+    with a single bad signature cheaper than checking them one at a time,
+    although one with many bad signatures can cost twice as much.
+
+    Each result is the one VerifyingKey.verify() gives, except with
+    probability around 2^-128. A random combination of verification
+    equations cannot see a small-order component in one of them (it would
+    pass a signature crafted that way half the time, which verify() never
+    does), so those are ruled out first, with a separate check.
+
+    Signatures by the same key share one term of that multiplication, which
+    makes a slice from a single signer about twice as fast again, so when
+    keys repeat, the items are grouped by key before checking.
+
+    If 'cache' is a VerificationCache, signatures it remembers are not
+    checked again, and good ones are added to it (so it only ever holds
+    signatures that verify() accepts).
+    """
+    items = list(items)
+    if cache is None:
+        return [bool(r) for r in verify_items(items)]
+    results = [False] * len(items)
+    keys, todo = [], []
+    for i, (vk, sig, msg) in enumerate(items):
+        if isinstance(vk, VerifyingKey):
+            vk = vk.to_bytes()
+        key = cache.key(vk, sig, msg)
+        if cache.check(key):
+            results[i] = True
+        else:
+            keys.append(key)
+            todo.append(i)
+    if todo:
+        start = _timer()
+        checked = verify_items([items[i] for i in todo])
+        elapsed = (_timer() - start) / len(todo)
+        for i, key, good in zip(todo, keys, checked):
+            if good:
+                cache.add(key, elapsed)
+                results[i] = True
+    return results
@@ -0,0 +1,291 @@
+"""Benchmarks: python -m ed25519.bench [options]
+
+Measures key generation, signing and verification over a range of message
+sizes, signing records that share a header (with and without a
+PrefixSigner), the batch verifier over a range of batch sizes (with one
+signer, and with a different signer for each signature), the Executor
+over a range of thread counts, the process-pool verifier over a range of
+process counts, and signing and verifying the known-answer-test corpus
+(kat-ed25519.txt, from a source tree, or named with --kat).
+
+Each benchmark reports the mean and the 50th/90th/99th percentile latency
+of one call, and the throughput in items (keys, signatures) per second.
+--json writes the results to a file, and --compare checks them against an
+earlier one, exiting with status 1 if any median latency got worse by more
+than --threshold (a fraction: the default 0.1 is 10%).
+
+Run with --quick for a fast smoke test with smaller workloads.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import json
+import platform
+from binascii import unhexlify
+from .cache import _timer
+
+MESSAGE_SIZES = (0, 64, 1024, 64*1024, 1024*1024, 16*1024*1024)
+BATCH_SIZES = (1, 64, 256, 1024)
+THREAD_COUNTS = (1, 2, 4)
+PROCESS_COUNTS = (1, 2, 4)
+HEADER_SIZE = 200 # for the prefix-signing benchmarks, with 64-byte tails
+QUICK = {"message_sizes": (0, 1024, 64*1024),
+         "batch_sizes": (1, 64),
+         "thread_counts": (1, 2),
+         "process_counts": (),
+         "min_time": 0.05,
+         "kat_lines": 64,
+         }
+
+def measure(fn, min_time=0.5, min_samples=5, max_samples=10000):
+    """Call fn() repeatedly, until 'min_time' seconds and at least
+    'min_samples' calls have passed, returning the duration of each."""
+    samples = []
+    total = 0.0
+    while len(samples) < max_samples:
+        start = _timer()
+        fn()
+        elapsed = _timer() - start
+        samples.append(elapsed)
+        total += elapsed
+        if total >= min_time and len(samples) >= min_samples:
+            break
+    return samples
+
+def percentile(ordered, p):
+    # nearest-rank percentile of a sorted list
+    rank = max(0, min(len(ordered)-1, int(-(-p * len(ordered) // 100)) - 1))
+    return ordered[rank]
+
+def summarize(samples, items=1):
+    """Summarize the latencies of calls that each handled 'items' things."""
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered)
+    return {"samples": len(ordered),
+            "items": items,
+            "mean": mean,
+            "p50": percentile(ordered, 50),
+            "p90": percentile(ordered, 90),
+            "p99": percentile(ordered, 99),
+            "items_per_sec": items / mean if mean else 0.0,
+            }
+
+def find_kat():
+    """Return the path of kat-ed25519.txt, or None. It is not installed
+    with the package, but is at the top of a source tree."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for d in (here, os.path.dirname(os.path.dirname(here)), os.getcwd()):
+        path = os.path.join(d, "kat-ed25519.txt")
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_kat(path, limit=None):
+    """Return a list of (seed, verifying key, message, signature) tuples."""
+    vectors = []
+    with open(path) as f:
+        for line in f:
+            if limit is not None and len(vectors) >= limit:
+                break
+            x = [unhexlify(v.encode("ascii")) for v in line.split(":")[:4]]
+            vectors.append((x[0][:32], x[1], x[2], x[3][:64]))
+    return vectors
+
+def _size_name(size):
+    for unit, scale in (("M", 1024*1024), ("K", 1024)):
+        if size >= scale and size % scale == 0:
+            return "%d%s" % (size // scale, unit)
+    return "%d" % size
+
+def run(message_sizes=MESSAGE_SIZES, batch_sizes=BATCH_SIZES,
+        thread_counts=THREAD_COUNTS, process_counts=PROCESS_COUNTS,
+        min_time=0.5, kat=None, kat_lines=None, log=None):
+    """Run the benchmarks, returning a dict of name -> summary. If 'log' is
+    given, it is called with each (name, summary) as they finish."""
+    import ed25519
+    from ed25519.batch import verify_batch
+    results = {}
+    def record(name, samples, items=1):
+        results[name] = summarize(samples, items)
+        if log:
+            log(name, results[name])
+
+    sk, vk = ed25519.create_keypair()
+    record("keygen", measure(ed25519.create_keypair, min_time))
+    for size in message_sizes:
+        msg = os.urandom(size)
+        sig = sk.sign(msg)
+        # a few samples are plenty for the slow, large messages
+        record("sign/%s" % _size_name(size),
+               measure(lambda: sk.sign(msg), min_time, min_samples=3))
+        record("verify/%s" % _size_name(size),
+               measure(lambda: vk.verify(sig, msg), min_time, min_samples=3))
+
+    # records that share a header: SigningKey.sign() against a PrefixSigner
+    header, tail = os.urandom(HEADER_SIZE), os.urandom(64)
+    record("sign/header", measure(lambda: sk.sign(header + tail), min_time))
+    signer = sk.bind_prefix(header)
+    record("prefix_sign/header", measure(lambda: signer.sign(tail), min_time))
+
+    # 64 distinct signatures, repeated to make up larger workloads
+    msgs = [os.urandom(64) for i in range(64)]
+    pool = [(vk, sk.sign(msg), msg) for msg in msgs]
+    def workload(n):
+        return (pool * (n // len(pool) + 1))[:n]
+    # and enough signatures by distinct keys for the largest batch
+    multikey_pool = []
+    for i in range(max(batch_sizes or [0])):
+        sk2, vk2 = ed25519.create_keypair()
+        msg = msgs[i % len(msgs)]
+        multikey_pool.append((vk2, sk2.sign(msg), msg))
+
+    for n in batch_sizes:
+        items = workload(n)
+        record("batch/%d" % n, measure(lambda: verify_batch(items), min_time),
+               n)
+        multikey_items = multikey_pool[:n]
+        record("batch_multikey/%d" % n,
+               measure(lambda: verify_batch(multikey_items), min_time), n)
+
+    if thread_counts:
+        from ed25519.executor import Executor
+        items = workload(256)
+        for threads in thread_counts:
+            with Executor(threads) as executor:
+                def verify_all():
+                    futures = [executor.submit_verify(*item)
+                               for item in items]
+                    for f in futures:
+                        f.result()
+                record("threads/%d" % threads, measure(verify_all, min_time),
+                       len(items))
+
+    if process_counts:
+        from ed25519.parallel import ProcessVerifier
+        items = workload(1024)
+        for workers in process_counts:
+            with ProcessVerifier(workers) as verifier:
+                record("processes/%d" % workers,
+                       measure(lambda: verifier.verify_many(items), min_time),
+                       len(items))
+
+    if kat:
+        vectors = load_kat(kat, kat_lines)
+        keys = [(ed25519.SigningKey(seed), ed25519.VerifyingKey(vk_s))
+                for seed, vk_s, msg, sig in vectors]
+        def sign_kat():
+            for (sk, vk), (seed, vk_s, msg, sig) in zip(keys, vectors):
+                sk.sign(msg)
+        def verify_kat():
+            for (sk, vk), (seed, vk_s, msg, sig) in zip(keys, vectors):
+                vk.verify(sig, msg)
+        record("kat/sign", measure(sign_kat, min_time, min_samples=1),
+               len(vectors))
+        record("kat/verify", measure(verify_kat, min_time, min_samples=1),
+               len(vectors))
+    return results
+
+def compare(old, new, threshold=0.1, key="p50"):
+    """Compare two sets of results (as from run(), or the "results" of a
+    JSON report). Returns a list of (name, old, new) for each benchmark in
+    both whose 'key' latency grew by more than 'threshold'."""
+    regressions = []
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name][key], new[name][key]
+        if after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+def _abbrev(t):
+    if t > 1.0:
+        return "%.3fs" % t
+    if t > 1e-3:
+        return "%.2fms" % (t*1e3)
+    return "%.2fus" % (t*1e6)
+
+def _print_result(name, r):
+    print("%-16s mean %9s  p50 %9s  p90 %9s  p99 %9s  %10.1f/s"
+          % (name, _abbrev(r["mean"]), _abbrev(r["p50"]), _abbrev(r["p90"]),
+             _abbrev(r["p99"]), r["items_per_sec"]))
+    sys.stdout.flush()
+
+def _int_list(s):
+    return tuple(int(v) for v in s.split(",") if v)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m ed25519.bench",
+                                     description="Ed25519 benchmarks")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller workloads, for a fast smoke test")
+    parser.add_argument("--sizes", type=_int_list,
+                        help="comma-separated message sizes, in bytes")
+    parser.add_argument("--batch-sizes", type=_int_list)
+    parser.add_argument("--threads", type=_int_list,
+                        help="comma-separated Executor thread counts")
+    parser.add_argument("--processes", type=_int_list,
+                        help="comma-separated worker process counts")
+    parser.add_argument("--min-time", type=float,
+                        help="seconds to spend on each benchmark")
+    parser.add_argument("--kat", help="path of kat-ed25519.txt")
+    parser.add_argument("--no-kat", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="a --json file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    config = {"message_sizes": MESSAGE_SIZES,
+              "batch_sizes": BATCH_SIZES,
+              "thread_counts": THREAD_COUNTS,
+              "process_counts": PROCESS_COUNTS,
+              "min_time": 0.5,
+              "kat_lines": None,
+              }
+    if args.quick:
+        config.update(QUICK)
+    for name, value in (("message_sizes", args.sizes),
+                        ("batch_sizes", args.batch_sizes),
+                        ("thread_counts", args.threads),
+                        ("process_counts", args.processes),
+                        ("min_time", args.min_time)):
+        if value is not None:
+            config[name] = value
+    if config["process_counts"] and sys.version_info < (3, 8):
+        config["process_counts"] = () # needs multiprocessing.shared_memory
+    kat = None
+    if not args.no_kat:
+        kat = args.kat or find_kat()
+        if kat is None:
+            print("kat-ed25519.txt not found: use --kat to name it")
+
+    import ed25519
+    results = run(kat=kat, log=_print_result, **config)
+    report = {"version": ed25519.__version__,
+              "backend": ed25519.backend,
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "machine": platform.machine(),
+              "config": dict((k, list(v) if isinstance(v, tuple) else v)
+                             for k, v in config.items()),
+              "results": results,
+              }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        for name, before, after in regressions:
+            print("REGRESSION %s: p50 %s -> %s (+%.0f%%)"
+                  % (name, _abbrev(before), _abbrev(after),
+                     100 * (after / before - 1)))
+        if regressions:
+            return 1
+        print("no regressions over %.0f%%" % (100 * args.threshold))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import time
+import threading
+from collections import OrderedDict
+from . import _ed25519
+
+try:
+    _clock = time.monotonic
+    _timer = time.perf_counter
+except AttributeError: # py2
+    _clock = _timer = time.time
+
+class PointCache(object):
+    """A bounded, thread-safe LRU cache of decompressed verifying keys.
+
+    Verifying a signature starts by decompressing the 32-byte public key
+    into a curve point, which costs about as much as a field inversion.
+    Applications that build a fresh VerifyingKey for every request (e.g.
+    from bytes pulled out of a network message) would redo that work each
+    time, so VerifyingKey consults this cache (keyed by the 32-byte key
+    string) before decompressing. Entries hold the 64-byte prepared form
+    returned by _ed25519.prepare(), or None for strings that do not encode
+    a point at all.
+
+    A capacity of 0 disables caching.
+
+    If 'keyring' (an ed25519.keyring.Keyring) is set, keys found in it are
+    taken from there, counting as hits, and only other keys use the LRU.
+    """
+
+    def __init__(self, capacity=1024, keyring=None):
+        if capacity < 0:
+            raise ValueError("capacity must be non-negative")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._capacity = capacity
+        self.keyring = keyring
+        self.clear()
+
+    def lookup(self, vk_s):
+        """Return the prepared form of vk_s, decompressing it on a miss.
+        Returns None if vk_s is not a valid point."""
+        keyring = self.keyring
+        if keyring is not None:
+            prepared = keyring.lookup(vk_s)
+            if prepared is not None:
+                with self._lock:
+                    self._hits += 1
+                return prepared
+        with self._lock:
+            try:
+                prepared = self._entries.pop(vk_s)
+            except KeyError:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries[vk_s] = prepared # move to the MRU end
+                return prepared
+        # decompress outside the lock, so other threads can still get hits
+        try:
+            prepared = _ed25519.prepare(vk_s)
+        except ValueError:
+            prepared = None
+        with self._lock:
+            if self._capacity > 0:
+                self._entries.pop(vk_s, None)
+                self._entries[vk_s] = prepared
+                self._evict()
+        return prepared
+
+    def _evict(self):
+        # called with the lock held
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def resize(self, capacity):
+        """Change the maximum number of entries, evicting the least recently
+        used ones if necessary."""
+        if capacity < 0:
+            raise ValueError("capacity must be non-negative")
+        with self._lock:
+            self._capacity = capacity
+            self._evict()
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self):
+        """Return a dict of hits, misses, evictions, size, and capacity."""
+        with self._lock:
+            return {"hits": self._hits,
+                    "misses": self._misses,
+                    "evictions": self._evictions,
+                    "size": len(self._entries),
+                    "capacity": self._capacity,
+                    }
+
+# the process-wide cache used by VerifyingKey
+point_cache = PointCache()
+
+class VerificationCache(object):
+    """A bounded, thread-safe memo of signatures that verified correctly.
+
+    Gossip-style protocols deliver the same signed message from many peers.
+    Passing one of these as the cache= argument of VerifyingKey.verify()
+    lets repeats of an already-verified (key, signature, message) triple
+    return immediately, without any curve arithmetic. Entries are keyed by
+    SHA-256(key || signature || SHA-512(message)), so the cache does not
+    retain messages. Only successful verifications are remembered: a bad
+    signature is re-checked (and rejected) every time.
+
+    Entries are evicted least-recently-used once there are more than
+    'maxsize' of them, and (if 'ttl' is given) expire 'ttl' seconds after
+    they were added.
+    """
+
+    def __init__(self, maxsize=65536, ttl=None):
+        if maxsize < 0:
+            raise ValueError("maxsize must be non-negative")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> time added
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clear()
+
+    def key(self, vk_s, sig, msg):
+        from hashlib import sha256, sha512
+        return sha256(vk_s + sig + sha512(msg).digest()).digest()
+
+    def check(self, key):
+        """Return True if 'key' is a remembered good signature."""
+        with self._lock:
+            added = self._entries.get(key)
+            if added is not None and self.ttl is not None:
+                if _clock() - added > self.ttl:
+                    del self._entries[key]
+                    self._expirations += 1
+                    added = None
+            if added is None:
+                self._misses += 1
+                return False
+            self._hits += 1
+            self._saved += self._cost
+            self._entries[key] = self._entries.pop(key) # move to MRU end
+            return True
+
+    def add(self, key, elapsed):
+        """Remember a good signature, which took 'elapsed' seconds to
+        verify. The running average of these is used to estimate how much
+        time the cache has saved."""
+        with self._lock:
+            self._verified += 1
+            self._cost += (elapsed - self._cost) / self._verified
+            if self.maxsize == 0:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = _clock()
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Forget all signatures and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = 0
+            self._evictions = self._expirations = 0
+            self._verified = 0
+            self._cost = self._saved = 0.0
+
+    def stats(self):
+        """Return a dict of counters. 'hit_rate' is hits/(hits+misses), and
+        'saved_seconds' estimates the CPU time avoided by those hits."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {"hits": self._hits,
+                    "misses": self._misses,
+                    "hit_rate": (float(self._hits) / lookups
+                                 if lookups else 0.0),
+                    "saved_seconds": self._saved,
+                    "evictions": self._evictions,
+                    "expirations": self._expirations,
+                    "size": len(self._entries),
+                    "maxsize": self.maxsize,
+                    }
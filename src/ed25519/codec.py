@@ -0,0 +1,65 @@
+from . import _ed25519
+from .keys import (BadSignatureError, SigningKey, VerifyingKey, _base,
+                   _powerup)
+
+class Codec(object):
+    """A text format for keys and signatures: a fixed prefix (e.g. "sig0-")
+    followed by the bytes in one of the to_ascii() encodings. The prefix
+    and alphabet are bound once, and all the work is done in C, so this is
+    the fast way to produce or consume large numbers of textual signatures.
+
+    Strings may be given as bytes or as (ASCII) text; results are bytes.
+    """
+
+    def __init__(self, prefix="", encoding="base64"):
+        if not isinstance(prefix, bytes):
+            prefix = prefix.encode('ascii')
+        self.prefix = prefix
+        self.encoding = encoding
+        self._base = _base(encoding)
+
+    def __repr__(self):
+        return "Codec(%r, %r)" % (self.prefix, self.encoding)
+
+    def encode(self, data):
+        return _ed25519.encode(data, self.prefix, self._base)
+
+    def decode(self, s):
+        """Raises BadPrefixError if 's' lacks the prefix, and ValueError if
+        the rest is not validly encoded."""
+        if not isinstance(s, bytes):
+            s = s.encode('ascii')
+        return _ed25519.decode(s, self.prefix, self._base)
+
+    def encode_many(self, data, itemsize):
+        """Encode each 'itemsize'-byte piece of 'data' (any buffer, e.g. the
+        signatures from sign_arrays()), returning a list."""
+        return _ed25519.encode_many(data, itemsize, self.prefix, self._base)
+
+    def decode_many(self, strings, itemsize):
+        """Decode a sequence of strings, each of which must hold
+        'itemsize' bytes, and return them joined into one bytes object,
+        ready for verify_arrays()."""
+        strings = [s if isinstance(s, bytes) else s.encode('ascii')
+                   for s in strings]
+        return _ed25519.decode_many(strings, self.prefix, self._base,
+                                    itemsize)
+
+    def sign_encoded(self, sk, msg):
+        """Sign 'msg' with 'sk' (a SigningKey or its 64-byte string) and
+        return the encoded signature."""
+        _powerup()
+        if isinstance(sk, SigningKey):
+            sk = sk.sk_s
+        sig = _ed25519.sign(msg, sk)[:64]
+        return _ed25519.encode(sig, self.prefix, self._base)
+
+    def verify_encoded(self, vk, sig, msg):
+        """Check an encoded signature of 'msg' by 'vk' (a VerifyingKey or
+        its 32-byte string), raising BadSignatureError if it is bad."""
+        if not isinstance(vk, VerifyingKey):
+            vk = VerifyingKey(vk)
+        sig = self.decode(sig)
+        if len(sig) != 64:
+            raise BadSignatureError("Bad Signature")
+        vk.verify(sig, msg)
@@ -0,0 +1,188 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import cpu_count
+from . import _ed25519
+from .keys import BadSignatureError, SigningKey, VerifyingKey, _powerup
+from .cache import _timer
+from .batch import GATHER_BATCH, pack_messages, verify_items
+
+class Executor(object):
+    """Run signing and verification on a pool of threads, returning
+    concurrent.futures.Future objects.
+
+    The extension releases the GIL while it works, so 'threads' (default:
+    the number of CPUs) operations can proceed in parallel. Requests for
+    messages of up to 'large_message' bytes are queued and handed to the
+    batch verifier (or the native sign_many() loop) up to 'max_batch' at a
+    time, which amortizes the per-call overhead: when the pool is idle a request
+    runs on its own, and as load rises the batches grow. The default,
+    batch.GATHER_BATCH, is more than the extension checks one signature at
+    a time, so full batches use the batch equation. Larger messages
+    are hashed in tasks of their own, and at most threads-1 of those run at
+    once, so a burst of big messages cannot hold up all the small ones.
+
+    If 'cache' is a VerificationCache, it is consulted before queueing a
+    verification, and updated with the good signatures.
+    """
+
+    def __init__(self, threads=None, max_batch=GATHER_BATCH,
+                 large_message=16*1024, cache=None):
+        self.threads = threads or cpu_count()
+        self.max_batch = max_batch
+        self.large_message = large_message
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(self.threads)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._runners = {"verify": self._verify_batch,
+                         "sign": self._sign_batch}
+        self._pending = {"verify": [], "sign": []}
+        self._flushers = {"verify": 0, "sign": 0}
+        self._large = deque()
+        self._large_running = 0
+        self._large_limit = max(1, self.threads-1)
+        self._tasks = 0
+        self._shutdown = False
+
+    def submit_verify(self, vk, sig, msg):
+        """Schedule a signature check. The Future's result is None for a
+        good signature; otherwise it raises BadSignatureError."""
+        if isinstance(vk, VerifyingKey):
+            vk = vk.to_bytes()
+        if len(vk) != 32 or len(sig) != 64:
+            raise ValueError("need a 32-byte verifying key and a 64-byte "
+                             "signature")
+        f = Future()
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(vk, sig, msg)
+            if self.cache.check(key):
+                f.set_running_or_notify_cancel()
+                f.set_result(None)
+                return f
+        self._submit("verify", (f, vk, sig, msg, key), len(msg))
+        return f
+
+    def submit_sign(self, sk, msg):
+        """Schedule a signature. The Future's result is the 64-byte
+        signature."""
+        if isinstance(sk, SigningKey):
+            sk = sk.to_bytes()
+        if len(sk) != 64:
+            raise ValueError("need a 64-byte signing key")
+        f = Future()
+        self._submit("sign", (f, sk, msg), len(msg))
+        return f
+
+    def _submit(self, kind, item, size):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            if size > self.large_message:
+                self._large.append((kind, item))
+                self._start_large()
+            else:
+                self._pending[kind].append(item)
+                if self._flushers[kind] < self.threads:
+                    self._flushers[kind] += 1
+                    self._schedule(self._flush, kind)
+
+    def _schedule(self, fn, *args):
+        # called with the lock held
+        self._tasks += 1
+        self._pool.submit(fn, *args)
+
+    def _task_done(self):
+        # called with the lock held
+        self._tasks -= 1
+        if not self._tasks:
+            self._idle.notify_all()
+            if self._shutdown:
+                self._pool.shutdown(wait=False)
+
+    def _start_large(self):
+        # called with the lock held
+        while self._large and self._large_running < self._large_limit:
+            self._large_running += 1
+            self._schedule(self._run_large, *self._large.popleft())
+
+    def _run_large(self, kind, item):
+        try:
+            self._run(kind, [item])
+        finally:
+            with self._lock:
+                self._large_running -= 1
+                self._start_large()
+                self._task_done()
+
+    def _flush(self, kind):
+        # Run one batch. If more requests are waiting, go to the back of the
+        # pool's queue rather than looping, so queued large messages get a
+        # turn.
+        try:
+            with self._lock:
+                pending = self._pending[kind]
+                batch = pending[:self.max_batch]
+                del pending[:self.max_batch]
+            self._run(kind, batch)
+        finally:
+            with self._lock:
+                if self._pending[kind]:
+                    self._schedule(self._flush, kind)
+                else:
+                    self._flushers[kind] -= 1
+                self._task_done()
+
+    def _run(self, kind, items):
+        items = [item for item in items
+                 if item[0].set_running_or_notify_cancel()]
+        if not items:
+            return
+        try:
+            self._runners[kind](items)
+        except BaseException as e:
+            for item in items:
+                if not item[0].done():
+                    item[0].set_exception(e)
+
+    def _verify_batch(self, items):
+        n = len(items)
+        start = _timer()
+        results = verify_items([item[1:4] for item in items])
+        elapsed = (_timer() - start) / n
+        for (f, vk, sig, msg, key), good in zip(items, results):
+            if good:
+                if key is not None:
+                    self.cache.add(key, elapsed)
+                f.set_result(None)
+            else:
+                f.set_exception(BadSignatureError("Bad Signature"))
+
+    def _sign_batch(self, items):
+        _powerup()
+        msgs, offsets = pack_messages([item[2] for item in items])
+        sigs = bytearray(64*len(items))
+        _ed25519.sign_many(b"".join([item[1] for item in items]),
+                           msgs, offsets, sigs)
+        for i, item in enumerate(items):
+            item[0].set_result(bytes(sigs[64*i:64*i+64]))
+
+    def shutdown(self, wait=True):
+        """Stop accepting requests. Requests already submitted are still
+        completed; if 'wait' is true, this waits for them."""
+        with self._lock:
+            self._shutdown = True
+            if wait:
+                while self._tasks:
+                    self._idle.wait()
+            if self._tasks:
+                return # the last task to finish will shut the pool down
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
@@ -0,0 +1,43 @@
+"""Arithmetic on the curve's group of points, for protocols built on top of
+Ed25519 signatures (aggregate receipts, threshold schemes, commitments,
+key blinding, DLEQ proofs).
+
+Point and Scalar are the extension's types for single elements. For
+multiscalar_mul(), points are given as their 32-byte encodings (e.g.
+VerifyingKey.to_bytes()) and scalars as 32-byte little-endian integers,
+taken modulo the order of the base point. Lists of them are packed into
+one buffer of N*32 bytes, and any object supporting the buffer protocol
+will do.
+"""
+
+from . import _ed25519
+
+Point = _ed25519.Point
+Scalar = _ed25519.Scalar
+
+def _pack(items):
+    # a list of 32-byte strings (or Points, Scalars or VerifyingKeys), or
+    # an already packed buffer
+    if not isinstance(items, (list, tuple)):
+        return items
+    packed = []
+    for item in items:
+        if not isinstance(item, bytes):
+            item = item.to_bytes()
+        if len(item) != 32:
+            raise ValueError("points and scalars are 32-byte strings")
+        packed.append(item)
+    return b"".join(packed)
+
+def multiscalar_mul(scalars, points, constant_time=False):
+    """Return the encoding of the sum of [scalars[i]]points[i].
+
+    'scalars' and 'points' are each a list of N 32-byte strings (or
+    Scalars, and Points or VerifyingKeys) or a buffer of N*32 bytes. Raises ValueError if a
+    point does not decode. The default method takes time that depends on
+    the scalars, which is fine when they are public (e.g. when checking a
+    proof); for secret scalars, pass constant_time=True, which costs about
+    a third more.
+    """
+    return _ed25519.multiscalar_mul(_pack(scalars), _pack(points),
+                                    bool(constant_time))
@@ -0,0 +1,191 @@
+"""Keyrings: files of verifying keys, already decompressed.
+
+Keyring.build() validates and decompresses a set of verifying keys once
+(with batch.decompress_many()), writing them to a file. Keyring() maps
+that file into memory, so a process that opens it does no curve
+arithmetic, and every process on the machine that opens the same file
+shares one copy of it in the OS page cache.
+Attach one to the PointCache (point_cache.keyring = Keyring(path)) and
+VerifyingKey picks the prepared points up from it.
+
+The layout, all little-endian:
+
+  header   64 bytes: MAGIC, then the version, entry stride, entry count,
+           bucket count, and the offsets of the index and the entries
+  index    one 32-bit slot per bucket, holding 1 + the number of the entry
+           whose key hashes there (or was displaced to there by linear
+           probing), or 0 for an empty bucket
+  entries  a fixed-stride array of (32-byte key, 64-byte prepared point)
+
+A key's bucket is its first 8 bytes modulo the (power of two) bucket
+count: keys are encoded curve points, so those bytes are already evenly
+spread. There are at least twice as many buckets as keys.
+
+Every prepared point is checked against its key when it is used, so a
+point that was tampered with cannot make a forgery pass, but it does make
+its key reject every signature. check() recomputes every entry.
+"""
+
+import os
+import struct
+import mmap
+from . import _ed25519
+from .batch import decompress_many
+
+MAGIC = b"ed25519 keyring\n"
+VERSION = 1
+_HEADER = struct.Struct("<16sIIQQQQ8x")
+_SLOT = struct.Struct("<I")
+_HASH = struct.Struct("<Q")
+KEYBYTES = 32
+STRIDE = KEYBYTES + _ed25519.PREPAREDKEYBYTES
+
+class KeyringError(ValueError):
+    pass
+
+class Keyring(object):
+    """A read-only, memory-mapped keyring file (see build()). Usable as a
+    context manager, which closes it."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_header()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _parse_header(self):
+        m = self._map
+        if len(m) < _HEADER.size:
+            raise KeyringError("%s is too short to be a keyring" % self.path)
+        (magic, version, stride, self._count, self._buckets,
+         self._index, self._entries) = _HEADER.unpack_from(m, 0)
+        if magic != MAGIC:
+            raise KeyringError("%s is not a keyring" % self.path)
+        if version != VERSION or stride != STRIDE:
+            raise KeyringError("%s is keyring version %d (stride %d), not %d"
+                               % (self.path, version, stride, VERSION))
+        # build() leaves at least half the buckets empty, which is what
+        # bounds the probing in _find()
+        if (not self._buckets or self._buckets & (self._buckets - 1)
+            or self._buckets < 2 * self._count
+            or self._index + self._buckets * _SLOT.size > self._entries
+            or self._entries + self._count * STRIDE != len(m)):
+            raise KeyringError("%s is truncated or corrupt" % self.path)
+
+    @classmethod
+    def build(cls, path, keys, skip_invalid=False):
+        """Write a keyring of 'keys' (32-byte strings or VerifyingKeys) to
+        'path', replacing it atomically, and return it opened. Duplicates
+        are stored once. A key that is not a valid point raises
+        KeyringError, or is left out if 'skip_invalid' is true."""
+        unique = []
+        seen = set()
+        for vk_s in keys:
+            if not isinstance(vk_s, bytes):
+                vk_s = vk_s.to_bytes()
+            if vk_s not in seen:
+                seen.add(vk_s)
+                unique.append(vk_s)
+        # keys of the wrong length must not shift the others when packed
+        sized = [vk_s for vk_s in unique if len(vk_s) == KEYBYTES]
+        prepared, invalid = decompress_many(sized)
+        bad = [sized[i] for i in invalid]
+        bad += [vk_s for vk_s in unique if len(vk_s) != KEYBYTES]
+        if bad and not skip_invalid:
+            raise KeyringError("invalid verifying key %r" % (bad[0],))
+        invalid = set(invalid)
+        entries = [vk_s + bytes(prepared[64*i:64*i + 64])
+                   for i, vk_s in enumerate(sized) if i not in invalid]
+
+        buckets = 1
+        while buckets < 2 * len(entries):
+            buckets *= 2
+        index = bytearray(buckets * _SLOT.size)
+        mask = buckets - 1
+        for n, entry in enumerate(entries):
+            i = _HASH.unpack_from(entry)[0] & mask
+            while _SLOT.unpack_from(index, i * _SLOT.size)[0]:
+                i = (i + 1) & mask
+            _SLOT.pack_into(index, i * _SLOT.size, n + 1)
+        index_offset = _HEADER.size
+        entries_offset = index_offset + len(index)
+        header = _HEADER.pack(MAGIC, VERSION, STRIDE, len(entries), buckets,
+                              index_offset, entries_offset)
+
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write(index)
+            for entry in entries:
+                f.write(entry)
+        getattr(os, "replace", os.rename)(tmp, path) # py2 has no replace()
+        return cls(path)
+
+    def _slot(self, i):
+        n = _SLOT.unpack_from(self._map, self._index + i * _SLOT.size)[0]
+        if n > self._count:
+            raise KeyringError("%s: bucket %d is corrupt" % (self.path, i))
+        return n
+
+    def _find(self, vk_s):
+        # the offset of vk_s's entry, or -1
+        if len(vk_s) != KEYBYTES:
+            return -1
+        m, mask = self._map, self._buckets - 1
+        i = _HASH.unpack_from(vk_s)[0] & mask
+        for _ in range(self._buckets):
+            n = self._slot(i)
+            if not n:
+                return -1
+            offset = self._entries + (n - 1) * STRIDE
+            if m[offset:offset + KEYBYTES] == vk_s:
+                return offset
+            i = (i + 1) & mask
+        # a keyring from build() always has an empty bucket
+        raise KeyringError("%s: the index has no empty bucket" % self.path)
+
+    def lookup(self, vk_s):
+        """Return the 64-byte prepared form of vk_s (as from
+        _ed25519.prepare()), or None if it is not in the keyring."""
+        offset = self._find(vk_s)
+        if offset < 0:
+            return None
+        return self._map[offset + KEYBYTES:offset + STRIDE]
+
+    def __contains__(self, vk_s):
+        return self._find(vk_s) >= 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """The keys, in the order they were added."""
+        for n in range(self._count):
+            offset = self._entries + n * STRIDE
+            yield self._map[offset:offset + KEYBYTES]
+
+    def check(self):
+        """Recompute every entry, raising KeyringError at the first one
+        that does not match. This costs as much as build()."""
+        for i in range(self._buckets):
+            self._slot(i)
+        for n, vk_s in enumerate(self):
+            try:
+                good = self.lookup(vk_s) == _ed25519.prepare(vk_s)
+            except ValueError:
+                good = False
+            if not good:
+                raise KeyringError("%s: entry %d is corrupt" % (self.path, n))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,11 @@
 import os
-import base64
+import threading
 from . import _ed25519
+from .cache import point_cache, _timer
 BadSignatureError = _ed25519.BadSignatureError
 
 def create_keypair(entropy=os.urandom):
+    _powerup()
     SEEDLEN = int(_ed25519.SECRETKEYBYTES/2)
     assert SEEDLEN == 32
     seed = entropy(SEEDLEN)
@@ -11,8 +13,7 @@ def create_keypair(entropy=os.urandom):
     vk = sk.get_verifying_key()
     return sk, vk
 
-class BadPrefixError(Exception):
-    pass
+BadPrefixError = _ed25519.BadPrefixError
 
 def remove_prefix(s_bytes, prefix):
     assert(type(s_bytes) == type(prefix))
@@ -20,6 +21,15 @@ def remove_prefix(s_bytes, prefix):
         raise BadPrefixError("did not see expected '%s' prefix" % (prefix,))
     return s_bytes[len(prefix):]
 
+# the 'encoding' names accepted by to_ascii() and from_ascii()
+ENCODINGS = {"base64": 64, "base32": 32, "base16": 16, "hex": 16}
+
+def _base(encoding):
+    try:
+        return ENCODINGS[encoding]
+    except KeyError:
+        raise NotImplementedError
+
 def to_ascii(s_bytes, prefix="", encoding="base64"):
     """Return a version-prefixed ASCII representation of the given binary
     string. 'encoding' indicates how to do the encoding, and can be one of:
@@ -40,36 +50,18 @@ def to_ascii(s_bytes, prefix="", encoding="base64"):
     assert isinstance(s_bytes, bytes)
     if not isinstance(prefix, bytes):
         prefix = prefix.encode('ascii')
-    if encoding == "base64":
-        s_ascii = base64.b64encode(s_bytes).decode('ascii').rstrip("=")
-    elif encoding == "base32":
-        s_ascii = base64.b32encode(s_bytes).decode('ascii').rstrip("=").lower()
-    elif encoding in ("base16", "hex"):
-        s_ascii = base64.b16encode(s_bytes).decode('ascii').lower()
-    else:
-        raise NotImplementedError
-    return prefix+s_ascii.encode('ascii')
+    return _ed25519.encode(s_bytes, prefix, _base(encoding))
 
 def from_ascii(s_ascii, prefix="", encoding="base64"):
     """This is the opposite of to_ascii. It will throw BadPrefixError if
-    the prefix is not found.
+    the prefix is not found, and ValueError if the rest is not validly
+    encoded.
     """
-    if isinstance(s_ascii, bytes):
-        s_ascii = s_ascii.decode('ascii')
-    if isinstance(prefix, bytes):
-        prefix = prefix.decode('ascii')
-    s_ascii = remove_prefix(s_ascii.strip(), prefix)
-    if encoding == "base64":
-        s_ascii += "=" * ((4 - len(s_ascii) % 4) % 4)
-        s_bytes = base64.b64decode(s_ascii.encode('ascii'))
-    elif encoding == "base32":
-        s_ascii += "=" * ((8 - len(s_ascii) % 8) % 8)
-        s_bytes = base64.b32decode(s_ascii.upper().encode('ascii'))
-    elif encoding in ("base16", "hex"):
-        s_bytes = base64.b16decode(s_ascii.upper().encode('ascii'))
-    else:
-        raise NotImplementedError
-    return s_bytes
+    if not isinstance(s_ascii, bytes):
+        s_ascii = s_ascii.encode('ascii')
+    if not isinstance(prefix, bytes):
+        prefix = prefix.encode('ascii')
+    return _ed25519.decode(s_ascii.strip(), prefix, _base(encoding))
 
 class SigningKey(object):
     # this can only be used to reconstruct a key created by create_keypair().
@@ -110,10 +102,15 @@ class SigningKey(object):
         return (them.__class__ == self.__class__
                 and them.sk_s == self.sk_s)
 
+    def __reduce__(self):
+        # the 64-byte form, so unpickling does not recompute the public key
+        return (self.__class__, (self.sk_s,))
+
     def get_verifying_key(self):
         return VerifyingKey(self.vk_s)
 
     def sign(self, msg, prefix="", encoding=None):
+        _powerup()
         assert isinstance(msg, bytes)
         if not isinstance(prefix, bytes):
             prefix = prefix.encode('ascii')
@@ -128,8 +125,52 @@ class SigningKey(object):
             return to_ascii(sig_out, prefix, encoding)
         return prefix+sig_out
 
+    def sign_stream(self, msgs, batch_size=256, threads=1):
+        """Sign each message of the iterable 'msgs' (which may be endless),
+        yielding the 64-byte signatures in order. Messages are read and
+        signed 'batch_size' at a time, on 'threads' background threads:
+        see ed25519.stream."""
+        from .stream import sign_stream # which needs concurrent.futures
+        return sign_stream(self, msgs, batch_size, threads)
+
+    def bind_prefix(self, msg_prefix):
+        """Return a PrefixSigner, which signs messages that begin with
+        'msg_prefix' (e.g. a fixed record header) faster than sign(), by
+        hashing that prefix once instead of for every message."""
+        return PrefixSigner(self, msg_prefix)
+
+class PrefixSigner(object):
+    """Signs messages that all begin with the same bytes. sign(tail) gives
+    the same signature as SigningKey.sign(msg_prefix + tail), but only the
+    tail goes through the nonce hash. (The second hash, H(R||A||msg),
+    begins with the fresh R, so it still covers the whole message, and
+    verification, whose only hash that is, has nothing to cache.)
+    """
+
+    def __init__(self, sk, msg_prefix):
+        assert isinstance(msg_prefix, bytes)
+        self.msg_prefix = msg_prefix
+        self.vk_s = sk.vk_s
+        self._state = _ed25519.sign_prefix_init(msg_prefix, sk.sk_s)
+
+    def sign(self, tail, prefix="", encoding=None):
+        """Sign msg_prefix + tail. 'prefix' and 'encoding' are as for
+        SigningKey.sign()."""
+        _powerup()
+        assert isinstance(tail, bytes)
+        if not isinstance(prefix, bytes):
+            prefix = prefix.encode('ascii')
+        sig = _ed25519.sign_prefixed(self._state, tail)
+        if encoding:
+            return to_ascii(sig, prefix, encoding)
+        return prefix+sig
+
 class VerifyingKey(object):
-    def __init__(self, vk_s, prefix="", encoding=None):
+    # keys pickled before there was a prepared point have none in their
+    # __dict__, and __init__ is not called when they are unpickled
+    _prepared = None
+
+    def __init__(self, vk_s, prefix="", encoding=None, prepared=None):
         if not isinstance(prefix, bytes):
             prefix = prefix.encode('ascii')
         if not isinstance(vk_s, bytes):
@@ -141,6 +182,14 @@ class VerifyingKey(object):
 
         assert len(vk_s) == 32
         self.vk_s = vk_s
+        # decompressed lazily, by _get_prepared(), unless the caller already
+        # has the prepared point, e.g. from decompress_many(). That is
+        # checked, which costs far less than decompressing.
+        self._prepared = None
+        if prepared is not None:
+            prepared = bytes(prepared)
+            _ed25519.check_prepared(vk_s, prepared)
+            self._prepared = prepared
 
     def to_bytes(self, prefix=""):
         if not isinstance(prefix, bytes):
@@ -158,7 +207,23 @@ class VerifyingKey(object):
         return (them.__class__ == self.__class__
                 and them.vk_s == self.vk_s)
 
-    def verify(self, sig, msg, prefix="", encoding=None):
+    def __reduce__(self):
+        # decompress the point (once, here) so that the processes this is
+        # sent to do not each have to
+        self._get_prepared()
+        return (self.__class__, (self.vk_s,), self.__dict__)
+
+    def _get_prepared(self):
+        # returns the 64-byte prepared point, or False for invalid keys
+        if self._prepared is None:
+            self._prepared = point_cache.lookup(self.vk_s) or False
+        return self._prepared
+
+    def verify(self, sig, msg, prefix="", encoding=None, cache=None):
+        """Raise BadSignatureError unless 'sig' is a valid signature of
+        'msg'. If 'cache' is a VerificationCache, signatures it has already
+        seen verify successfully are accepted without recomputation."""
+        _powerup()
         if not isinstance(sig, bytes):
             sig = sig.encode('ascii')
         if not isinstance(prefix, bytes):
@@ -170,12 +235,21 @@ class VerifyingKey(object):
         else:
             sig = remove_prefix(sig, prefix)
         assert len(sig) == 64
+        if cache is not None:
+            key = cache.key(self.vk_s, sig, msg)
+            if cache.check(key):
+                return
+            start = _timer()
         sig_R = sig[:32]
         sig_S = sig[32:]
         sig_and_msg = sig_R + sig_S + msg
-        # this might raise BadSignatureError
-        msg2 = _ed25519.open(sig_and_msg, self.vk_s)
+        # this might raise BadSignatureError. Invalid keys have no prepared
+        # form: let open() reject them.
+        msg2 = _ed25519.open(sig_and_msg, self.vk_s,
+                             self._get_prepared() or None)
         assert msg2 == msg
+        if cache is not None:
+            cache.add(key, _timer() - start)
 
 def selftest():
     message = b"crypto libraries should always test themselves at powerup"
@@ -188,4 +262,37 @@ def selftest():
     assert sig == b"sig0-E/QrwtSF52x8+q0l4ahA7eJbRKc777ClKNg217Q0z4fiYMCdmAOI+rTLVkiFhX6k3D+wQQfKdJYMxaTUFfv1DQ", sig
     vk.verify(sig, message, prefix="sig0-", encoding="base64")
 
-selftest()
+# The power-up self-test runs according to $ED25519_SELFTEST:
+#  "import": when this module is imported
+#  "first-use" (the default): before the first key is generated, or the
+#    first signature made or checked, in this process
+#  "off": never
+SELFTEST_MODES = ("import", "first-use", "off")
+selftest_mode = os.environ.get("ED25519_SELFTEST", "first-use")
+if selftest_mode not in SELFTEST_MODES:
+    raise ValueError("ED25519_SELFTEST must be one of %s, not %r"
+                     % (", ".join(SELFTEST_MODES), selftest_mode))
+
+_selftest_lock = threading.RLock()
+_selftest_passed = selftest_mode == "off"
+_selftest_running = False
+
+def _powerup():
+    """Run the self-test if it has not passed yet. Other threads wait for
+    it; calls made by the self-test itself return at once."""
+    global _selftest_passed, _selftest_running
+    if _selftest_passed:
+        return
+    with _selftest_lock:
+        if _selftest_passed or _selftest_running:
+            return
+        _selftest_running = True
+        try:
+            selftest()
+        finally:
+            _selftest_running = False
+        # if selftest() failed, the next call will try (and fail) again
+        _selftest_passed = True
+
+if selftest_mode == "import":
+    _powerup()
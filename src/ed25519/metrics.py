@@ -0,0 +1,132 @@
+"""Operation counters and latency histograms, kept by the C extension.
+
+They are off by default: call enable() (or set $ED25519_STATS to 1) to
+start counting. Once on, each operation costs an extra clock read and a
+few atomic additions.
+"""
+
+import os
+from . import _ed25519
+
+OPERATIONS = ("publickey", "sign", "verify", "verify_batch")
+# nothing takes less than a microsecond (2**10 ns), so to_prometheus()
+# leaves out the buckets below that
+_FIRST_BUCKET = 10
+
+def enable(flag=True):
+    """Turn the counters on (or off, with flag=False). Returns the previous
+    setting."""
+    return _ed25519.stats_enable(bool(flag))
+
+def disable():
+    return enable(False)
+
+def reset():
+    _ed25519.stats_reset()
+
+def bucket_bounds():
+    """The upper bound, in seconds, of each histogram bucket. The last
+    bucket also counts anything slower, so its bound is infinite."""
+    bounds = [2**i / 1e9 for i in range(_ed25519.STATS_BUCKETS)]
+    bounds[-1] = float("inf")
+    return bounds
+
+def stats():
+    """Return a dict mapping each operation (publickey, sign, verify, and
+    verify_batch) to a dict of counters:
+
+     * calls: the number of calls
+     * items: the number of keys or signatures handled (a call of
+       verify_batch checks many signatures)
+     * failures: how many of the items were bad signatures
+     * bytes: the number of bytes passed through SHA-512
+     * seconds: the total time spent
+     * buckets: the latency histogram, a list of counts, one per entry of
+       bucket_bounds(): bucket i counts calls that took no longer than
+       bucket_bounds()[i], but longer than the bucket before
+
+    Signatures checked by VerifyingKey.verify() or one at a time by the
+    batch functions count as verify. _ed25519.verify_batch(), which only
+    checks a batch as a whole, counts a failed batch as one failure.
+    """
+    snapshot = _ed25519.stats_snapshot()
+    for counters in snapshot.values():
+        counters["seconds"] = counters.pop("nanoseconds") / 1e9
+    return snapshot
+
+PHASES = ("key_hash", "nonce_hash", "scalarmult_base", "hram_hash", "scalar",
+          "decompress", "double_scalarmult", "pack_compare")
+
+def profile():
+    """Return where signing and verifying spend their time, as a dict
+    mapping each of PHASES to a dict of calls and seconds (in total), or
+    None unless the extension was built with $ED25519_PROFILE set to 1.
+
+    Signing (SigningKey.sign(), sign_arrays()) runs key_hash, nonce_hash,
+    scalarmult_base, hram_hash, scalar and pack_compare; verifying one
+    signature at a time runs decompress, hram_hash, scalar,
+    double_scalarmult and pack_compare. The batch verifier is not
+    profiled. The counters are always on in such a build: reset them with
+    profile_reset().
+    """
+    snapshot = _ed25519.profile_snapshot()
+    if snapshot is None:
+        return None
+    for counters in snapshot.values():
+        counters["seconds"] = counters.pop("nanoseconds") / 1e9
+    return snapshot
+
+def profile_reset():
+    _ed25519.profile_reset()
+
+_METRICS = [("calls", "operations_total",
+             "Calls to each Ed25519 operation."),
+            ("items", "items_total",
+             "Keys or signatures handled by each operation."),
+            ("failures", "failures_total",
+             "Bad signatures found by each operation."),
+            ("bytes", "hashed_bytes_total",
+             "Bytes passed through SHA-512 by each operation."),
+            ]
+
+def to_prometheus(snapshot=None, namespace="ed25519"):
+    """Render stats() (or 'snapshot') in the Prometheus text exposition
+    format, for example for the node exporter's textfile collector."""
+    if snapshot is None:
+        snapshot = stats()
+    ops = [op for op in OPERATIONS if op in snapshot]
+    lines = []
+    for key, name, help in _METRICS:
+        name = "%s_%s" % (namespace, name)
+        lines.append("# HELP %s %s" % (name, help))
+        lines.append("# TYPE %s counter" % name)
+        for op in ops:
+            lines.append('%s{op="%s"} %d' % (name, op, snapshot[op][key]))
+    name = "%s_operation_seconds" % namespace
+    lines.append("# HELP %s Latency of each Ed25519 operation." % name)
+    lines.append("# TYPE %s histogram" % name)
+    bounds = bucket_bounds()
+    for op in ops:
+        counters = snapshot[op]
+        cumulative = 0
+        for i, (bound, count) in enumerate(zip(bounds, counters["buckets"])):
+            cumulative += count
+            if i < _FIRST_BUCKET:
+                continue
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append('%s_bucket{op="%s",le="%s"} %d'
+                         % (name, op, le, cumulative))
+        lines.append('%s_sum{op="%s"} %r' % (name, op, counters["seconds"]))
+        lines.append('%s_count{op="%s"} %d' % (name, op, counters["calls"]))
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path, snapshot=None, namespace="ed25519"):
+    """Write to_prometheus() to 'path', atomically (via a temporary file
+    and a rename), so a collector never reads a partial file."""
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "w") as f:
+        f.write(to_prometheus(snapshot, namespace))
+    getattr(os, "replace", os.rename)(tmp, path) # py2 has no replace()
+
+if os.environ.get("ED25519_STATS", "0") not in ("", "0"):
+    enable()
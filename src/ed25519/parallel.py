@@ -0,0 +1,137 @@
+"""Verify large numbers of signatures in a pool of worker processes.
+
+The (verifying key, signature, message) triples are packed once into a
+multiprocessing.shared_memory segment: a result byte per item, N+1 message
+offsets, N signatures, N keys, and the concatenated messages. Each worker
+is only told the segment name and a range of item indices. It runs the
+batch verifier directly over its slice of the segment and writes its
+results back in place, so nothing is pickled per item.
+
+This needs python3.8 or later, for multiprocessing.shared_memory.
+"""
+
+import os
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from .batch import pack, verify_packed
+
+def _layout(n, msgs_len):
+    # (start, length) of each region. The results come first, then the
+    # offsets (8-byte aligned), then the fixed-size records and messages.
+    layout = {}
+    pos = 0
+    for name, length in (("results", n),
+                         ("offsets", 8*(n+1)),
+                         ("sigs", 64*n),
+                         ("keys", 32*n),
+                         ("msgs", msgs_len)):
+        pos = (pos + 7) & ~7
+        layout[name] = (pos, length)
+        pos += length
+    return layout, pos
+
+_worker_index = None
+
+def _init_worker(counter, affinity):
+    global _worker_index
+    with counter.get_lock():
+        _worker_index = counter.value
+        counter.value += 1
+    if affinity:
+        cpu = affinity[_worker_index % len(affinity)]
+        os.sched_setaffinity(0, [cpu])
+
+def _verify_slice(args):
+    name, layout, lo, hi = args
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        views = dict((region, shm.buf[start:start+length])
+                     for region, (start, length) in layout.items())
+        views["offsets"] = views["offsets"].cast("q")
+        try:
+            verify_packed(views["sigs"][64*lo:64*hi],
+                          views["keys"][32*lo:32*hi],
+                          views["msgs"],
+                          views["offsets"][lo:hi+1],
+                          views["results"][lo:hi])
+        finally:
+            # the segment cannot be closed while views of it exist
+            for view in views.values():
+                view.release()
+    finally:
+        shm.close()
+
+class ProcessVerifier(object):
+    """A reusable pool of verification worker processes.
+
+    'workers' defaults to the number of CPUs. 'chunksize' is the number of
+    items handed to a worker at a time (by default, about four chunks per
+    worker). 'affinity' is an optional sequence of CPU numbers: worker k is
+    pinned to affinity[k % len(affinity)]. This requires
+    os.sched_setaffinity(), i.e. Linux.
+    """
+
+    def __init__(self, workers=None, chunksize=None, affinity=None,
+                 context=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        affinity = list(affinity or [])
+        if affinity:
+            if not hasattr(os, "sched_setaffinity"):
+                raise NotImplementedError("this platform cannot pin processes")
+            if not set(affinity) <= os.sched_getaffinity(0):
+                raise ValueError("affinity names CPUs this process cannot use")
+        ctx = context or multiprocessing.get_context()
+        counter = ctx.Value("i", 0)
+        # Workers attaching to a segment register it with the resource
+        # tracker. Start our tracker before forking, so they all share it,
+        # rather than each starting a private one that would unlink the
+        # segment (and complain) when the worker exits.
+        resource_tracker.ensure_running()
+        self._pool = ctx.Pool(self.workers, _init_worker, (counter, affinity))
+
+    def verify_many(self, items):
+        """Check an iterable of (verifying_key, signature, message) triples,
+        where verifying_key is a VerifyingKey or its 32-byte string. Returns
+        a list of booleans, True for each good signature."""
+        sigs, keys, msgs, offsets = pack(items)
+        n = len(offsets) - 1
+        if not n:
+            return []
+        layout, size = _layout(n, len(msgs))
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            for region, data in (("offsets", offsets.tobytes()),
+                                 ("sigs", sigs), ("keys", keys),
+                                 ("msgs", msgs)):
+                start, length = layout[region]
+                shm.buf[start:start+length] = data
+            del sigs, keys, msgs, offsets
+            chunksize = self.chunksize or max(1, -(-n // (4*self.workers)))
+            tasks = [(shm.name, layout, lo, min(lo+chunksize, n))
+                     for lo in range(0, n, chunksize)]
+            self._pool.map(_verify_slice, tasks)
+            start, length = layout["results"]
+            results = bytes(shm.buf[start:start+length])
+        finally:
+            shm.close()
+            shm.unlink()
+        return [bool(r) for r in results]
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def verify_many(items, workers=None, chunksize=None, affinity=None):
+    """Check (verifying_key, signature, message) triples using a temporary
+    pool of 'workers' processes. See ProcessVerifier for the arguments.
+    Returns a list of booleans."""
+    with ProcessVerifier(workers, chunksize, affinity) as verifier:
+        return verifier.verify_many(items)
@@ -0,0 +1,66 @@
+"""Signing and verifying unbounded streams, a batch at a time.
+
+verify_stream() and sign_stream() read their input lazily, 'batch_size'
+items at a time, and hand each batch to the batch functions on a
+background thread, which runs with the GIL released. Meanwhile the caller's
+thread reads the next batch (so a generator is only ever resumed by the
+thread that iterates over the stream), and consumes the results of the
+batch before. Results come out in input order. At most threads+1 batches
+are held at once (counting the one whose results are being consumed), so
+memory use does not grow with the length of the stream.
+"""
+
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from .batch import verify_batch, sign_arrays, pack_messages
+
+BATCH_SIZE = 256
+
+def _batches(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def _run(batches, work, threads):
+    # yield the results of work(batch) for each batch, in order, with the
+    # next 'threads' batches running (or waiting) in the background
+    pool = ThreadPoolExecutor(threads)
+    pending = deque()
+    try:
+        for batch in batches:
+            pending.append(pool.submit(work, batch))
+            if len(pending) > threads:
+                for result in pending.popleft().result():
+                    yield result
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+    finally:
+        # the caller stopped early (or a batch failed)
+        for f in pending:
+            f.cancel()
+        pool.shutdown(wait=True)
+
+def verify_stream(items, batch_size=BATCH_SIZE, threads=1, cache=None):
+    """Check each (verifying_key, signature, message) triple of the
+    iterable 'items', as verify_batch() does, yielding True for each good
+    signature and False for each bad one, in order. 'threads' batches are
+    checked at once. A malformed item raises ValueError when its batch's
+    results are reached. If 'cache' is a VerificationCache, it is used as
+    by verify_batch()."""
+    def work(batch):
+        return verify_batch(batch, cache)
+    return _run(_batches(items, batch_size), work, threads)
+
+def sign_stream(sk, msgs, batch_size=BATCH_SIZE, threads=1):
+    """Sign each message of the iterable 'msgs' with the SigningKey 'sk',
+    yielding the 64-byte signatures in order (see also
+    SigningKey.sign_stream())."""
+    def work(batch):
+        sigs = sign_arrays(sk, *pack_messages(batch))
+        return [bytes(sigs[64*i:64*i+64]) for i in range(len(batch))]
+    return _run(_batches(msgs, batch_size), work, threads)
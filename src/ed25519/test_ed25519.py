@@ -1,7 +1,9 @@
 from __future__ import print_function
+import os
 import sys
 import unittest
 import time
+import array
 from binascii import hexlify, unhexlify
 import ed25519
 from ed25519 import _ed25519 as raw
@@ -183,6 +185,44 @@ class Basic(unittest.TestCase):
         self.failIfEqual(sk2, b"not a SigningKey")
         self.failIfEqual(vk2, b"not a VerifyingKey")
 
+    def test_pickle(self):
+        import pickle
+        sk, vk = ed25519.create_keypair()
+        sig = sk.sign(b"msg")
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            sk2 = pickle.loads(pickle.dumps(sk, protocol))
+            self.failUnlessEqual(sk2, sk)
+            self.failUnlessEqual(sk2.vk_s, sk.vk_s)
+            self.failUnlessEqual(sk2.sign(b"msg"), sig)
+            vk2 = pickle.loads(pickle.dumps(vk, protocol))
+            self.failUnlessEqual(vk2, vk)
+            # the decompressed point comes along
+            self.failUnlessEqual(vk2._prepared, raw.prepare(vk.vk_s))
+            vk2.verify(sig, b"msg")
+        bad_vk = ed25519.VerifyingKey(b"\x02" + b"\x00" * 31)
+        bad_vk2 = pickle.loads(pickle.dumps(bad_vk))
+        self.failUnlessEqual(bad_vk2._prepared, False)
+        self.failUnlessRaises(ed25519.BadSignatureError,
+                              bad_vk2.verify, sig, b"msg")
+
+    def test_old_pickle(self):
+        import pickle
+        # SigningKey(b"\x00"*32)'s VerifyingKey, pickled (protocol 2) by a
+        # version without __reduce__, whose __dict__ held only vk_s
+        old = (b"\x80\x02ced25519.keys\nVerifyingKey\nq\x00)\x81q\x01}q\x02"
+               b"X\x04\x00\x00\x00vk_sq\x03c_codecs\nencode\nq\x04X-\x00\x00"
+               b"\x00;j'\xc2\xbc\xc3\x8e\xc2\xb6\xc2\xa4-b\xc2\xa3\xc2\xa8"
+               b"\xc3\x90*o\rse2\x15w\x1d\xc3\xa2C\xc2\xa6:\xc3\x80H\xc2"
+               b"\xa1\xc2\x8bY\xc3\x9a)q\x05X\x06\x00\x00\x00latin1q\x06"
+               b"\x86q\x07Rq\x08sb.")
+        vk = pickle.loads(old)
+        self.failIf("_prepared" in vk.__dict__)
+        sk = ed25519.SigningKey(b"\x00" * 32)
+        self.failUnlessEqual(vk, sk.get_verifying_key())
+        vk.verify(sk.sign(b"msg"), b"msg")
+        self.failUnlessEqual(vk._prepared, raw.prepare(vk.vk_s))
+        self.failUnlessEqual(pickle.loads(pickle.dumps(vk)), vk)
+
     def test_prefix(self):
         sk1,vk1 = ed25519.create_keypair()
         PREFIX = b"private0-"
@@ -269,6 +309,1325 @@ class Basic(unittest.TestCase):
         check3("base32", b"sig0-gdl52urk7k2mswtbb672pquagspf36nzhsbwnjppvp4tdyscuosgfsymkrc5nn5rjz6nalfclnqucg7uhoidi3gcayvmloiqyn5dsci")
         check3("hex", b"sig0-30d7dd522afab4c95a610fbfa7c280349e5df9b93c8366a5efabf931e242a3a462cb0c5445d6b7b14e7cd02ca25b61411bf43b90346cc2062ac5b910c37a3909")
 
+    def test_prefix_signer(self):
+        sk, vk = ed25519.create_keypair()
+        # either side of the 128-byte SHA-512 block boundaries
+        for size in (0, 1, 95, 96, 200, 300):
+            header = os.urandom(size)
+            signer = sk.bind_prefix(header)
+            self.failUnless(isinstance(signer, ed25519.PrefixSigner))
+            for tail in (b"", b"record", os.urandom(200)):
+                sig = signer.sign(tail)
+                self.failUnlessEqual(sig, sk.sign(header + tail))
+                vk.verify(sig, header + tail)
+        self.failUnlessEqual(signer.sign(b"x", "sig0-", "base64"),
+                             sk.sign(header + b"x", "sig0-", "base64"))
+        # the state carries its own prefix
+        state = raw.sign_prefix_init(b"header", sk.sk_s)
+        self.failUnlessEqual(raw.sign_prefixed(state, b"tail"),
+                             sk.sign(b"headertail"))
+        # and nothing else will do, least of all bytes made to look like one
+        self.failUnlessRaises(TypeError, raw.sign_prefixed,
+                              os.urandom(320), b"x")
+        self.failUnlessRaises(TypeError, raw.sign_prefixed,
+                              (state, b"other"), b"x")
+
+class PointCache(unittest.TestCase):
+    def test_prepare(self):
+        sk = ed25519.SigningKey(b"\x00" * 32)
+        vk_s = sk.get_verifying_key().to_bytes()
+        prepared = raw.prepare(vk_s)
+        self.failUnlessEqual(len(prepared), raw.PREPAREDKEYBYTES)
+        msg = b"hello world"
+        sig = sk.sign(msg)
+        self.failUnlessEqual(raw.open(sig+msg, vk_s, prepared), msg)
+        self.failUnlessRaises(raw.BadSignatureError,
+                              raw.open, sig+msg+b".. NOT!", vk_s, prepared)
+        self.failUnlessRaises(TypeError, raw.open, sig+msg, vk_s, b"short")
+        # y=2 is not on the curve
+        bad_vk_s = b"\x02" + b"\x00" * 31
+        self.failUnlessRaises(ValueError, raw.prepare, bad_vk_s)
+        self.failUnlessRaises(raw.BadSignatureError,
+                              raw.open, sig+msg, bad_vk_s)
+
+    def test_prepared_is_checked(self):
+        sk = ed25519.SigningKey(b"\x00" * 32)
+        vk_s = sk.get_verifying_key().to_bytes()
+        msg = b"hello world"
+        sig = sk.sign(msg)
+        # a forgery against the all-zero "point" (0,0)
+        self.failUnlessRaises(raw.BadSignatureError,
+                              raw.open, b"\x00" * 64 + msg, vk_s, b"\x00" * 64)
+        # real points, but not this key's: another key, the negated key,
+        # and the neutral element
+        other = ed25519.SigningKey(b"\x01" * 32).vk_s
+        negated = vk_s[:31] + int2byte(bytearray(vk_s)[31] ^ 0x80)
+        neutral = b"\x00" * 32 + b"\x01" + b"\x00" * 31
+        for prepared in (raw.prepare(other), raw.prepare(negated), neutral):
+            self.failUnlessRaises(raw.BadSignatureError,
+                                  raw.open, sig+msg, vk_s, prepared)
+
+    def test_lru(self):
+        cache = ed25519.PointCache(capacity=2)
+        vks = [ed25519.SigningKey(int2byte(i) * 32).vk_s for i in range(3)]
+        p0 = cache.lookup(vks[0])
+        self.failUnlessEqual(p0, raw.prepare(vks[0]))
+        self.failUnlessEqual(cache.lookup(vks[0]), p0)
+        cache.lookup(vks[1])
+        cache.lookup(vks[0]) # now vks[1] is the least recently used
+        cache.lookup(vks[2])
+        self.failUnlessEqual(cache.stats(),
+                             {"hits": 2, "misses": 3, "evictions": 1,
+                              "size": 2, "capacity": 2})
+        cache.lookup(vks[1])
+        self.failUnlessEqual(cache.stats()["misses"], 4)
+        self.failUnlessEqual(cache.lookup(b"\x02" + b"\x00" * 31), None)
+        cache.resize(1)
+        self.failUnlessEqual(cache.stats()["size"], 1)
+        self.failUnlessRaises(ValueError, cache.resize, -1)
+        self.failUnlessRaises(ValueError, ed25519.PointCache, -1)
+        cache.clear()
+        self.failUnlessEqual(cache.stats(),
+                             {"hits": 0, "misses": 0, "evictions": 0,
+                              "size": 0, "capacity": 1})
+        cache.resize(0)
+        cache.lookup(vks[0])
+        self.failUnlessEqual(cache.stats()["size"], 0)
+
+    def test_verifying_key(self):
+        sk, vk = ed25519.create_keypair()
+        sig = sk.sign(b"msg")
+        before = ed25519.point_cache.stats()
+        ed25519.VerifyingKey(vk.to_bytes()).verify(sig, b"msg")
+        ed25519.VerifyingKey(vk.to_bytes()).verify(sig, b"msg")
+        after = ed25519.point_cache.stats()
+        self.failUnlessEqual(after["misses"] - before["misses"], 1)
+        self.failUnlessEqual(after["hits"] - before["hits"], 1)
+        bad_vk = ed25519.VerifyingKey(b"\x02" + b"\x00" * 31)
+        self.failUnlessRaises(ed25519.BadSignatureError,
+                              bad_vk.verify, sig, b"msg")
+
+    def test_keyring(self):
+        import tempfile, shutil
+        from ed25519.keyring import Keyring, KeyringError
+        d = tempfile.mkdtemp()
+        try:
+            path = os.path.join(d, "keys")
+            sks = [ed25519.SigningKey(int2byte(i) * 32) for i in range(20)]
+            vks = [sk.vk_s for sk in sks]
+            bad_vk_s = b"\x02" + b"\x00" * 31
+            self.failUnlessRaises(KeyringError, Keyring.build, path,
+                                  vks + [bad_vk_s])
+            # duplicates are stored once, VerifyingKeys work too
+            keys = vks + vks[:5] + [sks[0].get_verifying_key(), bad_vk_s]
+            with Keyring.build(path, keys, skip_invalid=True) as kr:
+                self.failUnlessEqual(len(kr), 20)
+                self.failUnlessEqual(list(kr), vks)
+                for vk_s in vks:
+                    self.failUnless(vk_s in kr)
+                    self.failUnlessEqual(kr.lookup(vk_s), raw.prepare(vk_s))
+                self.failIf(bad_vk_s in kr)
+                self.failUnlessEqual(kr.lookup(bad_vk_s), None)
+                self.failUnlessEqual(kr.lookup(b"short"), None)
+                kr.check()
+
+            kr = Keyring(path)
+            cache = ed25519.PointCache(capacity=2, keyring=kr)
+            other = ed25519.SigningKey(b"\xff" * 32).vk_s
+            self.failUnlessEqual(cache.lookup(vks[3]), raw.prepare(vks[3]))
+            self.failUnlessEqual(cache.lookup(other), raw.prepare(other))
+            self.failUnlessEqual(cache.stats(),
+                                 {"hits": 1, "misses": 1, "evictions": 0,
+                                  "size": 1, "capacity": 2})
+            kr.close()
+
+            with open(path, "rb") as f:
+                data = f.read()
+            # a tampered point
+            with open(path, "wb") as f:
+                f.write(data[:-1] + int2byte(ord(data[-1:]) ^ 1))
+            with Keyring(path) as kr:
+                self.failUnlessRaises(KeyringError, kr.check)
+            with open(path, "wb") as f:
+                f.write(data[:-1])
+            self.failUnlessRaises(KeyringError, Keyring, path)
+            with open(path, "wb") as f:
+                f.write(b"not a keyring" + data[13:])
+            self.failUnlessRaises(KeyringError, Keyring, path)
+            # a corrupt index: too few buckets, none empty, or a slot past
+            # the last entry
+            from ed25519 import keyring
+            header = list(keyring._HEADER.unpack_from(data))
+            buckets, index = header[4], header[5]
+            header[4] = 16
+            with open(path, "wb") as f:
+                f.write(keyring._HEADER.pack(*header) + data[64:])
+            self.failUnlessRaises(KeyringError, Keyring, path)
+            for slot in (1, 21):
+                with open(path, "wb") as f:
+                    f.write(data[:index] + keyring._SLOT.pack(slot) * buckets
+                            + data[index + 4 * buckets:])
+                with Keyring(path) as kr:
+                    self.failUnlessRaises(KeyringError, kr.lookup, other)
+                    self.failUnlessRaises(KeyringError, kr.check)
+            with Keyring.build(path, []) as kr:
+                self.failUnlessEqual(len(kr), 0)
+                self.failUnlessEqual(kr.lookup(vks[0]), None)
+        finally:
+            shutil.rmtree(d)
+
+
+class VerificationCache(unittest.TestCase):
+    def test_cache(self):
+        sk, vk = ed25519.create_keypair()
+        sig = sk.sign(b"msg")
+        cache = ed25519.VerificationCache(maxsize=2)
+        vk.verify(sig, b"msg", cache=cache)
+        vk.verify(sig, b"msg", cache=cache)
+        stats = cache.stats()
+        self.failUnlessEqual((stats["hits"], stats["misses"], stats["size"]),
+                             (1, 1, 1))
+        self.failUnlessEqual(stats["hit_rate"], 0.5)
+        self.failUnless(stats["saved_seconds"] > 0, stats)
+        # bad signatures are never remembered
+        for i in range(2):
+            self.failUnlessRaises(ed25519.BadSignatureError,
+                                  vk.verify, sig, b"NOT msg", cache=cache)
+        self.failUnlessEqual(cache.stats()["size"], 1)
+        # LRU eviction
+        vk.verify(sk.sign(b"m2"), b"m2", cache=cache)
+        vk.verify(sk.sign(b"m3"), b"m3", cache=cache)
+        stats = cache.stats()
+        self.failUnlessEqual((stats["size"], stats["evictions"]), (2, 1))
+        cache.clear()
+        self.failUnlessEqual(cache.stats()["size"], 0)
+
+    def test_ttl(self):
+        sk, vk = ed25519.create_keypair()
+        sig = sk.sign(b"msg")
+        cache = ed25519.VerificationCache(ttl=0)
+        vk.verify(sig, b"msg", cache=cache)
+        time.sleep(0.01)
+        vk.verify(sig, b"msg", cache=cache)
+        stats = cache.stats()
+        self.failUnlessEqual((stats["hits"], stats["expirations"]), (0, 1))
+
+
+class Parallel(unittest.TestCase):
+    def make_items(self, count):
+        sk, vk = ed25519.create_keypair()
+        items = []
+        for i in range(count):
+            msg = b"msg %d" % i
+            items.append((vk, sk.sign(msg), msg))
+        return items
+
+    def test_verify_many(self):
+        items = self.make_items(10)
+        sigs = b"".join(sig for (vk, sig, msg) in items)
+        keys = b"".join(vk.to_bytes() for (vk, sig, msg) in items)
+        msgs = b"".join(msg for (vk, sig, msg) in items)
+        offsets = array.array("q", [0])
+        for (vk, sig, msg) in items:
+            offsets.append(offsets[-1] + len(msg))
+        results = bytearray(10)
+        self.failUnlessEqual(raw.verify_many(sigs, keys, msgs, offsets,
+                                             results), 10)
+        self.failUnlessEqual(results, bytearray(b"\x01" * 10))
+        bad_sigs = flip_bit(sigs, in_byte=3*64)
+        self.failUnlessEqual(raw.verify_many(bad_sigs, keys, msgs, offsets,
+                                             results), 9)
+        self.failUnlessEqual(results[3], 0)
+        self.failUnlessRaises(ValueError, raw.verify_many,
+                              sigs, keys[:-1], msgs, offsets, results)
+        self.failUnlessRaises(ValueError, raw.verify_many,
+                              sigs, keys, msgs[:-1], offsets, results)
+        self.failUnlessRaises(ValueError, raw.verify_many,
+                              sigs, keys, msgs, offsets, bytearray(9))
+
+    def test_process_pool(self):
+        try:
+            from ed25519 import parallel
+        except ImportError:
+            raise unittest.SkipTest("needs multiprocessing.shared_memory")
+        items = self.make_items(20)
+        vk, sig, msg = items[7]
+        items[7] = (vk, sig, msg + b" NOT!")
+        expected = [True] * 20
+        expected[7] = False
+        self.failUnlessEqual(parallel.verify_many(items, workers=2,
+                                                  chunksize=3), expected)
+        self.failUnlessEqual(parallel.verify_many([], workers=1), [])
+
+
+class Executor(unittest.TestCase):
+    def test_executor(self):
+        sk, vk = ed25519.create_keypair()
+        msgs = [b"msg %d" % i for i in range(50)] + [b"x" * 100000]
+        cache = ed25519.VerificationCache()
+        with ed25519.Executor(threads=3, max_batch=8, large_message=1000,
+                              cache=cache) as ex:
+            sig_fs = [ex.submit_sign(sk, msg) for msg in msgs]
+            sigs = [f.result() for f in sig_fs]
+            self.failUnlessEqual(sigs, [sk.sign(msg) for msg in msgs])
+            verify_fs = [ex.submit_verify(vk, sig, msg)
+                         for (sig, msg) in zip(sigs, msgs)]
+            bad_f = ex.submit_verify(vk.to_bytes(), sigs[0], b"NOT msg")
+            self.failUnlessEqual([f.result() for f in verify_fs],
+                                 [None] * len(msgs))
+            self.failUnlessRaises(ed25519.BadSignatureError, bad_f.result)
+            # the second time around, the cache answers
+            ex.submit_verify(vk, sigs[1], msgs[1]).result()
+            self.failUnlessEqual(cache.stats()["hits"], 1)
+            self.failUnlessRaises(ValueError, ex.submit_sign, b"short", b"")
+        self.failUnlessRaises(RuntimeError, ex.submit_sign, sk, b"late")
+
+
+class Batch(unittest.TestCase):
+    def make_items(self, count, bad=()):
+        items = []
+        for i in range(count):
+            sk, vk = ed25519.create_keypair()
+            msg = b"msg %d" % i
+            sig = sk.sign(msg)
+            if i in bad:
+                msg += b" NOT!"
+            items.append((vk, sig, msg))
+        return items
+
+    def secret_scalar(self, seed):
+        import hashlib
+        a = bytearray(hashlib.sha512(seed).digest()[:32])
+        a[0] &= 248
+        a[31] &= 127
+        a[31] |= 64
+        return ed25519.Scalar(bytes(a))
+
+    def torsion_sig(self, seed, msg):
+        # a signature by SigningKey(seed) whose R has a point of order 2
+        # added: [s]B - [h]A is R minus that point, so verify() rejects it,
+        # but a random combination that gives it an even z does not see
+        # the difference
+        import hashlib
+        from ed25519 import Point, Scalar
+        vk_s = ed25519.SigningKey(seed).vk_s
+        r = Scalar(os.urandom(64))
+        R = Point.mul_base(r) + Point(b"\xec" + b"\xff" * 30 + b"\x7f")
+        R = R.to_bytes()
+        h = Scalar(hashlib.sha512(R + vk_s + msg).digest())
+        return R + (r + h * self.secret_scalar(seed)).to_bytes()
+
+    def mixed_order_key(self):
+        # a key with a point of order 2 added: its signatures pass verify()
+        # when h is even, which mixed_order_sig() arranges
+        from ed25519 import Point, Scalar
+        a = Scalar(os.urandom(64))
+        A = Point.mul_base(a) + Point(b"\xec" + b"\xff" * 30 + b"\x7f")
+        return a, ed25519.VerifyingKey(A.to_bytes())
+
+    def mixed_order_sig(self, a, vk, msg):
+        import hashlib
+        from ed25519 import Point, Scalar
+        while True:
+            r = Scalar(os.urandom(64))
+            R = Point.mul_base(r).to_bytes()
+            h = Scalar(hashlib.sha512(R + vk.vk_s + msg).digest())
+            if not bytearray(h.to_bytes())[0] & 1:
+                return R + (r + h * a).to_bytes()
+
+    def test_mixed_order_key(self):
+        # the batch reduces each z_i*h_i mod L, which leaves a small-order
+        # remainder from such a key behind; that must not fail the batch
+        a, vk = self.mixed_order_key()
+        msgs = [b"entry %d" % i for i in range(200)]
+        items = [(vk, self.mixed_order_sig(a, vk, msg), msg) for msg in msgs]
+        sk, other_vk = ed25519.create_keypair()
+        for i in range(1, 200, 2): # the A terms are not merged
+            items[i] = (other_vk, sk.sign(msgs[i]), msgs[i])
+        sigs, keys, msg_buf, offsets = ed25519.batch.pack(items)
+        self.failUnless(raw.verify_batch(sigs, keys, msg_buf, offsets,
+                                         os.urandom(32*200)))
+        items[6] = (vk, items[6][1], b"other")
+        sigs, keys, msg_buf, offsets = ed25519.batch.pack(items)
+        single = bytearray(200)
+        self.failUnlessEqual(raw.verify_many(sigs, keys, msg_buf, offsets,
+                                             single), 199)
+        results = bytearray(200)
+        raw.verify_batch_items(sigs, keys, msg_buf, offsets,
+                               os.urandom(32*200), results, 4)
+        self.failUnlessEqual(results, single)
+
+    def test_small_order_components(self):
+        import hashlib
+        # enough signatures for the C code to check them as a batch
+        seed = b"\x03" * 32
+        sk = ed25519.SigningKey(seed)
+        vk = sk.get_verifying_key()
+        msgs = [b"entry %d" % i for i in range(200)]
+        items = [(vk, sk.sign(msg), msg) for msg in msgs]
+        bad = (0, 50, 100, 150, 199)
+        for i in bad[1:]:
+            items[i] = (vk, self.torsion_sig(seed, msgs[i]), msgs[i])
+        # R is the neutral element, but encoded with the sign bit set on
+        # x=0, so it is not the encoding verify() computes
+        R = b"\x01" + b"\x00" * 30 + b"\x80"
+        h = ed25519.Scalar(hashlib.sha512(R + vk.to_bytes() + msgs[0])
+                           .digest())
+        items[0] = (vk, R + (h * self.secret_scalar(seed)).to_bytes(),
+                    msgs[0])
+        for i in bad:
+            self.failUnlessRaises(ed25519.BadSignatureError,
+                                  vk.verify, items[i][1], msgs[i])
+        expected = [i not in bad for i in range(200)]
+        sigs, keys, msg_buf, offsets = ed25519.batch.pack(items)
+        cache = ed25519.VerificationCache()
+        # a cofactorless check would pass the four order-2 ones with
+        # probability 1/16 each time
+        for attempt in range(3):
+            self.failIf(raw.verify_batch(sigs, keys, msg_buf, offsets,
+                                         os.urandom(32*200)))
+            self.failUnlessEqual(ed25519.verify_batch(items, cache),
+                                 expected)
+        for i in bad:
+            self.failIf(cache.check(cache.key(vk.to_bytes(), items[i][1],
+                                              msgs[i])))
+
+    def test_small_order_localized(self):
+        # the batch picks out exactly the signatures verify() rejects,
+        # whether it finds a few with small-order parts, or (more than 1 in
+        # 32) enough to check each one on its own. Every other signature
+        # is by a mixed-order key, which must not upset the bisection.
+        seed = b"\x04" * 32
+        sk = ed25519.SigningKey(seed)
+        vk = sk.get_verifying_key()
+        a, mixed_vk = self.mixed_order_key()
+        msgs = [b"entry %d" % i for i in range(300)]
+        items = [(vk, sk.sign(msg), msg) if i % 2 else
+                 (mixed_vk, self.mixed_order_sig(a, mixed_vk, msg), msg)
+                 for i, msg in enumerate(msgs)]
+        for nbad in (2, 12):
+            tweaked = list(items)
+            for i in range(7, 300, 300 // nbad):
+                tweaked[i] = (vk, self.torsion_sig(seed, msgs[i]), msgs[i])
+            tweaked[5] = (vk, items[5][1], b"NOT " + msgs[5])
+            sigs, keys, msg_buf, offsets = ed25519.batch.pack(tweaked)
+            single = bytearray(300)
+            self.failUnlessEqual(raw.verify_many(sigs, keys, msg_buf, offsets,
+                                                 single), 300 - nbad - 1)
+            results = bytearray(300)
+            raw.verify_batch_items(sigs, keys, msg_buf, offsets,
+                                   os.urandom(32*300), results, 4)
+            self.failUnlessEqual(results, single)
+
+    def test_raw(self):
+        items = self.make_items(10)
+        sigs, keys, msgs, offsets = ed25519.batch.pack(items)
+        self.failUnless(raw.verify_batch(sigs, keys, msgs, offsets,
+                                         b"\x55" * 320))
+        self.failIf(raw.verify_batch(flip_bit(sigs, in_byte=70),
+                                     keys, msgs, offsets, b"\x55" * 320))
+        self.failIf(raw.verify_batch(sigs, flip_bit(keys, in_byte=40),
+                                     msgs, offsets, b"\x55" * 320))
+        self.failUnlessRaises(ValueError, raw.verify_batch,
+                              sigs, keys, msgs, offsets, b"\x55" * 300)
+        self.failUnless(raw.verify_batch(b"", b"", b"", offsets[:1], b""))
+
+    def test_raw_items(self):
+        bad = (0, 5, 6, 17, 30)
+        items = self.make_items(31, bad)
+        sigs, keys, msgs, offsets = ed25519.batch.pack(items)
+        expected = bytearray([i not in bad for i in range(31)])
+        for threshold in (1, 2, 4, 31, 100):
+            results = bytearray(b"\xff" * 32)
+            good = raw.verify_batch_items(sigs, keys, msgs, offsets,
+                                          os.urandom(32*31), results,
+                                          threshold)
+            self.failUnlessEqual(good, 26)
+            self.failUnlessEqual(results, expected + b"\xff")
+        # a key that does not decode only rejects its own signature
+        keys = keys[:32*9] + b"\xff" * 32 + keys[32*10:]
+        expected[9] = 0
+        results = bytearray(31)
+        self.failUnlessEqual(raw.verify_batch_items(sigs, keys, msgs, offsets,
+                                                    os.urandom(32*31),
+                                                    results, 4), 25)
+        self.failUnlessEqual(results, expected)
+        self.failUnlessRaises(ValueError, raw.verify_batch_items,
+                              sigs, keys, msgs, offsets, os.urandom(32*31),
+                              bytearray(30), 4)
+        self.failUnlessRaises(ValueError, raw.verify_batch_items,
+                              sigs, keys, msgs, offsets, os.urandom(32*31),
+                              results, 0)
+
+    def test_verify_batch(self):
+        for count, bad in [(0, ()), (1, ()), (1, (0,)), (10, ()),
+                           (10, (3,)), (20, (0, 7, 8, 19)),
+                           (70, (65,))]:
+            items = self.make_items(count, bad)
+            expected = [i not in bad for i in range(count)]
+            self.failUnlessEqual(ed25519.verify_batch(items), expected)
+
+    def test_single_signer(self):
+        sk, vk = ed25519.create_keypair()
+        other_sk, other_vk = ed25519.create_keypair()
+        msgs = [b"entry %d" % i for i in range(40)]
+        items = [(vk, sk.sign(msg), msg) for msg in msgs]
+        sigs, keys, msg_buf, offsets = ed25519.batch.pack(items)
+        self.failUnless(raw.verify_batch(sigs, keys, msg_buf, offsets,
+                                         os.urandom(32*40)))
+        self.failIf(raw.verify_batch(flip_bit(sigs, in_byte=64*7+40), keys,
+                                     msg_buf, offsets, os.urandom(32*40)))
+        # bad signatures, a break in the run, and undecodable keys and R
+        bad = (3, 20, 21, 22, 39)
+        bad_sig = b"\xff" * 32 + sigs[64*22+32:64*23]
+        sigs = (sigs[:64*3] + flip_bit(sigs[64*3:64*4], in_byte=40)
+                + sigs[64*4:64*22] + bad_sig + sigs[64*23:])
+        keys = (keys[:32*20] + other_vk.to_bytes() + b"\xff" * 32
+                + keys[32*22:32*39] + other_vk.to_bytes())
+        expected = bytearray([i not in bad for i in range(40)])
+        for threshold in (1, 4, 100):
+            results = bytearray(40)
+            self.failUnlessEqual(raw.verify_batch_items(sigs, keys, msg_buf,
+                                                        offsets,
+                                                        os.urandom(32*40),
+                                                        results, threshold),
+                                 35)
+            self.failUnlessEqual(results, expected)
+        self.failUnlessEqual(ed25519.verify_arrays(sigs[:64*20], vk,
+                                                   msg_buf, offsets[:21]),
+                             expected[:20])
+        # one run from a mixed-order key, whose merged A scalar is reduced
+        # mod L, is still good as a whole
+        a, vk = self.mixed_order_key()
+        msgs = [b"entry %d" % i for i in range(170)]
+        items = [(vk, self.mixed_order_sig(a, vk, msg), msg) for msg in msgs]
+        sigs, keys, msg_buf, offsets = ed25519.batch.pack(items)
+        self.failUnless(raw.verify_batch(sigs, keys, msg_buf, offsets,
+                                         os.urandom(32*170)))
+        self.failUnlessEqual(ed25519.verify_arrays(sigs, vk, msg_buf, offsets),
+                             bytearray(b"\x01" * 170))
+
+    def test_key_order(self):
+        key_order = ed25519.batch.key_order
+        self.failUnlessEqual(key_order([]), None)
+        self.failUnlessEqual(key_order([b"a", b"a", b"b"]), None)
+        self.failUnlessEqual(key_order([b"a", b"b", b"c"]), None)
+        self.failUnlessEqual(key_order([b"b", b"a", b"b", b"a"]),
+                             [1, 3, 0, 2])
+        # mixed batches come back in their original order
+        signers = [ed25519.create_keypair() for i in range(3)]
+        items = []
+        for i in range(30):
+            sk, vk = signers[i % 3]
+            msg = b"msg %d" % i
+            items.append((vk, sk.sign(msg), msg + (b" NOT!" if i == 4 else b"")))
+        expected = [i != 4 for i in range(30)]
+        self.failUnlessEqual(ed25519.verify_batch(items), expected)
+        self.failUnlessEqual(ed25519.verify_batch(items,
+                                                  ed25519.VerificationCache()),
+                             expected)
+
+    def test_decompress_many(self):
+        signers = [ed25519.create_keypair() for i in range(6)]
+        keys = [vk.to_bytes() for sk, vk in signers]
+        keys[2] = b"\x02" + b"\x00" * 31 # not on the curve
+        prepared, invalid = ed25519.decompress_many(keys)
+        self.failUnlessEqual(invalid, [2])
+        self.failUnlessEqual(len(prepared), 64 * 6)
+        self.failUnlessEqual(prepared[128:192], bytearray(64))
+        for i in (0, 1, 3, 5):
+            self.failUnlessEqual(bytes(prepared[64*i:64*i+64]),
+                                 raw.prepare(keys[i]))
+        # split among threads, from a packed buffer
+        threshold = ed25519.batch.THREAD_KEYS
+        ed25519.batch.THREAD_KEYS = 2
+        try:
+            self.failUnlessEqual(
+                ed25519.decompress_many(bytearray(b"".join(keys)), threads=3),
+                (prepared, invalid))
+        finally:
+            ed25519.batch.THREAD_KEYS = threshold
+        self.failUnlessEqual(ed25519.decompress_many([]), (bytearray(), []))
+        self.failUnlessRaises(ValueError, ed25519.decompress_many, b"\x00")
+
+        # the prepared points stand in for the keys, in the batch verifier
+        # and in VerifyingKey
+        del signers[2], keys[2]
+        prepared = prepared[:128] + prepared[192:]
+        msgs = [b"msg %d" % i for i in range(5)]
+        sigs = b"".join(sk.sign(msg) for (sk, vk), msg in zip(signers, msgs))
+        msg_buf, offsets = ed25519.batch.pack_messages(msgs)
+        self.failUnlessEqual(ed25519.verify_arrays(sigs, b"".join(keys),
+                                                   msg_buf, offsets,
+                                                   prepared=prepared),
+                             bytearray(b"\x01" * 5))
+        vks = [ed25519.VerifyingKey(vk_s, prepared=prepared[64*i:64*i+64])
+               for i, vk_s in enumerate(keys)]
+        items = [(vk, sigs[64*i:64*i+64], msgs[i])
+                 for i, vk in enumerate(vks)]
+        items[3] = (vks[3], items[3][1], b"other")
+        self.failUnlessEqual(ed25519.verify_batch(items),
+                             [True, True, True, False, True])
+        vks[0].verify(sigs[:64], msgs[0])
+        self.failUnlessRaises(ValueError, raw.verify_batch, sigs,
+                              b"".join(keys), msg_buf, offsets,
+                              os.urandom(32 * 5), prepared[:-1])
+
+    def test_forged_prepared(self):
+        # a signature of zeros "verifies" against the point (0,0), which is
+        # not on the curve: each entry of 'prepared' must match its key
+        for n in (5, 200):
+            signers = [ed25519.create_keypair() for i in range(n)]
+            keys = [vk.to_bytes() for sk, vk in signers]
+            msgs = [b"msg %d" % i for i in range(n)]
+            sigs = [sk.sign(msg) for (sk, vk), msg in zip(signers, msgs)]
+            prepared = [raw.prepare(vk_s) for vk_s in keys]
+            sigs[2], prepared[2] = b"\x00" * 64, b"\x00" * 64
+            sigs, keys, prepared = (b"".join(sigs), b"".join(keys),
+                                    b"".join(prepared))
+            msg_buf, offsets = ed25519.batch.pack_messages(msgs)
+            expected = bytearray(b"\x01" * n)
+            expected[2] = 0
+            self.failUnlessEqual(ed25519.verify_arrays(sigs, keys, msg_buf,
+                                                       offsets,
+                                                       prepared=prepared),
+                                 expected)
+            self.failIf(raw.verify_batch(sigs, keys, msg_buf, offsets,
+                                         os.urandom(32 * n), prepared))
+        vk_s = keys[-32:]
+        raw.check_prepared(vk_s, prepared[-64:])
+        for bad in (b"\x00" * 64, prepared[:64]):
+            self.failUnlessRaises(ValueError, raw.check_prepared, vk_s, bad)
+            self.failUnlessRaises(ValueError, ed25519.VerifyingKey, vk_s,
+                                  prepared=bad)
+
+    def test_validate_keys(self):
+        from ed25519 import Point, Scalar
+        batch = ed25519.batch
+        order_8 = Point(unhexlify("26e8958fc2b227b045c3f489f2ef98f0"
+                                  "d5dfac05d3c63339b13802886d53fc05"))
+        # enough keys for the batched subgroup check, in the C backend
+        count = 300 if ed25519.backend == "c" else 12
+        keys = [ed25519.SigningKey(os.urandom(32)).vk_s for i in range(count)]
+        expected = bytearray(count)
+        def bad(i, key, flags):
+            keys[i] = key
+            expected[i] = flags
+        bad(1, (Point(keys[1]) + order_8).to_bytes(), batch.KEY_MIXED_ORDER)
+        bad(count - 1, (Point(keys[-1]) - order_8 - order_8).to_bytes(),
+            batch.KEY_MIXED_ORDER)
+        bad(2, (order_8 + order_8).to_bytes(), batch.KEY_SMALL_ORDER)
+        # the neutral element, with y = p + 1
+        bad(3, unhexlify("%064x" % (2**255 - 18))[::-1],
+            batch.KEY_NONCANONICAL | batch.KEY_SMALL_ORDER)
+        bad(4, b"\x02" + b"\x00" * 31, batch.KEY_NOT_ON_CURVE)
+        # a negative zero x
+        bad(5, unhexlify("%064x" % (2**255 + 1))[::-1],
+            batch.KEY_NONCANONICAL | batch.KEY_SMALL_ORDER)
+        self.failUnlessEqual(ed25519.validate_keys(keys), expected)
+        unchecked = bytearray(expected)
+        unchecked[1] = unchecked[-1] = 0
+        self.failUnlessEqual(ed25519.validate_keys(b"".join(keys),
+                                                   check_subgroup=False),
+                             unchecked)
+        # split among threads
+        limits = batch.THREAD_KEYS, batch.VALIDATE_KEYS
+        batch.THREAD_KEYS = batch.VALIDATE_KEYS = 5
+        try:
+            self.failUnlessEqual(ed25519.validate_keys(
+                [ed25519.VerifyingKey(key) for key in keys], threads=2),
+                                 expected)
+        finally:
+            batch.THREAD_KEYS, batch.VALIDATE_KEYS = limits
+        self.failUnlessEqual(ed25519.validate_keys([]), bytearray())
+        self.failUnlessRaises(ValueError, raw.validate_keys, b"".join(keys),
+                              bytearray(count), b"\x00" * 16 * count)
+
+    def test_stream(self):
+        import itertools
+        sk, vk = ed25519.create_keypair()
+        reads = []
+        def records():
+            for i in itertools.count():
+                reads.append(i)
+                yield b"record %d" % i
+        # endless input is only read a few batches ahead
+        sigs = sk.sign_stream(records(), batch_size=10, threads=2)
+        first = list(itertools.islice(sigs, 25))
+        sigs.close()
+        self.failUnlessEqual(first, [sk.sign(b"record %d" % i)
+                                     for i in range(25)])
+        self.failUnlessEqual(len(reads), 50)
+
+        items = [(vk, sig, b"record %d" % i) for i, sig in enumerate(first)]
+        items[7] = (vk.to_bytes(), items[7][1], b"other")
+        cache = ed25519.VerificationCache()
+        self.failUnlessEqual(list(ed25519.verify_stream(iter(items), 4,
+                                                        cache=cache)),
+                             [i != 7 for i in range(25)])
+        self.failUnlessEqual(list(ed25519.verify_stream(items, threads=3)),
+                             [i != 7 for i in range(25)])
+        self.failUnlessEqual(list(ed25519.verify_stream([])), [])
+        results = ed25519.verify_stream(items[:4] + [(vk, b"short", b"")], 4)
+        self.failUnlessEqual([next(results) for i in range(4)], [True] * 4)
+        self.failUnlessRaises(ValueError, next, results)
+
+    def test_arrays(self):
+        sk, vk = ed25519.create_keypair()
+        msgs = [b"msg %d" % i for i in range(11)]
+        msg_buf, offsets = ed25519.batch.pack_messages(msgs)
+        sigs = ed25519.sign_arrays(sk, msg_buf, offsets)
+        self.failUnlessEqual(bytes(sigs),
+                             b"".join([sk.sign(msg) for msg in msgs]))
+        out = bytearray(64 * 11)
+        ed25519.sign_arrays(sk.to_bytes() * 11, bytearray(msg_buf),
+                            offsets[:-1], out)
+        self.failUnlessEqual(out, sigs)
+
+        keys = vk.to_bytes() * 11
+        sigs[64*9] ^= 0x01
+        results = ed25519.verify_arrays(memoryview(sigs), keys, msg_buf,
+                                        offsets)
+        self.failUnlessEqual(results, bytearray(b"\x01" * 9 + b"\x00\x01"))
+        bitmap = ed25519.verify_arrays(sigs, keys, msg_buf, offsets[:-1],
+                                       bitmap=True)
+        self.failUnlessEqual(bitmap, bytearray(b"\xff\x05"))
+        # two-dimensional buffers are fine too
+        sigs_2d = memoryview(bytes(sigs)).cast("B", (11, 64))
+        self.failUnlessEqual(ed25519.verify_arrays(sigs_2d, keys, msg_buf,
+                                                   offsets), results)
+        self.failUnlessRaises(ValueError, ed25519.verify_arrays,
+                              sigs, keys[:-1], msg_buf, offsets)
+        # every array must hold N entries, even where the extra ones would
+        # never be looked at
+        for args in [(sigs + b"xx", keys, msg_buf, offsets),
+                     (sigs[:64*2], vk.to_bytes() * 5, msg_buf, offsets[:3]),
+                     (sigs, keys + keys[:32], msg_buf, offsets),
+                     (sigs, keys, msg_buf, offsets[:5])]:
+            self.failUnlessRaises(ValueError, ed25519.verify_arrays, *args)
+        self.failUnlessRaises(ValueError, ed25519.verify_arrays,
+                              sigs, keys, msg_buf, offsets,
+                              prepared=b"\x00" * 64 * 12)
+        self.failUnlessRaises(ValueError, ed25519.batch.verify_packed,
+                              sigs, keys, msg_buf, offsets, bytearray(10))
+
+    def test_cache(self):
+        items = self.make_items(6, bad=(2,))
+        cache = ed25519.VerificationCache()
+        expected = [True, True, False, True, True, True]
+        self.failUnlessEqual(ed25519.verify_batch(items, cache), expected)
+        self.failUnlessEqual(ed25519.verify_batch(items, cache), expected)
+        self.failUnlessEqual(cache.stats()["hits"], 5)
+
+    def test_packed_batch(self):
+        import pickle
+        items = self.make_items(5, bad=(3,))
+        batch = ed25519.PackedBatch.from_items(items)
+        self.failUnlessEqual(len(batch), 5)
+        expected = bytearray([1, 1, 1, 0, 1])
+        self.failUnlessEqual(batch.verify(), expected)
+        self.failUnlessEqual(batch.verify(bitmap=True), bytearray([0x17]))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            batch2 = pickle.loads(pickle.dumps(batch, protocol))
+            self.failUnlessEqual(batch2.verify(), expected)
+        if pickle.HIGHEST_PROTOCOL >= 5:
+            buffers = []
+            data = pickle.dumps(batch, 5, buffer_callback=buffers.append)
+            self.failUnlessEqual(len(buffers), 4)
+            self.failIf(batch.msgs in data)
+            batch2 = pickle.loads(data, buffers=buffers)
+            self.failUnlessEqual(batch2.verify(), expected)
+
+    def test_aio(self):
+        try:
+            import asyncio
+            from ed25519 import aio
+        except (ImportError, SyntaxError):
+            raise unittest.SkipTest("needs asyncio")
+        items = self.make_items(12, bad=(4,))
+        verifier = aio.Verifier(max_batch=5, window=0.001)
+        async def check(vk, sig, msg):
+            try:
+                await verifier.verify(vk, sig, msg)
+                return True
+            except ed25519.BadSignatureError:
+                return False
+        async def main():
+            return await asyncio.gather(*[check(*item) for item in items])
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        self.failUnlessEqual(results, [i != 4 for i in range(12)])
+
+
+class Codec(unittest.TestCase):
+    def test_encodings(self):
+        import base64
+        for length in range(70):
+            data = os.urandom(length)
+            for encoding, expected in [
+                ("base64", base64.b64encode(data).rstrip(b"=")),
+                ("base32", base64.b32encode(data).rstrip(b"=").lower()),
+                ("base16", base64.b16encode(data).lower()),
+                ("hex", base64.b16encode(data).lower())]:
+                codec = ed25519.Codec("p-", encoding)
+                self.failUnlessEqual(codec.encode(data), b"p-" + expected)
+                self.failUnlessEqual(codec.decode(b"p-" + expected), data)
+                if encoding != "base64":
+                    # either case is accepted
+                    self.failUnlessEqual(codec.decode(b"p-" + expected.upper()),
+                                         data)
+                self.failUnlessEqual(ed25519.to_ascii(data, "p-", encoding),
+                                     b"p-" + expected)
+                self.failUnlessEqual(ed25519.from_ascii(
+                    "p-" + expected.decode("ascii") + "\n", "p-", encoding),
+                                     data)
+        # padding is ignored
+        self.failUnlessEqual(ed25519.Codec().decode("aGk="), b"hi")
+
+    def test_errors(self):
+        codec = ed25519.Codec("sig0-", "base32")
+        self.failUnlessRaises(ed25519.BadPrefixError, codec.decode, b"abc")
+        self.failUnlessRaises(ed25519.BadPrefixError, codec.decode, b"sig")
+        self.failUnlessRaises(ValueError, codec.decode, b"sig0-ab1")
+        self.failUnlessRaises(ValueError, codec.decode, b"sig0-abc")
+        self.failUnlessRaises(ValueError, ed25519.Codec().decode, b"abcde")
+        self.failUnlessRaises(ValueError, ed25519.Codec().decode, b"ab-c")
+        self.failUnlessRaises(ValueError, ed25519.Codec("", "hex").decode,
+                              b"abc")
+        self.failUnlessRaises(NotImplementedError, ed25519.Codec, "",
+                              "base58")
+        self.failUnlessRaises(NotImplementedError, ed25519.to_ascii, b"",
+                              "", "base58")
+
+    def test_many(self):
+        codec = ed25519.Codec("sig0-", "base32")
+        sigs = os.urandom(64*5)
+        strings = codec.encode_many(sigs, 64)
+        self.failUnlessEqual(strings, [codec.encode(sigs[64*i:64*i+64])
+                                       for i in range(5)])
+        self.failUnlessEqual(codec.decode_many(strings, 64), sigs)
+        self.failUnlessEqual(codec.decode_many([s.decode("ascii")
+                                                for s in strings], 64), sigs)
+        self.failUnlessEqual(codec.encode_many(b"", 64), [])
+        self.failUnlessEqual(codec.decode_many([], 64), b"")
+        self.failUnlessRaises(ValueError, codec.encode_many, sigs[:-1], 64)
+        self.failUnlessRaises(ValueError, codec.decode_many,
+                              strings[:2] + [strings[2][:-2]], 64)
+        self.failUnlessRaises(ValueError, codec.decode_many,
+                              strings[:2] + [strings[2] + b"aaaaaaaa"], 64)
+        self.failUnlessRaises(ed25519.BadPrefixError, codec.decode_many,
+                              strings[:2] + [strings[2][1:]], 64)
+
+    def test_sign_verify(self):
+        sk, vk = ed25519.create_keypair()
+        codec = ed25519.Codec("sig0-", "base32")
+        sig = codec.sign_encoded(sk, b"hello")
+        self.failUnlessEqual(sig, sk.sign(b"hello", "sig0-", "base32"))
+        self.failUnlessEqual(codec.sign_encoded(sk.to_bytes(), b"hello"), sig)
+        codec.verify_encoded(vk, sig, b"hello")
+        codec.verify_encoded(vk.to_bytes(), sig.decode("ascii"), b"hello")
+        self.failUnlessRaises(ed25519.BadSignatureError,
+                              codec.verify_encoded, vk, sig, b"hellO")
+        self.failUnlessRaises(ed25519.BadPrefixError,
+                              codec.verify_encoded, vk, sig[1:], b"hello")
+        # well encoded, but not 64 bytes
+        raw_sig = codec.decode(sig)
+        for wrong in (raw_sig[:63], raw_sig + b"\x00"):
+            self.failUnlessRaises(ed25519.BadSignatureError,
+                                  codec.verify_encoded, vk,
+                                  codec.encode(wrong), b"hello")
+
+EDSIG = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(ed25519.__file__)))), "bin", "edsig")
+
+@unittest.skipUnless(os.path.exists(EDSIG), "needs a source tree")
+class Edsig(unittest.TestCase):
+    def edsig(self, *args):
+        import subprocess
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(ed25519.__file__))
+        p = subprocess.Popen([sys.executable, EDSIG] + list(args), env=env,
+                             cwd=self.d, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        out, err = p.communicate()
+        return p.returncode, out.decode("ascii"), err.decode("ascii")
+
+    def setUp(self):
+        import tempfile
+        self.d = tempfile.mkdtemp()
+        self.files = []
+        for i in range(5):
+            name = "file%d" % i
+            with open(os.path.join(self.d, name), "wb") as f:
+                f.write(os.urandom(100 * i))
+            self.files.append(name)
+        self.failUnlessEqual(self.edsig("generate")[0], 0)
+        rc, out, err = self.edsig("sign-many", "-j", "2", "signing.key",
+                                  "manifest", *self.files)
+        self.failUnlessEqual(rc, 0, err)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.d)
+
+    def verify(self):
+        return self.edsig("verify-manifest", "-j", "2", "verifying.key",
+                          "manifest")
+
+    def test_round_trip(self):
+        rc, out, err = self.verify()
+        self.failUnlessEqual((rc, out), (0, "5 good signatures!\n"), err)
+        # the lines are what 'edsig sign' prints
+        with open(os.path.join(self.d, "manifest")) as f:
+            sig, name = f.readline().split()
+        rc, out, err = self.edsig("sign", "signing.key", name)
+        self.failUnlessEqual(out, sig + "\n")
+
+    def test_tampered(self):
+        with open(os.path.join(self.d, "file3"), "ab") as f:
+            f.write(b"!")
+        rc, out, err = self.verify()
+        self.failUnlessEqual((rc, out),
+                             (1, "BAD SIGNATURE: file3\n"
+                                 "4 good signatures!\n"), err)
+
+    def test_bad_entries(self):
+        os.remove(os.path.join(self.d, "file1"))
+        with open(os.path.join(self.d, "manifest")) as f:
+            lines = f.readlines()
+        lines[2] = "sig0-notbase32! file2\n"
+        lines.insert(3, "nospace\n")
+        with open(os.path.join(self.d, "manifest"), "w") as f:
+            f.writelines(lines)
+        rc, out, err = self.verify()
+        self.failUnlessEqual(rc, 1, err)
+        self.failUnlessEqual(out.splitlines(),
+                             ["BAD SIGNATURE: file2 (manifest line 3 cannot "
+                              "be decoded)",
+                              "BAD ENTRY: manifest line 4 is not 'SIGNATURE "
+                              "FILENAME'",
+                              "MISSING: file1 cannot be read",
+                              "3 good signatures!"])
+
+class Bench(unittest.TestCase):
+    def test_summarize(self):
+        from ed25519 import bench
+        r = bench.summarize([0.004, 0.001, 0.003, 0.002], items=2)
+        self.failUnlessEqual(r["samples"], 4)
+        self.failUnlessAlmostEqual(r["mean"], 0.0025)
+        self.failUnlessEqual((r["p50"], r["p90"], r["p99"]),
+                             (0.002, 0.004, 0.004))
+        self.failUnlessAlmostEqual(r["items_per_sec"], 800.0)
+        self.failUnlessEqual(len(bench.measure(lambda: None, 0, 7)), 7)
+
+    def test_compare(self):
+        from ed25519 import bench
+        old = {"a": {"p50": 1.0}, "b": {"p50": 1.0}, "gone": {"p50": 1.0}}
+        new = {"a": {"p50": 1.05}, "b": {"p50": 1.2}, "new": {"p50": 9.0}}
+        self.failUnlessEqual(bench.compare(old, new, 0.1),
+                             [("b", 1.0, 1.2)])
+        self.failUnlessEqual(bench.compare(old, new, 0.5), [])
+
+    def test_main(self):
+        import json, tempfile, shutil
+        from ed25519 import bench
+        d = tempfile.mkdtemp()
+        stdout = sys.stdout
+        try:
+            report = os.path.join(d, "report.json")
+            kat = os.path.join(d, "kat.txt")
+            sk, vk = ed25519.create_keypair()
+            with open(kat, "w") as f:
+                f.write("%s:%s:%s:%s:\n" % tuple(
+                    hexlify(b).decode("ascii") for b in
+                    (sk.to_bytes(), vk.to_bytes(), b"hi", sk.sign(b"hi") + b"hi")))
+            args = ["--quick", "--sizes", "0,64", "--batch-sizes", "2",
+                    "--threads", "1", "--processes", "", "--min-time", "0",
+                    "--kat", kat, "--json", report]
+            sys.stdout = open(os.devnull, "w")
+            self.failUnlessEqual(bench.main(args), 0)
+            with open(report) as f:
+                results = json.load(f)["results"]
+            self.failUnlessEqual(sorted(results),
+                                 ["batch/2", "batch_multikey/2",
+                                  "kat/sign", "kat/verify",
+                                  "keygen", "prefix_sign/header",
+                                  "sign/0", "sign/64", "sign/header",
+                                  "threads/1", "verify/0", "verify/64"])
+            self.failUnlessEqual(results["batch/2"]["items"], 2)
+            # against an impossibly fast baseline, everything regressed
+            for r in results.values():
+                r["p50"] = 1e-12
+            with open(report, "w") as f:
+                json.dump({"results": results}, f)
+            self.failUnlessEqual(bench.main(args[:-2] + ["--compare", report]),
+                                 1)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+            shutil.rmtree(d)
+
+class Stats(unittest.TestCase):
+    def setUp(self):
+        from ed25519 import metrics
+        ed25519.keys._powerup() # so the self-test is not counted
+        self.was_enabled = metrics.enable()
+        metrics.reset()
+
+    def tearDown(self):
+        from ed25519 import metrics
+        metrics.enable(self.was_enabled)
+        metrics.reset()
+
+    def test_counters(self):
+        from ed25519 import metrics
+        sk, vk = ed25519.create_keypair()
+        sig = sk.sign(b"hello")
+        vk.verify(sig, b"hello")
+        self.failUnlessRaises(ed25519.BadSignatureError,
+                              vk.verify, sig, b"hellO")
+        ed25519.verify_batch([(vk, sig, b"hello")] * 5 + [(vk, sig, b"x")])
+        s = ed25519.stats()
+        self.failUnlessEqual(sorted(s), sorted(metrics.OPERATIONS))
+        self.failUnlessEqual(s["publickey"]["calls"], 1)
+        self.failUnlessEqual(s["sign"]["calls"], 1)
+        self.failUnlessEqual(s["sign"]["bytes"], 2*5 + 128)
+        self.failUnlessEqual((s["verify"]["calls"], s["verify"]["failures"]),
+                             (2, 1))
+        self.failUnlessEqual(s["verify"]["bytes"], 2 * (5 + 64))
+        vb = s["verify_batch"]
+        self.failUnlessEqual((vb["calls"], vb["items"], vb["failures"]),
+                             (1, 6, 1))
+        for counters in s.values():
+            self.failUnlessEqual(sum(counters["buckets"]), counters["calls"])
+            self.failUnless(counters["seconds"] > 0)
+        metrics.reset()
+        self.failIf(any(c["calls"] for c in ed25519.stats().values()))
+        # when disabled, nothing is counted
+        metrics.disable()
+        sk.sign(b"hello")
+        self.failUnlessEqual(ed25519.stats()["sign"]["calls"], 0)
+
+    def test_prometheus(self):
+        import tempfile, shutil
+        from ed25519 import metrics
+        sk, vk = ed25519.create_keypair()
+        sk.sign(b"hello")
+        text = metrics.to_prometheus()
+        lines = text.splitlines()
+        self.failUnless('ed25519_operations_total{op="sign"} 1' in lines)
+        self.failUnless('ed25519_operations_total{op="verify"} 0' in lines)
+        self.failUnless("# TYPE ed25519_operation_seconds histogram" in lines)
+        self.failUnless('ed25519_operation_seconds_bucket{op="sign",'
+                        'le="+Inf"} 1' in lines)
+        self.failUnless('ed25519_operation_seconds_count{op="sign"} 1'
+                        in lines)
+        buckets = [int(l.split()[-1]) for l in lines
+                   if l.startswith('ed25519_operation_seconds_bucket'
+                                   '{op="sign"')]
+        self.failUnlessEqual(buckets, sorted(buckets)) # cumulative
+        d = tempfile.mkdtemp()
+        try:
+            path = os.path.join(d, "ed25519.prom")
+            metrics.write_textfile(path)
+            with open(path) as f:
+                self.failUnless(f.read().startswith("# HELP"))
+            self.failUnlessEqual(os.listdir(d), ["ed25519.prom"])
+        finally:
+            shutil.rmtree(d)
+
+    def test_profile(self):
+        from ed25519 import metrics
+        metrics.profile_reset()
+        sk, vk = ed25519.create_keypair()
+        sig = sk.sign(b"hello")
+        vk.verify(sig, b"hello")
+        p = metrics.profile()
+        if p is None:
+            # not built with ED25519_PROFILE
+            self.failUnlessEqual(raw.profile_snapshot(), None)
+            return
+        self.failUnlessEqual(sorted(p), sorted(metrics.PHASES))
+        for phase in ("key_hash", "nonce_hash", "scalarmult_base",
+                      "decompress", "double_scalarmult"):
+            self.failUnlessEqual(p[phase]["calls"], 1)
+        # signing and verifying each hash H(R||A||M) once
+        self.failUnlessEqual(p["hram_hash"]["calls"], 2)
+        self.failUnless(p["double_scalarmult"]["seconds"] > 0)
+        metrics.profile_reset()
+        self.failIf(any(c["calls"] for c in metrics.profile().values()))
+
+class Group(unittest.TestCase):
+    def test_multiscalar_mul(self):
+        from ed25519 import _pure
+        vks = [ed25519.SigningKey(int2byte(i) * 32).get_verifying_key()
+               for i in range(12)]
+        points = [vk.to_bytes() for vk in vks]
+        scalars = [os.urandom(32) for i in range(12)]
+        for n in (0, 1, 2, 12):
+            expected = _pure.multiscalar_mul(b"".join(scalars[:n]),
+                                             b"".join(points[:n]))
+            for constant_time in (False, True):
+                self.failUnlessEqual(ed25519.multiscalar_mul(
+                    scalars[:n], points[:n], constant_time), expected)
+        self.failUnlessEqual(ed25519.multiscalar_mul([], []),
+                             b"\x01" + b"\x00" * 31)
+        # [a]B is the public key for the secret scalar a
+        import hashlib
+        sk = ed25519.SigningKey(b"\x07" * 32)
+        B = b"\x58" + b"\x66" * 31
+        a = bytearray(hashlib.sha512(b"\x07" * 32).digest()[:32])
+        a[0] &= 248
+        a[31] &= 127
+        a[31] |= 64
+        self.failUnlessEqual(ed25519.multiscalar_mul([bytes(a)], [B]),
+                             sk.vk_s)
+        self.failUnlessEqual(ed25519.multiscalar_mul([bytes(a)], [B], True),
+                             sk.vk_s)
+        # packed buffers, and scalars taken modulo the group order
+        L = 2**252 + 27742317777372353535851937790883648493
+        one = b"\x01" + b"\x00" * 31
+        l_plus_1 = unhexlify("%064x" % (L + 1))[::-1]
+        self.failUnlessEqual(
+            ed25519.multiscalar_mul(bytearray(one + l_plus_1),
+                                    memoryview(points[0] + points[1])),
+            ed25519.multiscalar_mul([one, one], points[:2]))
+        self.failUnlessRaises(ValueError, ed25519.multiscalar_mul,
+                              [one], [b"\x02" + b"\x00" * 31])
+        self.failUnlessRaises(ValueError, ed25519.multiscalar_mul,
+                              [one, one], points[:1])
+
+    def test_large(self):
+        # enough points for the bucket method
+        points = [ed25519.SigningKey(int2byte(i) * 32).vk_s
+                  for i in range(256)] * 2
+        scalars = os.urandom(32 * len(points))
+        from ed25519 import _pure
+        self.failUnlessEqual(ed25519.multiscalar_mul(scalars, points),
+                             _pure.multiscalar_mul(scalars,
+                                                   b"".join(points)))
+
+    def test_point_scalar(self):
+        import hashlib, pickle
+        from ed25519 import Point, Scalar
+        B = Point.base()
+        a = Scalar(os.urandom(32))
+        b = Scalar(hashlib.sha512(b"b").digest())
+        self.failUnlessEqual(B.to_bytes(), b"\x58" + b"\x66" * 31)
+        self.failUnlessEqual(Point.mul_base(a), B * a)
+        self.failUnlessEqual(a * B, B.mul_vartime(a))
+        self.failUnlessEqual((a + b) * B, a * B + b * B)
+        self.failUnlessEqual((a - b) * B, a * B - b * B)
+        self.failUnlessEqual((a * b) * B, a * (b * B))
+        self.failUnlessEqual(-(a * B), (-a) * B)
+        self.failUnlessEqual(B - B, Point.identity())
+        self.failIfEqual(a * B, b * B)
+        sk = ed25519.SigningKey(b"\x07" * 32)
+        vk = Point(sk.vk_s)
+        self.failUnlessEqual(vk.to_bytes(), sk.vk_s)
+        self.failUnlessEqual(ed25519.multiscalar_mul([a, b], [B, vk]),
+                             (a * B + b * vk).to_bytes())
+        # encodings are canonical, and scalars reduced modulo L
+        L = 2**252 + 27742317777372353535851937790883648493
+        one = b"\x01" + b"\x00" * 31
+        p_plus_1 = unhexlify("%064x" % (2**255 - 19 + 1))[::-1]
+        self.failUnlessEqual(Point(p_plus_1), Point.identity())
+        self.failUnlessEqual(Point(p_plus_1).to_bytes(), one)
+        self.failUnlessEqual(hash(Point(p_plus_1)), hash(Point(one)))
+        self.failUnlessEqual(Scalar(unhexlify("%064x" % (L + 1))[::-1]),
+                             Scalar(one))
+        self.failUnlessEqual(Scalar(b"\xff" * 64).to_bytes(),
+                             unhexlify("%064x" % ((2**512 - 1) % L))[::-1])
+        for value in (a, a * B):
+            self.failUnlessEqual(pickle.loads(pickle.dumps(value)), value)
+        self.failUnlessRaises(ValueError, Point, b"\x02" + b"\x00" * 31)
+        self.failUnlessRaises(TypeError, Point, one[:31])
+        self.failUnlessRaises(TypeError, Scalar, one[:31])
+        self.failUnlessRaises(TypeError, lambda: B + a)
+
+
+@unittest.skipIf(ed25519.backend != "c", "compares against the C backend")
+class PureBackend(unittest.TestCase):
+    def setUp(self):
+        from ed25519 import _pure
+        self.pure = _pure
+
+    def test_same_results(self):
+        pure = self.pure
+        for i in range(8):
+            seed = os.urandom(32)
+            msg = os.urandom(i * 13)
+            self.failUnlessEqual(pure.publickey(seed), raw.publickey(seed))
+            vk, sk = raw.publickey(seed)
+            sm = raw.sign(msg, sk)
+            self.failUnlessEqual(pure.sign(msg, sk), sm)
+            self.failUnlessEqual(pure.prepare(vk), raw.prepare(vk))
+            self.failUnlessEqual(pure.open(sm, vk), msg)
+            self.failUnlessEqual(pure.open(sm, vk, raw.prepare(vk)), msg)
+            bad = bytearray(sm)
+            bad[i * 8] ^= 0x10
+            self.failUnlessRaises(pure.BadSignatureError,
+                                  pure.open, bytes(bad), vk)
+
+    def test_invalid_keys(self):
+        # about half of all 32-byte strings are not points
+        for i in range(64):
+            vk = os.urandom(32)
+            try:
+                expected = raw.prepare(vk)
+            except ValueError:
+                self.failUnlessRaises(ValueError, self.pure.prepare, vk)
+            else:
+                self.failUnlessEqual(self.pure.prepare(vk), expected)
+
+    def test_many(self):
+        pure = self.pure
+        vk, sk = raw.publickey(os.urandom(32))
+        msgs = [os.urandom(i) for i in range(5)]
+        offsets = array.array("q", [0, 0, 1, 3, 6, 10]).tobytes()
+        sigs = bytearray(5 * 64)
+        pure.sign_many(sk * 5, b"".join(msgs), offsets, sigs)
+        self.failUnlessEqual(bytes(sigs),
+                             b"".join(raw.sign(m, sk)[:64] for m in msgs))
+        sigs[64 * 3] ^= 1
+        results = bytearray(5)
+        self.failUnlessEqual(pure.verify_many(bytes(sigs), vk * 5,
+                                              b"".join(msgs), offsets,
+                                              results), 4)
+        self.failUnlessEqual(list(results), [1, 1, 1, 0, 1])
+        results = bytearray(5)
+        self.failUnlessEqual(pure.verify_batch_items(
+            bytes(sigs), vk * 5, b"".join(msgs), offsets, os.urandom(160),
+            results, 4), 4)
+        self.failUnlessEqual(list(results), [1, 1, 1, 0, 1])
+        self.failIf(pure.verify_batch(bytes(sigs), vk * 5, b"".join(msgs),
+                                      offsets, os.urandom(160)))
+        self.failUnlessRaises(ValueError, pure.verify_batch, bytes(sigs),
+                              vk * 5, b"".join(msgs), offsets, b"")
+
+    def test_codecs(self):
+        pure = self.pure
+        for base in (16, 32, 64):
+            for n in range(12):
+                data = os.urandom(n)
+                s = raw.encode(data, b"p-", base)
+                self.failUnlessEqual(pure.encode(data, b"p-", base), s)
+                self.failUnlessEqual(pure.decode(s, b"p-", base), data)
+                if base != 64: # either case
+                    self.failUnlessEqual(pure.decode(b"p-" + s[2:].upper(),
+                                                     b"p-", base), data)
+            self.failUnlessRaises(pure.BadPrefixError,
+                                  pure.decode, b"x-aa", b"p-", base)
+            self.failUnlessRaises(ValueError, pure.decode, b"p-a", b"p-",
+                                  base)
+        self.failUnlessEqual(pure.decode_many([b"p-aa", b"p-bb"], b"p-",
+                                              16, 1), b"\xaa\xbb")
+        self.failUnlessRaises(ValueError, pure.decode_many, [b"p-aabb"],
+                              b"p-", 16, 1)
+
+class Startup(unittest.TestCase):
+    # 'import ed25519' should cost no more than this, in seconds. It takes
+    # about 15ms on a slow machine. Wall-clock budgets fail on loaded CI
+    # machines, so test_import_budget only runs with ED25519_TIMING_TESTS
+    # set; test_lazy_imports checks what the budget depends on.
+    IMPORT_BUDGET = 0.050
+
+    def run_python(self, code, selftest=None, *args):
+        import subprocess
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(ed25519.__file__))
+        env.pop("ED25519_SELFTEST", None)
+        if selftest is not None:
+            env["ED25519_SELFTEST"] = selftest
+        p = subprocess.Popen([sys.executable] + list(args) + ["-c", code],
+                             env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        out, err = p.communicate()
+        return p.returncode, out.decode("ascii"), err.decode("ascii")
+
+    def test_selftest_modes(self):
+        code = ("import ed25519, ed25519.keys as k; print(k._selftest_passed);"
+                " ed25519.create_keypair(); print(k._selftest_passed)")
+        for mode, expected in [(None, "False\nTrue\n"),
+                               ("first-use", "False\nTrue\n"),
+                               ("import", "True\nTrue\n"),
+                               ("off", "True\nTrue\n")]:
+            rc, out, err = self.run_python(code, mode)
+            self.failUnlessEqual((rc, out), (0, expected), err)
+        rc, out, err = self.run_python("import ed25519", "sometimes")
+        self.failIfEqual(rc, 0)
+        self.failUnless("ED25519_SELFTEST" in err, err)
+
+    def test_first_use_threads(self):
+        # every thread waits for the one self-test, which runs once
+        import threading
+        keys = ed25519.keys
+        calls = []
+        def counting_selftest(real=keys.selftest):
+            calls.append(1)
+            time.sleep(0.01)
+            real()
+        old = keys.selftest, keys._selftest_passed
+        keys.selftest, keys._selftest_passed = counting_selftest, False
+        try:
+            threads = [threading.Thread(target=ed25519.create_keypair)
+                       for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.failUnlessEqual(len(calls), 1)
+            self.failUnless(keys._selftest_passed)
+        finally:
+            keys.selftest, keys._selftest_passed = old
+
+    def test_backend_choice(self):
+        code = ("import os; os.environ['ED25519_BACKEND'] = %r;"
+                " import ed25519, ed25519._ed25519 as m;"
+                " sk, vk = ed25519.create_keypair();"
+                " vk.verify(sk.sign(b'hi'), b'hi');"
+                " print(ed25519.backend, m.__name__)")
+        rc, out, err = self.run_python(code % "pure")
+        self.failUnlessEqual((rc, out), (0, "pure ed25519._pure\n"), err)
+        rc, out, err = self.run_python(code % "")
+        self.failUnlessEqual(rc, 0, err)
+        self.failUnless(out.split()[0] in ("c", "pure"), out)
+        rc, out, err = self.run_python(code % "fortran")
+        self.failIfEqual(rc, 0)
+        self.failUnless("ED25519_BACKEND" in err, err)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "needs PEP 562")
+    def test_lazy_imports(self):
+        code = ("import sys; before = set(sys.modules); import ed25519;"
+                " print(' '.join(sorted(set(sys.modules) - before)))")
+        rc, out, err = self.run_python(code)
+        self.failUnlessEqual(rc, 0, err)
+        loaded = out.split()
+        for name in ("ed25519.batch", "ed25519.executor", "ed25519._version",
+                     "concurrent.futures", "multiprocessing", "hashlib",
+                     "base64", "subprocess"):
+            self.failIf(name in loaded, name)
+        self.failUnless(callable(ed25519.verify_batch))
+        self.failUnless(ed25519.batch.pack)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "needs -X importtime")
+    @unittest.skipUnless(os.environ.get("ED25519_TIMING_TESTS"),
+                         "set ED25519_TIMING_TESTS=1 to run timing tests")
+    def test_import_budget(self):
+        # the best of a few runs, to ride out a busy machine
+        best = None
+        for i in range(3):
+            rc, out, err = self.run_python("import ed25519", None,
+                                           "-X", "importtime")
+            self.failUnlessEqual(rc, 0, err)
+            line = [l for l in err.splitlines() if l.endswith("| ed25519")][0]
+            cumulative = int(line.split("|")[1]) * 1e-6
+            best = cumulative if best is None else min(best, cumulative)
+        self.failUnless(best < self.IMPORT_BUDGET,
+                        "import ed25519 took %.1fms" % (best * 1e3))
 
 if __name__ == '__main__':
     unittest.main()